@@ -0,0 +1,244 @@
+"""
+Synthetic inputs for the benchmarks (bench/run_bench.py), so they run anywhere, without the game export and the
+Windows paths the tools default to.
+
+- write_inputs(dir, filler): api_aliases.json / actions_catalog.json / allactions.txt / Aliases.json with every
+  action the compiler's sugar needs (message, call_function, var ops, array ops, selectors, if_value, ...), plus
+  `filler` extra actions per module to scale the catalog.
+- write_export(path, records): a regallactions_export.txt with `records` records, the input of
+  tools/build_actions_catalog.py.
+- write_program(dir, shape): main.mldsl (+ lib_N.mldsl it imports) scaled by a ProgramShape.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parents[1]
+
+P, G, V, A, S = "Действие игрока", "Игровое действие", "Присв. переменную", "Массивы", "Выбрать обьект"
+SEPARATORS = {"Без разделения": 0, "Разделение пробелом": 1, "Разделение новой строкой": 2}
+BLOCKS = {
+    "Действие игрока": "cobblestone",
+    "Игровое действие": "nether_brick",
+    "Установить переменную": "iron_block",
+    "Работа с массивами": "obsidian",
+    "Выбрать объект": "purpur_block",
+    "Если игрок": "planks",
+    "Если игра": "red_nether_brick",
+    "Если значение": "bookshelf",
+    "Ожидание": "redstone_block",
+}
+EVENTS = [
+    ("Событие игрока", "Вход", "Вход игрока"),
+    ("Событие игрока", "Выход", "Выход игрока"),
+    ("Событие игрока", "Правый клик", "Игрок кликает правой кнопкой"),
+    ("Событие мира", "Запуск мира", "Мир запущен"),
+]
+
+
+def _texts(name: str, first_slot: int, count: int) -> list[tuple[str, str, int]]:
+    return [(name if i == 0 else f"{name}{i + 1}", "TEXT", first_slot + i) for i in range(count)]
+
+
+def _nums(name: str, first_slot: int, count: int) -> list[tuple[str, str, int]]:
+    return [(name if i == 0 else f"{name}{i + 1}", "NUMBER", first_slot + i) for i in range(count)]
+
+
+def build_api(filler: int = 0) -> dict:
+    """api_aliases.json contents: the core actions plus `filler` generated actions in every module."""
+    api: dict[str, dict[str, dict]] = {}
+
+    def add(module, name, sign1, sign2, menu, params=(), enums=(), aliases=()):
+        api.setdefault(module, {})[name] = {
+            "id": f"{module}.{name}",
+            "sign1": sign1,
+            "sign2": sign2,
+            "gui": sign2,
+            "menu": menu,
+            "aliases": sorted({name, *aliases}),
+            "description": f"{menu}: синтетическое действие для бенчмарка",
+            "descriptionRaw": f"§7{menu}",
+            "params": [{"name": n, "mode": m, "slot": s} for n, m, s in params],
+            "enums": [{"name": n, "slot": s, "options": o} for n, s, o in enums],
+        }
+
+    add("player", "soobschenie", P, "Сообщение", "Отправить сообщение", _texts("text", 27, 8),
+        [("separator", 22, SEPARATORS)], ["message", "сообщение"])
+    add("player", "vydat_predmety", P, "Выдать предметы", "Выдать предметы", (), (), ["выдать_предметы", "give_items"])
+    add("player", "teleport", P, "Телепорт", "Телепортировать", [("loc", "LOCATION", 13)], (), ["телепорт"])
+    add("game", "call_function", G, "Вызвать функцию", "Вызвать функцию", [("text", "TEXT", 13)],
+        [("async", 16, {"Синхронно": 0, "Асинхронно": 1})], ["вызвать_функцию"])
+    add("game", "start_loops", G, "Запустить цикл", "Запустить цикл", _texts("text", 9, 18))
+    add("game", "stop_loops", G, "Остановить цикл", "Остановить цикл", _texts("text", 9, 18))
+    add("var", "set_value", V, "=", "Установить значение", [("var", "VARIABLE", 13), ("value", "ANY", 22)])
+    for func, sign2 in (("set_sum", "+"), ("set_difference", "-"), ("set_product", "*"), ("set_quotient", "/")):
+        add("var", func, V, sign2, f"Операция {sign2}", [("var", "VARIABLE", 13), *_nums("num", 27, 10)])
+    add("var", "text", V, "Обрезать текст", "Обрезать текст",
+        [("var", "VARIABLE", 13), ("text", "TEXT", 22), ("num", "NUMBER", 30), ("num2", "NUMBER", 32)])
+    add("array", "vstavit_v_massiv", A, "Вставить в массив", "Вставить в массив",
+        [("arr", "ARRAY", 11), ("number", "NUMBER", 13), ("value", "ANY", 15)])
+    add("array", "get_array", A, "Получить элемент", "Получить элемент массива",
+        [("arr", "ARRAY", 11), ("number", "NUMBER", 13), ("var", "VARIABLE", 15)])
+    add("array", "get_array_2", A, "Длина массива", "Получить длину массива", [("arr", "ARRAY", 11), ("var", "VARIABLE", 15)])
+    add("array", "remove_array", A, "Удалить элемент", "Удалить элемент массива", [("arr", "ARRAY", 11), ("number", "NUMBER", 13)])
+    for func, sign2 in (("ochistit_sozdat_massiv", "Создать массив"), ("add_array", "Добавить в массив")):
+        values = [("value" if i == 0 else f"value{i + 1}", "ANY", 18 + i) for i in range(9)]
+        add("array", func, A, sign2, sign2, [("arr", "ARRAY", 9), *values])
+    for func, menu, aliases in (
+        ("vybrat_igroka_po_umolchaniyu", "Игрок по умолчанию", ["igrok_po_umolchaniyu"]),
+        ("vybrat_suschnost_po_umolchaniyu", "Сущность по умолчанию", ["suschnost_po_umolchaniyu"]),
+        ("vse_igroki", "Все игроки", []),
+        ("vse_moby", "Все мобы", []),
+        ("sluchaynyy_igrok", "Случайный игрок", []),
+        ("igrok_kradetsya", "Игрок крадется", ["kradetsya"]),
+        ("po_imeni", "Игрок по имени", []),
+    ):
+        add("misc", func, S, menu, menu, [("text", "TEXT", 13)] if func == "po_imeni" else (), (), aliases)
+    add("misc", "wait", "Ожидание", "Ждать", "Ждать", [("num", "NUMBER", 13)])
+    add("if_player", "issprinting", "Если игрок", "Бежит", "Игрок бежит", (), (), ["бежит"])
+    add("if_player", "hasitem", "Если игрок", "Имеет предмет", "Имеет предмет", [("item", "ITEM", 13)])
+    add("if_value", "var", "Если переменная", "Переменная существует", "Переменная существует", [("var", "VARIABLE", 13)])
+    add("if_value", "number_2", "Если переменная", "Сравнить число", "Сравнить число", _nums("num", 11, 3), [
+        ("tip_proverki_dlya_bolshe", 20, {"> (Больше)": 0, "≥ (Больше или равно)": 1}),
+        ("tip_proverki_dlya_menshe", 24, {"< (Меньше)": 0, "≤ (Меньше или равно)": 1}),
+    ])
+    add("if_value", "text", "Если переменная", "Сравнить текст", "Сравнить текст", _texts("text", 10, 8))
+
+    sign1_of = {"player": P, "game": G, "var": V, "array": A, "misc": S}
+    for module, sign1 in sign1_of.items():
+        for i in range(filler):
+            add(module, f"filler_{i}", sign1, f"Заглушка {i}", f"Заглушка номер {i}",
+                [("text", "TEXT", 10 + i % 8), ("num", "NUMBER", 19 + i % 8)],
+                [("rezhim", 22, {"Вариант 1": 0, "Вариант 2": 1})] if i % 3 == 0 else ())
+    return api
+
+
+def write_inputs(folder: Path, filler: int = 0) -> dict[str, Path]:
+    """Writes the four compiler inputs; returns {"api", "aliases", "allactions"} paths."""
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = {
+        "api": folder / "api_aliases.json",
+        "aliases": folder / "Aliases.json",
+        "allactions": folder / "allactions.txt",
+    }
+    paths["api"].write_text(json.dumps(build_api(filler), ensure_ascii=False, indent=2), encoding="utf-8")
+    catalog = [
+        {"id": sign2, "signs": [sign1, sign2, "", ""], "subitem": f"[minecraft:stone meta=0] §a{menu} | §7описание",
+         "gui": "", "args": [], "enums": []}
+        for sign1, sign2, menu in EVENTS
+    ]
+    (folder / "actions_catalog.json").write_text(json.dumps(catalog, ensure_ascii=False, indent=2), encoding="utf-8")
+    paths["allactions"].write_text("".join(f"[(minecraft:{b}) {s}]\n" for s, b in BLOCKS.items()), encoding="utf-8")
+    paths["aliases"].write_text((REPO / "src" / "assets" / "Aliases.json").read_text(encoding="utf-8"), encoding="utf-8")
+    return paths
+
+
+EXPORT_SIGN1 = ("Действие игрока", "Игровое действие", "Установить переменную", "Работа с массивами",
+                "Выбрать объект", "Если игрок", "Если игра", "Если значение")
+GLASS = "minecraft:stained_glass_pane"
+# (glass meta, glass name) of the argument kinds determine_mode() knows
+ARG_GLASS = ((3, "§fТекст"), (14, "§cЧисло"), (1, "§bПеременная"), (4, "§eПредмет"), (5, "§aМестоположение"), (0, "§7Любое"))
+
+
+def export_record(i: int) -> list[str]:
+    """One record of a regallactions export: signs, menu item, argument glass panes and an enum switch."""
+    sign1 = EXPORT_SIGN1[i % len(EXPORT_SIGN1)]
+    name = f"Действие номер {i}"
+    lines = [
+        f"# record {i}",
+        f"path={sign1}/Раздел {i % 40}",
+        f"category=§eРаздел {i % 40}",
+        f"subitem=[minecraft:stone meta=0] §a{name} | §7Описание действия {i} \\n §7вторая строка описания",
+        f"gui={name}",
+        f"sign1={sign1}",
+        f"sign2={name}",
+        "sign3=",
+        "sign4=",
+        "hasChest=true",
+    ]
+    # glass panes on the second row, the argument slot below each one stays empty
+    for k in range(i % 6 + 1):
+        meta, glass_name = ARG_GLASS[(i + k) % len(ARG_GLASS)]
+        lines.append(f"item=slot {9 + k}: [{GLASS} meta={meta}] {glass_name} | §7аргумент {k + 1}")
+    if i % 2 == 0:
+        options = " \\n ".join(("● " if k == 0 else "○ ") + f"Вариант {k + 1}" for k in range(i % 4 + 2))
+        lines.append(f"item=slot 40: [minecraft:lever meta=0] §eРежим | §7Режим действия \\n {options}")
+    return lines
+
+
+def write_export(path: Path, records: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(f"records={records}\n")
+        for i in range(records):
+            f.write("\n".join(export_record(i)) + "\n")
+
+
+@dataclass(frozen=True)
+class ProgramShape:
+    events: int = 100  # event(join) blocks in main.mldsl
+    funcs: int = 20  # func blocks, spread over the imported libraries (main.mldsl if imports == 0)
+    calls: int = 4  # action calls per block
+    ifs: int = 1  # if chains per block
+    depth: int = 2  # nesting depth of each if chain
+    selects: int = 1  # select blocks per block
+    formulas: int = 2  # arithmetic assignments per block
+    imports: int = 0  # library files main.mldsl imports
+
+    def scaled(self, factor: float) -> "ProgramShape":
+        """The same shape with `factor` times fewer/more blocks (at least one of each kind that was there)."""
+        def n(v: int) -> int:
+            return max(1, round(v * factor)) if v else 0
+
+        return ProgramShape(n(self.events), n(self.funcs), self.calls, self.ifs, self.depth, self.selects,
+                            self.formulas, n(self.imports))
+
+
+def _body(shape: ProgramShape, seed: int, indent: str = "    ") -> list[str]:
+    lines = []
+    for k in range(shape.calls):
+        if k % 2:
+            lines.append(f'{indent}player.message("шаг {seed} %var(x{k})%", "b", separator=" ")')
+        else:
+            lines.append(f"{indent}misc.wait(num={k + 1})")
+    for k in range(shape.formulas):
+        lines.append(f"{indent}v{k} = a + b * {k + 2} - c / {k % 5 + 1}")
+    for k in range(shape.selects):
+        lines.append(f"{indent}select.allplayers {{")
+        lines.append(f'{indent}    player.message("выборка {k}")')
+        lines.append(f"{indent}}}")
+    for k in range(shape.ifs):
+        for d in range(shape.depth):
+            lines.append(f"{indent}{'    ' * d}if v{d % max(shape.formulas, 1)} > {d + k} {{")
+        lines.append(f"{indent}{'    ' * shape.depth}player.message(v{k % max(shape.formulas, 1)})")
+        for d in reversed(range(shape.depth)):
+            lines.append(f"{indent}{'    ' * d}}}")
+    if shape.funcs:
+        lines.append(f'{indent}r = f{seed % shape.funcs}({seed}, "x")')
+    return lines
+
+
+def write_program(folder: Path, shape: ProgramShape) -> tuple[Path, int]:
+    """Writes the program; returns (main.mldsl, number of source lines over all its files)."""
+    folder.mkdir(parents=True, exist_ok=True)
+    libs: list[list[str]] = [[] for _ in range(shape.imports)]
+    main: list[str] = [f"import lib_{k}" for k in range(shape.imports)]
+    func_shape = ProgramShape(0, 0, shape.calls, shape.ifs, shape.depth, shape.selects, shape.formulas, 0)
+    for i in range(shape.funcs):
+        target = libs[i % shape.imports] if shape.imports else main
+        target.append(f"func f{i}(a, b) {{")
+        target.extend(_body(func_shape, i))
+        target.append("    return(v0 + a)" if shape.formulas else "    return(a)")
+        target.append("}")
+    for i in range(shape.events):
+        main.append("event(join) {")
+        main.extend(_body(shape, i))
+        main.append("}")
+    for k, lines in enumerate(libs):
+        (folder / f"lib_{k}.mldsl").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    path = folder / "main.mldsl"
+    path.write_text("\n".join(main) + "\n", encoding="utf-8")
+    return path, len(main) + sum(map(len, libs))
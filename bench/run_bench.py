@@ -0,0 +1,354 @@
+"""
+Benchmarks of the compiler and the catalog tools on synthetic inputs (bench/fixtures.py).
+
+    python bench/run_bench.py run [--quick] [--out results.json] [--baseline base.json]
+    python bench/run_bench.py compare base.json results.json [--threshold 0.15]
+
+`run` measures, in a temporary folder (nothing under out/ is touched, the block cache goes to a temp dir too):
+- compile/<scenario>: one program per scenario, each growing one dimension (events, funcs, calls, nested ifs,
+  selects, formulas, imports) over the base shape. compile_s is the best of --repeat cold compiles
+  (cache=False, catalog already loaded), lines_per_s the source lines over it, peak_mib the tracemalloc peak of
+  one cold compile, cached_s a build that hits the whole-build cache and rebuild_s a build after editing one
+  block.
+- inputs/<filler>: loading the catalog (the api + snapshot) with `filler` extra actions per module.
+- catalog/<records>: build_actions_catalog -> build_api_aliases -> generate_api_docs on an export of that many
+  records (each step's time and the total).
+
+`compare` (and `run --baseline`) prints every metric against the baseline and exits with 1 when one regressed by
+more than --threshold: a time/memory metric grew or a throughput metric fell. Sizes and counts are only shown.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+BENCH = Path(__file__).resolve().parent
+REPO = BENCH.parent
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(BENCH))
+
+import fixtures  # noqa: E402
+import mldsl_compile as mc  # noqa: E402
+from mldsl_cache import CACHE_DIR_ENV  # noqa: E402
+
+RESULTS_VERSION = 1
+BASE_SHAPE = fixtures.ProgramShape()
+SCENARIOS: dict[str, fixtures.ProgramShape] = {
+    "base": BASE_SHAPE,
+    "events": fixtures.ProgramShape(events=1000),
+    "funcs": fixtures.ProgramShape(funcs=500),
+    "calls": fixtures.ProgramShape(calls=40),
+    "nested_ifs": fixtures.ProgramShape(ifs=3, depth=12),
+    "selects": fixtures.ProgramShape(selects=20),
+    "formulas": fixtures.ProgramShape(formulas=30),
+    "imports": fixtures.ProgramShape(funcs=200, imports=20),
+}
+INPUT_FILLERS = (0, 2000)
+EXPORT_RECORDS = (1000, 10000, 50000)
+QUICK_SCALE = 0.2  # --quick: programs with 5x fewer blocks, only the smallest export
+# a time below this (seconds) never counts as a regression, whatever the ratio: timer noise
+MIN_DELTA_S = 0.005
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def peak_mib(fn: Callable[[], object]) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        _size, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1 << 20)
+
+
+def quiet(fn: Callable[[], object]) -> Callable[[], object]:
+    """fn with stdout/stderr swallowed (compiler warnings, the tools' `wrote ...` lines)."""
+    def run():
+        with contextlib.redirect_stderr(io.StringIO()), contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+
+    return run
+
+
+def use_inputs(paths: dict[str, Path], cache_dir: Path) -> None:
+    mc.API_PATH, mc.ALIASES_PATH, mc.ALLACTIONS_PATH = paths["api"], paths["aliases"], paths["allactions"]
+    os.environ[CACHE_DIR_ENV] = str(cache_dir)
+
+
+def bench_compile(work: Path, name: str, shape: fixtures.ProgramShape, repeat: int) -> dict:
+    main, lines = fixtures.write_program(work / "programs" / name, shape)
+    cold = quiet(lambda: mc.compile_entries(main, cache=False))
+    entries = cold()
+    compile_s = best_of(cold, repeat)
+    memory = peak_mib(cold)
+
+    warm = quiet(lambda: mc.compile_entries(main))
+    warm()
+    cached_s = best_of(warm, repeat)
+    text = main.read_text(encoding="utf-8")
+    edits = [text.replace("шаг 0 ", f"шаг 0/{k} ", 1) for k in range(max(1, repeat))]
+    rebuild_s = float("inf")
+    for edited in edits:
+        main.write_text(edited, encoding="utf-8")
+        rebuild_s = min(rebuild_s, best_of(warm, 1))
+    main.write_text(text, encoding="utf-8")
+    return {
+        "lines": lines,
+        "entries": len(entries),
+        "compile_s": round(compile_s, 4),
+        "lines_per_s": round(lines / compile_s),
+        "peak_mib": round(memory, 2),
+        "cached_s": round(cached_s, 4),
+        "rebuild_s": round(rebuild_s, 4),
+    }
+
+
+def bench_inputs(work: Path, filler: int, repeat: int) -> dict:
+    paths = fixtures.write_inputs(work / f"inputs_{filler}", filler=filler)
+    n = 0
+
+    def load():
+        # a fresh cache dir and no in-process memo: the api is parsed and the snapshot written
+        nonlocal n
+        n += 1
+        use_inputs(paths, work / f"cache_inputs_{filler}_{n}")
+        mc._LOADED_INPUTS = None
+        mc.load_inputs()
+
+    load_s = best_of(quiet(load), repeat)
+    snapshot_s = best_of(quiet(lambda: (setattr(mc, "_LOADED_INPUTS", None), mc.load_inputs())), repeat)
+    return {
+        "actions": sum(len(funcs) for funcs in json.loads(paths["api"].read_text(encoding="utf-8")).values()),
+        "api_bytes": paths["api"].stat().st_size,
+        "load_s": round(load_s, 4),
+        "snapshot_s": round(snapshot_s, 4),
+    }
+
+
+def load_tool(name: str):
+    # like running the tool as a script: tools/ on sys.path (for tools/_repo_root.py)
+    if str(REPO / "tools") not in sys.path:
+        sys.path.insert(0, str(REPO / "tools"))
+    spec = importlib.util.spec_from_file_location(f"bench_{name}", REPO / "tools" / f"{name}.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def bench_catalog(work: Path, records: int) -> dict:
+    """The tools/build_all.py pipeline with its hardcoded paths pointed into `work`."""
+    folder = work / f"catalog_{records}"
+    out = folder / "out"
+    export = folder / "regallactions_export.txt"
+    fixtures.write_export(export, records)
+
+    catalog_tool = load_tool("build_actions_catalog")
+    catalog_tool.EXPORT_PATH = export
+    catalog_tool.ALIASES_PATH = REPO / "src" / "assets" / "Aliases.json"
+    catalog_tool.TOOLS_PATH = REPO / "tools" / "extract_regallactions_args.py"
+    catalog_tool.OUT_CATALOG = out / "actions_catalog.json"
+    catalog_tool.OUT_ALIASES = out / "action_aliases.json"
+    catalog_tool.OUT_DOCS = out / "language_quickstart.md"
+
+    aliases_tool = load_tool("build_api_aliases")
+    aliases_tool.CATALOG_PATH = out / "actions_catalog.json"
+    aliases_tool.OUT_API = out / "api_aliases.json"
+    aliases_tool.OUT_API_SHARDS = out / "api"
+    # no hand-written translations: the output depends on the synthetic export only
+    aliases_tool.TRANSLATIONS_PATH = folder / "missing_translations.json"
+    aliases_tool.TRANSLATIONS_BY_ID_PATH = folder / "missing_translations_by_id.json"
+
+    docs_tool = load_tool("generate_api_docs")
+    docs_tool.API_PATH = out / "api_aliases.json"
+    docs_tool.OUT_DIR = out / "docs"
+    docs_tool.CATALOG_PATH = out / "actions_catalog.json"
+
+    res: dict = {"export_bytes": export.stat().st_size}
+    total = 0.0
+    for step, tool in (("build_actions_catalog", catalog_tool), ("build_api_aliases", aliases_tool),
+                       ("generate_api_docs", docs_tool)):
+        seconds = best_of(quiet(tool.main), 1)
+        res[f"{step}_s"] = round(seconds, 4)
+        total += seconds
+    res["total_s"] = round(total, 4)
+    res["api_bytes"] = (out / "api_aliases.json").stat().st_size
+    return res
+
+
+def git_commit() -> str:
+    try:
+        proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True, text=True)
+    except OSError:
+        return ""
+    return proc.stdout.strip()
+
+
+def run(args: argparse.Namespace) -> dict:
+    scale = QUICK_SCALE if args.quick else 1.0
+    records = args.records or (EXPORT_RECORDS[:1] if args.quick else EXPORT_RECORDS)
+    only = set(args.only or ())
+    results: dict[str, dict] = {}
+
+    def record(name: str, measure: Callable[[], dict]) -> None:
+        if only and not any(name.startswith(prefix) for prefix in only):
+            return
+        print(f"[bench] {name} ...", file=sys.stderr, flush=True)
+        results[name] = measure()
+        print(f"[bench] {name}: {json.dumps(results[name])}", file=sys.stderr, flush=True)
+
+    with tempfile.TemporaryDirectory(prefix="mldsl_bench_") as tmp:
+        work = Path(tmp)
+        saved = (mc.API_PATH, mc.ALIASES_PATH, mc.ALLACTIONS_PATH, os.environ.get(CACHE_DIR_ENV))
+        try:
+            for filler in INPUT_FILLERS:
+                record(f"inputs/{filler}", lambda: bench_inputs(work, filler, args.repeat))
+            use_inputs(fixtures.write_inputs(work / "inputs"), work / "cache")
+            for name, shape in SCENARIOS.items():
+                record(f"compile/{name}", lambda: bench_compile(work, name, shape.scaled(scale), args.repeat))
+            for n in records:
+                record(f"catalog/{n}", lambda: bench_catalog(work, n))
+        finally:
+            mc.API_PATH, mc.ALIASES_PATH, mc.ALLACTIONS_PATH = saved[:3]
+            if saved[3] is None:
+                os.environ.pop(CACHE_DIR_ENV, None)
+            else:
+                os.environ[CACHE_DIR_ENV] = saved[3]
+
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count() or 1,
+        "quick": bool(args.quick),
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+
+def metric_direction(metric: str) -> int:
+    """+1: higher is better, -1: lower is better, 0: informational."""
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith("_s") or metric.endswith("_mib"):
+        return -1
+    return 0
+
+
+def _fmt(value: int | float) -> str:
+    return str(value) if isinstance(value, int) else f"{value:.4g}"
+
+
+def compare(base: dict, current: dict, threshold: float, out=sys.stdout) -> list[str]:
+    """Prints a comparison table; returns the regressed `name.metric`s."""
+    if base.get("quick") != current.get("quick"):
+        print("[warn] comparing a --quick run with a full one: the programs differ", file=sys.stderr)
+    regressions = []
+    print(f"{'benchmark':<36} {'baseline':>12} {'current':>12} {'change':>8}", file=out)
+    for name, metrics in current["results"].items():
+        base_metrics = base.get("results", {}).get(name)
+        if base_metrics is None:
+            print(f"{name:<36} {'(new)':>12}", file=out)
+            continue
+        for metric, value in metrics.items():
+            old = base_metrics.get(metric)
+            if not isinstance(old, (int, float)) or not isinstance(value, (int, float)):
+                continue
+            change = (value - old) / old if old else 0.0
+            direction = metric_direction(metric)
+            worse = -change * direction
+            regressed = (
+                direction != 0
+                and worse > threshold
+                and not (metric.endswith("_s") and not metric.endswith("_per_s") and value - old < MIN_DELTA_S)
+            )
+            mark = "  REGRESSION" if regressed else ""
+            label = f"{name}.{metric}"
+            print(f"{label:<36} {_fmt(old):>12} {_fmt(value):>12} {change:>+8.1%}{mark}", file=out)
+            if regressed:
+                regressions.append(label)
+    for name in base.get("results", {}).keys() - current["results"].keys():
+        print(f"{name:<36} {'(missing)':>12}", file=out)
+    return regressions
+
+
+def read_results(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"bench: не удалось прочитать {path}: {e}")
+    if not isinstance(data, dict) or not isinstance(data.get("results"), dict):
+        raise ValueError(f"bench: {path}: это не результаты бенчмарка")
+    if data.get("version") != RESULTS_VERSION:
+        raise ValueError(f"bench: {path}: версия результатов {data.get('version')!r}, ожидается {RESULTS_VERSION}")
+    return data
+
+
+def report(regressions: list[str], threshold: float) -> int:
+    if regressions:
+        print(f"[bench] {len(regressions)} regression(s) over {threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    print(f"[bench] no regressions over {threshold:.0%}", file=sys.stderr)
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="MLDSL compiler and catalog tools benchmarks")
+    sub = ap.add_subparsers(dest="command", required=True)
+    run_ap = sub.add_parser("run", help="Run the benchmarks and write a results JSON")
+    run_ap.add_argument("--out", default=str(BENCH / "results.json"), help="Results file (default bench/results.json)")
+    run_ap.add_argument("--quick", action="store_true", help="Smaller programs, only the 1k-record export")
+    run_ap.add_argument("--repeat", type=int, default=3, help="Timed runs per measurement, the best one counts")
+    run_ap.add_argument("--records", type=int, nargs="+", default=None, help="Export sizes for catalog/* benchmarks")
+    run_ap.add_argument("--only", nargs="+", default=None, help="Only benchmarks starting with these prefixes")
+    run_ap.add_argument("--baseline", default=None, help="Compare with this results file afterwards")
+    run_ap.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown (0.15 = 15%%)")
+    cmp_ap = sub.add_parser("compare", help="Compare two results files")
+    cmp_ap.add_argument("baseline")
+    cmp_ap.add_argument("current")
+    cmp_ap.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown (0.15 = 15%%)")
+    args = ap.parse_args()
+
+    try:
+        if args.command == "compare":
+            base, current = read_results(Path(args.baseline)), read_results(Path(args.current))
+            return report(compare(base, current, args.threshold), args.threshold)
+        base = read_results(Path(args.baseline)) if args.baseline else None
+        results = run(args)
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(results, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"[bench] wrote {out}", file=sys.stderr)
+        if base is not None:
+            return report(compare(base, results, args.threshold), args.threshold)
+    except ValueError as e:
+        print(f"[error] {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
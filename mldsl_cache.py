@@ -0,0 +1,119 @@
+"""
+On-disk caches of the compiler.
+
+Everything here is an optimization: a missing, unreadable or stale cache file is ignored and rebuilt, never
+an error. Cache files live under $MLDSL_CACHE_DIR (or a default chosen by the caller, next to out/).
+"""
+
+from __future__ import annotations
+
+import gc
+import hashlib
+import marshal
+import os
+import threading
+from pathlib import Path
+from typing import Callable
+
+CACHE_DIR_ENV = "MLDSL_CACHE_DIR"
+
+
+def cache_dir(default: Path) -> Path:
+    env = os.environ.get(CACHE_DIR_ENV)
+    return Path(env) if env else default
+
+
+def file_stat(path: Path) -> tuple[int, int] | None:
+    """(size, mtime_ns) or None if the file does not exist."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+def file_digest(path: Path) -> str | None:
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def text_digest(*parts: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part.encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def read_marshal(path: Path):
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # Loading builds many small containers at once; with a big heap (the api) every gen-2 collection this
+    # triggers walks all of it, which costs more than the load itself.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return marshal.loads(data)
+    except (EOFError, ValueError, TypeError):
+        return None
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def write_marshal(path: Path, value) -> bool:
+    """Atomic write (tmp file + replace); False if the cache dir is not writable."""
+    # unique per thread too: --serve builds run in parallel threads
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "wb") as f:
+            marshal.dump(value, f)
+        os.replace(tmp, path)
+        return True
+    except (OSError, ValueError):
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        return False
+
+
+def load_snapshot(
+    path: Path, sources: dict[str, Path], version: int, build: Callable[[], dict]
+) -> tuple[dict, str]:
+    """
+    `build()` result cached in a marshal file, keyed by size/mtime and content hash of every source file.
+    - size+mtime of all sources unchanged: the snapshot is used without reading the sources
+    - otherwise the sources are hashed; same content (e.g. a touched file) refreshes the stored stats only
+    - otherwise build() runs and the snapshot is rewritten
+    build() must return marshal-able data (dict/list/tuple/str/bytes/int/float/bool/None).
+    Returns (data, fingerprint); the fingerprint changes only when some source's content does, so it can key
+    caches derived from the data.
+    """
+    stats = {name: file_stat(p) for name, p in sources.items()}
+    snap = read_marshal(path)
+    if isinstance(snap, dict) and snap.get("version") == version and "data" in snap:
+        if snap.get("stats") == stats:
+            return snap["data"], snap["fingerprint"]
+        hashes = {name: (file_digest(p) if stats[name] else None) for name, p in sources.items()}
+        if snap.get("hashes") == hashes:
+            snap["stats"] = stats
+            write_marshal(path, snap)
+            return snap["data"], snap["fingerprint"]
+    else:
+        hashes = {name: (file_digest(p) if stats[name] else None) for name, p in sources.items()}
+
+    # Hashed before building: build() reads the same or a newer version, so a source edited while it runs
+    # no longer matches the stored hashes and the snapshot is rebuilt next time.
+    data = build()
+    fingerprint = text_digest(str(version), *(f"{name}={hashes[name]}" for name in sorted(hashes)))
+    snap = {"version": version, "stats": stats, "hashes": hashes, "fingerprint": fingerprint, "data": data}
+    write_marshal(path, snap)
+    return data, fingerprint
@@ -0,0 +1,196 @@
+"""
+Check mode: `mldsl_compile.py file.mldsl --check [--json]`, or check_file() from code.
+
+Loads the file and its imports and runs every statement through the compile functions the compiler uses
+(actions, params, enum values, selectors, blocks from allactions.txt, events, func call argument counts), but
+builds no plan entries and writes nothing. A statement that fails is reported and checking goes on with the
+next one, so one run lists every error of the program, each with its file, line and column (imports too).
+A statement text is checked once per run (repeats only add their positions), so its [warn] lines appear once.
+The language server (mldsl_lsp.py) checks statements with the same StmtChecker.
+
+JSON report (--json, and the `check` method of --serve):
+  {"ok": false,
+   "errors": [{"file": "/abs/lib.mldsl", "line": 3, "col": 5, "message": "Unknown action: player.foo"}],
+   "warnings": ["[warn] ..."], "files": 2, "statements": 120, "seconds": 0.012}
+line/col are 1-based, 0 when a problem has no position (an entry file that cannot be read).
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+import mldsl_compile as mc
+from mldsl_compile import SourceError
+from mldsl_parser import Stmt
+
+
+class StmtChecker:
+    """Compiles single statements for their errors only: the dispatch of BlockCompiler._compile, no entries."""
+
+    def __init__(
+        self,
+        inputs: mc.CompilerInputs,
+        selectors: mc.SelectorIndex | None = None,
+        index: mc.ApiIndex | None = None,
+    ):
+        # passed as `api` to the compile functions (see mc.api_index())
+        self.api = index or mc.api_index(inputs.api)
+        self.known_events = inputs.known_events
+        self.resolver = mc.ActionResolver(inputs.sign1_aliases, inputs.blocks)
+        self.selectors = selectors or mc.SelectorIndex(inputs.api, inputs.sign1_aliases)
+
+    def check(self, st: Stmt, current_kind: str | None, func_sigs: dict[str, list[str]]) -> None:
+        """Raises ValueError with the compiler's message."""
+        for _pieces, spec in self.actions(st, current_kind, func_sigs):
+            self.resolver.resolve(spec)
+
+    def actions(self, st: Stmt, current_kind: str | None, func_sigs: dict[str, list[str]]) -> list:
+        api = self.api
+        kind = st.kind
+        if kind in mc.NESTED_BLOCK_KINDS:
+            if kind in ("if_player", "if_game"):
+                return [mc.compile_call(api, kind, st.func, st.args)]
+            if kind == "iftext":
+                return mc.compile_iftext_condition(api, st.expr)
+            if kind == "if":
+                return mc.compile_if_condition(api, st.expr)
+            return []
+        if kind == "event":
+            ev_name = mc.event_variant_to_name(st.name or "")
+            if self.known_events and mc.norm_key(ev_name) not in self.known_events:
+                raise ValueError(f"неизвестное событие: {ev_name}")
+            return []
+        if kind == "func":
+            for pn in st.params or []:
+                if not re.match(rf"^{mc.NAME_RE}$", pn):
+                    raise ValueError(f"func {st.name}(): недопустимое имя параметра: {pn}")
+            return []
+        if kind == "loop":
+            return []
+        if kind == "select":
+            canon, _spec = self.selectors.find(st.name)
+            return [mc.compile_call(api, "misc", canon, st.args)]
+        if kind == "nested_message":
+            tmp = f"{mc.TMP_VAR_PREFIX}1"
+            out = mc.compile_builtin(api, f"{tmp} = {st.func}({st.expr})", func_sigs=func_sigs)
+            if not out:
+                raise ValueError(f"Не получилось скомпилировать вызов функции {st.func}() для вложенного message()")
+            return out
+        if kind == "return":
+            if current_kind != "func":
+                raise ValueError("return можно использовать только внутри func{}")
+            return []
+        if kind == "bare_call":
+            return mc.compile_bare_call(api, st.func, st.args, func_sigs=func_sigs) or []
+        if kind == "assign":
+            return mc.compile_assign(api, st, func_sigs=func_sigs) or []
+        if kind == "call":
+            return [mc.compile_call(api, st.module, st.func, st.args)]
+        return []
+
+
+def check_block(
+    checker: StmtChecker,
+    stmts: list[Stmt],
+    func_sigs: dict[str, list[str]],
+    errors: list[SourceError],
+    memo: dict[tuple[str, str | None], str | None] | None = None,
+) -> None:
+    """
+    Checks one block of split_blocks(), appending an error per failing statement. `memo` (statement text ->
+    error message or None) skips statements already checked against the same func_sigs: generated and
+    copy-pasted code repeats the same lines many times.
+    """
+    head = stmts[0]
+    if head.kind not in mc.BLOCK_KINDS:
+        # a top-level if (split_blocks() keeps it as a pseudo-block): the compiler rejects it
+        errors.append(SourceError(head.path or "", head.line, head.col, f"{head.kind} must be inside event/func/loop block"))
+        return
+    current_kind = None
+    for st in stmts:
+        # `return` is the only statement whose check depends on the enclosing block
+        key = (st.text, current_kind if st.kind == "return" else None)
+        if memo is not None and key in memo:
+            message = memo[key]
+        else:
+            try:
+                checker.check(st, current_kind, func_sigs)
+                message = None
+            except ValueError as e:
+                message = str(e)
+            if memo is not None:
+                memo[key] = message
+        if message is not None:
+            errors.append(SourceError(st.path or "", st.line, st.col, message))
+        if st.kind in mc.BLOCK_KINDS:
+            current_kind = st.kind
+
+
+class CheckReport(NamedTuple):
+    errors: list[SourceError]
+    warnings: list[str]
+    files: int
+    statements: int
+    seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def as_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "errors": [{"file": e.path, "line": e.line, "col": e.col, "message": e.message} for e in self.errors],
+            "warnings": self.warnings,
+            "files": self.files,
+            "statements": self.statements,
+            "seconds": round(self.seconds, 4),
+        }
+
+
+def check_file(
+    path: Path, text: str | None = None, *, cache: bool = True, catalog: mc.Catalog | None = None
+) -> CheckReport:
+    """
+    Every error of `path` and its imports (see the module docstring). `text` replaces the file's content (editor
+    buffer); `catalog` replaces the inputs the module globals point at. Never raises ValueError.
+    """
+    t0 = time.perf_counter()
+    errors: list[SourceError] = []
+    with mc.collect_warnings() as warnings:
+        try:
+            inputs = catalog.inputs if catalog is not None else mc.load_inputs()
+            program = mc.load_program(path, text, cache=cache, errors=errors)
+        except (ValueError, OSError) as e:
+            errors.append(SourceError(str(path.resolve()), 0, 0, str(e)))
+            return CheckReport(errors, warnings, 0, 0, time.perf_counter() - t0)
+        if catalog is not None:
+            checker = StmtChecker(inputs, catalog.selectors, catalog.index)
+        else:
+            checker = StmtChecker(inputs)
+        memo: dict[tuple[str, str | None], str | None] = {}
+        for stmts in mc.split_blocks(program.stmts):
+            check_block(checker, stmts, program.func_sigs, errors, memo)
+    # load_program() and the statement checks both reject a bad func parameter name
+    errors = list(dict.fromkeys(errors))
+    # source order: files in the order they were loaded, then by position
+    order = {name: i for i, name in enumerate(program.files)}
+    errors.sort(key=lambda e: (order.get(e.path, len(order)), e.line, e.col))
+    return CheckReport(errors, warnings, len(program.files), len(program.stmts), time.perf_counter() - t0)
+
+
+def print_report(report: CheckReport, out=sys.stderr) -> None:
+    for w in report.warnings:
+        print(w, file=out)
+    for e in report.errors:
+        where = f"{e.path}:{e.line}:{e.col}" if e.line else e.path
+        print(f"{where}: error: {e.message}", file=out)
+    status = "ok" if report.ok else f"{len(report.errors)} error(s)"
+    print(
+        f"[check] {status}: {report.files} files, {report.statements} statements, {report.seconds:.3f}s",
+        file=out,
+    )
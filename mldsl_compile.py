@@ -2,12 +2,48 @@ import json
 import re
 import argparse
 import ast
+import contextlib
+import contextvars
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
 from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+from mldsl_cache import (
+    cache_dir,
+    file_digest,
+    file_stat,
+    load_snapshot,
+    read_marshal,
+    text_digest,
+    write_marshal,
+)
+from mldsl_parser import CallArgs, Stmt, dump_stmt, load_stmt, parse_args, parse_call, parse_line, parse_source
+from mldsl_plan import PLAN_FORMAT_V2, dump_plan, dump_plan_v2, piece_to_arg
+from mldsl_text import norm_enum_value, norm_ident, norm_key, parse_item_display_name, strip_colors
 
 API_PATH = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\out\api_aliases.json")
 ALIASES_PATH = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\src\assets\Aliases.json")
 ALLACTIONS_PATH = Path(r"C:\Users\trysmile\Documents\allactions.txt")
+# per-module api shards written next to api_aliases.json by tools/build_api_aliases.py
+API_SHARDS_DIRNAME = "api"
 MAX_CMD_LEN = 240
+# compile_line()/build_action() memo entries kept per loaded api
+LINE_MEMO_SIZE = 4096
+# bump when the snapshot layout or any loader output changes
+INPUTS_SNAPSHOT_VERSION = 3
+# compiled-block / whole-build caches (see BlockCache); keyed by these modules' content as well
+BLOCK_CACHE_VERSION = 2
+COMPILER_MODULES = ("mldsl_compile.py", "mldsl_parser.py", "mldsl_text.py", "mldsl_cache.py")
+BLOCK_CACHE_VARIANTS = 4
+BLOCK_CACHE_SPARE = 256
+MODULE_ARTIFACT_SUFFIX = ".mldslc"
+API_DOC_FIELDS = ("description", "descriptionRaw")
 
 # Internal stacks for function args/returns. Names must be rare to avoid clashing with user variables in the world.
 ARGS_STACK_NAME = "__mldsl_args"
@@ -18,25 +54,13 @@ TMP_VAR_PREFIX = "__mldsl_tmp"
 STACK_TOP_INDEX = 1
 
 
-def parse_item_display_name(raw: str) -> str:
-    if not raw:
-        return ""
-    s = strip_colors(raw)
-    if "]" in s:
-        s = s.split("]", 1)[1]
-    s = s.strip()
-    if "|" in s:
-        s = s.split("|", 1)[0].strip()
-    return s
-
-
-def load_known_events() -> dict:
+def load_known_events(catalog_path: Path | None = None) -> dict:
     """
     Returns: norm(menu|sign2) -> (block, menuName, expectedSign2)
     - menuName: clickable GUI item title
     - expectedSign2: sign text used for skip-check
     """
-    p = API_PATH.parent / "actions_catalog.json"
+    p = catalog_path or API_PATH.parent / "actions_catalog.json"
     if not p.exists():
         return {}
     try:
@@ -66,78 +90,100 @@ def load_known_events() -> dict:
     return out
 
 
-def load_api():
-    return json.loads(API_PATH.read_text(encoding="utf-8"))
-
-def strip_colors(text: str) -> str:
-    if not text:
-        return ""
-    text = re.sub(r"\u00a7.", "", text)
-    text = re.sub(r"[\x00-\x1f]", "", text)
-    # common mojibake fix (cp1251 bytes decoded as latin-1)
-    text = text.translate(
-        str.maketrans(
-            {
-                "à": "а",
-                "á": "б",
-                "â": "в",
-                "ã": "г",
-                "ä": "д",
-                "å": "е",
-                "¸": "ё",
-                "æ": "ж",
-                "ç": "з",
-                "è": "и",
-                "é": "й",
-                "ê": "к",
-                "ë": "л",
-                "ì": "м",
-                "í": "н",
-                "î": "о",
-                "ï": "п",
-                "ð": "р",
-                "ñ": "с",
-                "ò": "т",
-                "ó": "у",
-                "ô": "ф",
-                "õ": "х",
-                "ö": "ц",
-                "ø": "ш",
-                "ù": "щ",
-                "ú": "ъ",
-                "û": "ы",
-                "ü": "ь",
-                "ý": "э",
-                "þ": "ю",
-                "ÿ": "я",
-            }
-        )
-    )
-    return text
+class ShardedApi(Mapping):
+    """
+    api_aliases.json split per module by tools/build_api_aliases.py (out/api/<module>.json + manifest.json).
+    A module's shard is parsed the first time it is looked up; shards carry no description fields.
+    Only the inputs snapshot build reads it (every shard, once per api change); compiles then load modules
+    lazily from the snapshot (SnapshotApi).
+    """
+
+    def __init__(self, shard_dir: Path, files: dict[str, str]):
+        self._dir = shard_dir
+        self._files = files
+        self._loaded: dict[str, dict] = {}
+
+    def __getitem__(self, module: str) -> dict:
+        mod = self._loaded.get(module)
+        if mod is None:
+            mod = json.loads((self._dir / self._files[module]).read_text(encoding="utf-8"))
+            self._loaded[module] = mod
+        return mod
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+
+class SnapshotApi(Mapping):
+    """
+    The api of the inputs snapshot: module -> marshal bytes of its actions, unmarshaled the first time the
+    module is looked up, so a compile only pays for the modules its script touches.
+    """
+
+    def __init__(self, blobs: dict[str, bytes]):
+        self._blobs = blobs
+        self._loaded: dict[str, dict] = {}
+
+    def __getitem__(self, module: str) -> dict:
+        mod = self._loaded.get(module)
+        if mod is None:
+            # setdefault: threads racing on a module all get one dict (ApiIndex memos key on id(spec))
+            mod = self._loaded.setdefault(module, marshal.loads(self._blobs[module]))
+        return mod
+
+    def __iter__(self):
+        return iter(self._blobs)
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+
+def load_api_shards(api_path: Path | None = None) -> ShardedApi | None:
+    """Sharded api if its manifest matches the current api_aliases.json, else None."""
+    api_path = api_path or API_PATH
+    shard_dir = api_path.parent / API_SHARDS_DIRNAME
+    manifest_path = shard_dir / "manifest.json"
+    if not manifest_path.exists():
+        return None
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        source = manifest.get("source") or {}
+        if api_path.exists():
+            st = api_path.stat()
+            if source.get("size") != st.st_size or source.get("mtime_ns") != st.st_mtime_ns:
+                return None  # api_aliases.json was rebuilt/edited after the shards
+        files = {m: info["file"] for m, info in (manifest.get("modules") or {}).items()}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+    return ShardedApi(shard_dir, files)
 
 
-def norm_key(text: str) -> str:
-    text = strip_colors(text).replace("\u00a0", " ")
-    text = re.sub(r"\s+", " ", text).strip().lower()
-    return text
+def load_api(api_path: Path | None = None):
+    api_path = api_path or API_PATH
+    return load_api_shards(api_path) or json.loads(api_path.read_text(encoding="utf-8"))
 
 
-def load_sign1_aliases() -> dict:
-    if not ALIASES_PATH.exists():
+def load_sign1_aliases(aliases_path: Path | None = None) -> dict:
+    aliases_path = aliases_path or ALIASES_PATH
+    if not aliases_path.exists():
         return {}
-    data = json.loads(ALIASES_PATH.read_text(encoding="utf-8"))
+    data = json.loads(aliases_path.read_text(encoding="utf-8"))
     # we store sign1 aliases here
     aliases = data.get("sign1") or {}
     return {norm_key(k): v for k, v in aliases.items()}
 
-def load_allactions_map() -> dict:
+def load_allactions_map(allactions_path: Path | None = None) -> dict:
     """
     Parses allactions.txt entries like: [(minecraft:cobblestone) Действие игрока]
     Returns normalized label -> registry id (minecraft:...)
     """
-    if not ALLACTIONS_PATH.exists():
+    allactions_path = allactions_path or ALLACTIONS_PATH
+    if not allactions_path.exists():
         return {}
-    text = ALLACTIONS_PATH.read_text(encoding="utf-8", errors="replace")
+    text = allactions_path.read_text(encoding="utf-8", errors="replace")
     # Формат: [(minecraft:item) Название действия]
     pattern = re.compile(r"\[\(([^]]+)\)\s+([^]]+)\]")
     out = {}
@@ -149,6 +195,123 @@ def load_allactions_map() -> dict:
     return out
 
 
+# mldsl_profile.Profiler while profiling (--profile, mldsl_profile.profiling()), else None
+PROFILER = None
+# mldsl_stats.CompileStats while collecting statistics (--stats, mldsl_stats.collecting()), else None
+STATS = None
+
+
+def profile_phase(name: str):
+    """Times the with-block as compiler phase `name` when profiling."""
+    return PROFILER.phase(name) if PROFILER is not None else contextlib.nullcontext()
+
+
+# [warn] lines go to the list of the innermost collect_warnings() of the current thread, else to stderr
+_WARNINGS: contextvars.ContextVar[list[str] | None] = contextvars.ContextVar("mldsl_warnings", default=None)
+
+
+def warn(message: str) -> None:
+    sink = _WARNINGS.get()
+    if sink is None:
+        print(message, file=sys.stderr)
+    else:
+        sink.append(message)
+
+
+@contextlib.contextmanager
+def collect_warnings() -> Iterator[list[str]]:
+    """Collects the [warn] lines of the with-block (of this thread only) instead of printing them."""
+    out: list[str] = []
+    token = _WARNINGS.set(out)
+    try:
+        yield out
+    finally:
+        _WARNINGS.reset(token)
+
+
+class CompilerInputs(NamedTuple):
+    api: Mapping
+    sign1_aliases: dict
+    blocks: dict
+    known_events: dict
+    # content hash of the four input files (keys compiled-block caches)
+    fingerprint: str = ""
+
+
+def input_paths(
+    api_path: Path | None = None, aliases_path: Path | None = None, allactions_path: Path | None = None
+) -> dict[str, Path]:
+    """The four input files; unset paths come from the module globals (API_PATH, ...)."""
+    api_path = api_path or API_PATH
+    return {
+        "api": api_path,
+        "catalog": api_path.parent / "actions_catalog.json",
+        "allactions": allactions_path or ALLACTIONS_PATH,
+        "aliases": aliases_path or ALIASES_PATH,
+    }
+
+
+def _build_inputs_snapshot(paths: dict[str, Path]) -> dict:
+    with profile_phase("catalog.load_api"):
+        api = load_api(paths["api"])
+        # one marshal blob per module (see SnapshotApi), without docs the compiler never reads
+        api = {
+            module: marshal.dumps({
+                name: {k: v for k, v in spec.items() if k not in API_DOC_FIELDS} if isinstance(spec, dict) else spec
+                for name, spec in api[module].items()
+            })
+            for module in api
+        }
+    with profile_phase("catalog.load_sign1_aliases"):
+        sign1_aliases = load_sign1_aliases(paths["aliases"])
+    with profile_phase("catalog.load_allactions_map"):
+        blocks = load_allactions_map(paths["allactions"])
+    with profile_phase("catalog.load_known_events"):
+        known_events = load_known_events(paths["catalog"])
+    return {"api": api, "sign1_aliases": sign1_aliases, "blocks": blocks, "known_events": known_events}
+
+
+# (input paths, their stats) -> inputs of the last load_inputs() in this process
+_LOADED_INPUTS: tuple[tuple, CompilerInputs] | None = None
+
+
+def load_inputs() -> CompilerInputs:
+    """
+    All four compiler inputs, from a marshal snapshot under the cache dir ($MLDSL_CACHE_DIR or out/.cache).
+    The snapshot is keyed by size/mtime/content hash of every input and rebuilt when any of them changes.
+    Within one process (--serve) the same object is returned while no input changed on disk, so the api
+    index and its memos stay warm; an edited out/ is picked up on the next call.
+    """
+    global _LOADED_INPUTS
+    paths = input_paths()
+    stamp = tuple((str(p), file_stat(p)) for p in paths.values())
+    if _LOADED_INPUTS is not None and _LOADED_INPUTS[0] == stamp:
+        return _LOADED_INPUTS[1]
+    inputs = read_inputs(paths)
+    _LOADED_INPUTS = (stamp, inputs)
+    return inputs
+
+
+def read_inputs(paths: dict[str, Path], *, snapshot: bool = True) -> CompilerInputs:
+    """
+    Compiler inputs of explicit `paths` (see input_paths()), without the per-process memo of load_inputs().
+    With `snapshot`, through the marshal snapshot under the cache dir next to the api.
+    """
+    key = text_digest(*(str(p) for p in paths.values()))[:16]
+    snap_path = cache_dir(paths["api"].parent / ".cache") / f"inputs-{key}.marshal"
+    with profile_phase("catalog.snapshot"):
+        if snapshot:
+            data, fingerprint = load_snapshot(
+                snap_path, paths, INPUTS_SNAPSHOT_VERSION, lambda: _build_inputs_snapshot(paths)
+            )
+        else:
+            data = _build_inputs_snapshot(paths)
+            digests = (f"{name}={file_digest(p)}" for name, p in sorted(paths.items()))
+            fingerprint = text_digest(str(INPUTS_SNAPSHOT_VERSION), *digests)
+    api = SnapshotApi(data["api"])
+    return CompilerInputs(api, data["sign1_aliases"], data["blocks"], data["known_events"], fingerprint)
+
+
 def event_variant_to_name(variant: str) -> str:
     # MVP mapping; extend later
     v = (variant or "").strip().lower()
@@ -158,184 +321,301 @@ def event_variant_to_name(variant: str) -> str:
         return "выход"
     return variant
 
+# module aliases (keep in sync with extension.js)
+MODULE_ALIASES = {
+    "игрок": "player",
+    "player": "player",
+    "событие": "event",
+    "event": "event",
+    "select": "misc",
+    "выборка": "misc",
+}
+SELECT_SHORTHANDS = {
+    "allplayers": "vse_igroki",
+    "allplayer": "vse_igroki",
+    "allmobs": "vse_moby",
+    "allentities": "vse_suschnosti",
+    "randomplayer": "sluchaynyy_igrok",
+    "randommob": "sluchaynyy_mob",
+    "randentity": "sluchaynaya_suschnost",
+    "randomentity": "sluchaynaya_suschnost",
+    "defaultplayer": "igrok_po_umolchaniyu",
+    "defaultentity": "suschnost_po_umolchaniyu",
+}
+_SELECT_KEY_RE = re.compile(r"[_\\s]+")
+NEWLINE_SHORTHANDS = ("\\n", "\n", "newline", "line", "new_line")
+
+
+class EnumTable:
+    """
+    One enum of an action with its option lookups resolved up front:
+    exact option -> separator shorthand ("", " ", "\\n") -> fuzzy (ignore spaces/case).
+    """
+
+    __slots__ = ("name", "slot", "options", "shorthands", "fuzzy")
+
+    def __init__(self, enum: dict):
+        self.name = enum.get("name")
+        self.slot = enum.get("slot")
+        opts = enum.get("options") or {}
+        self.options = opts
+        self.shorthands: dict[str, int] = {}
+        self.fuzzy: dict[str, int] = {}
+        if not isinstance(opts, dict) or not opts:
+            return
+        lowered = [(strip_colors(k).lower(), c) for k, c in opts.items()]
+        # Common server enums: no separator / space / newline. Prefer "Без разделения" for "".
+        self.shorthands[""] = next((c for lk, c in lowered if "без" in lk and "раздел" in lk), 0)
+        space = next((c for lk, c in lowered if "проб" in lk), None)
+        if space is not None:
+            self.shorthands[" "] = space
+        newline = next((c for lk, c in lowered if ("нов" in lk and "строк" in lk) or "newline" in lk), None)
+        if newline is not None:
+            for token in NEWLINE_SHORTHANDS:
+                self.shorthands[token] = newline
+        self.fuzzy = {norm_enum_value(k): c for k, c in opts.items()}
+
+    def lookup(self, raw_val: str) -> int | None:
+        if not self.options or not isinstance(self.options, dict):
+            return None
+        if raw_val in self.options:
+            return self.options[raw_val]
+        clicks = self.shorthands.get(raw_val)
+        if clicks is not None:
+            return clicks
+        return self.fuzzy.get(norm_enum_value(raw_val))
+
+
+class ApiIndex:
+    """
+    Lookup tables over one loaded api, built once per api mapping (see api_index()).
+    - names: module -> {canonical name or alias -> canonical name}, built when a module is first used
+      (so only the modules a script touches are loaded from the inputs snapshot, see SnapshotApi)
+    - collisions: (module, alias, canons) for aliases that name several actions, sorted per module; the first
+      definition in api_aliases.json wins (a canonical name always beats an alias)
+    Per-action param/enum tables are built on first use and kept; `lines`/`built` memoize
+    compile_line()/build_action() results. One index may serve several threads (a Catalog shared by
+    compile_source() calls): every LRU operation is a single OrderedDict call (atomic), and `lock` makes a
+    module's name table (and its collision warning) get built once.
+    """
+
+    __slots__ = ("api", "names", "collisions", "lines", "built", "lock", "_params", "_enums")
+
+    def __init__(self, api: Mapping):
+        self.api = api
+        self.names: dict[str, dict[str, str]] = {}
+        self.collisions: list[tuple[str, str, list[str]]] = []
+        # compile_line() LRU: stripped call text -> (pieces, spec)
+        self.lines: OrderedDict[str, tuple[tuple[str, ...], dict]] = OrderedDict()
+        # build_action() LRU: (key, slots, pos) -> (pieces, spec)
+        self.built: OrderedDict[tuple, tuple[tuple[str, ...], dict]] = OrderedDict()
+        self.lock = threading.Lock()
+        self._params: dict[int, dict[str, dict]] = {}
+        self._enums: dict[int, list[EnumTable]] = {}
+
+    def module_names(self, module: str) -> dict[str, str]:
+        names = self.names.get(module)
+        if names is not None:
+            return names
+        with self.lock:
+            names = self.names.get(module)
+            if names is None:
+                names = self._build_names(module)
+        return names
+
+    def _build_names(self, module: str) -> dict[str, str]:
+        mod = self.api.get(module)
+        names = {}
+        owners: dict[str, list[str]] = {}
+        if isinstance(mod, dict):
+            names = {canon: canon for canon in mod}
+            for canon, spec in mod.items():
+                for alias in (spec.get("aliases") or []) if isinstance(spec, dict) else []:
+                    if alias == canon:
+                        continue
+                    winner = names.setdefault(alias, canon)
+                    if winner != canon:
+                        owners.setdefault(alias, [winner]).append(canon)
+        self.names[module] = names
+        if owners:
+            found = sorted((module, a, c) for a, c in owners.items())
+            self.collisions.extend(found)
+            shown = "; ".join(f"{m}.{a} -> {', '.join(c)}" for m, a, c in found[:5])
+            more = "; ..." if len(found) > 5 else ""
+            warn(f"[warn] api {module}: {len(found)} alias collision(s), first definition wins: {shown}{more}")
+        return names
+
+    def find(self, module: str, func: str) -> tuple[str | None, dict | None]:
+        canon = self.module_names(module).get(func)
+        if canon is None:
+            return None, None
+        return canon, self.api[module][canon]
+
+    def params_by_name(self, spec: dict) -> dict[str, dict]:
+        key = id(spec)
+        table = self._params.get(key)
+        if table is None:
+            table = {p["name"]: p for p in spec.get("params") or []}
+            self._params[key] = table
+        return table
+
+    def enums(self, spec: dict) -> list[EnumTable]:
+        key = id(spec)
+        tables = self._enums.get(key)
+        if tables is None:
+            tables = [EnumTable(e) for e in spec.get("enums") or [] if e.get("name")]
+            self._enums[key] = tables
+        return tables
+
+
+_API_INDEXES: dict[int, tuple[Mapping, ApiIndex]] = {}
+_API_INDEXES_LOCK = threading.Lock()
+
+
+def api_index(api: "Mapping | ApiIndex") -> ApiIndex:
+    """
+    Index for this api mapping, created on first use (alias collisions are reported per module to stderr) and
+    kept in a small per-process cache. An ApiIndex passed in place of the api is returned as is: a Catalog owns
+    its index and hands it down (BlockCompiler, StmtChecker) as the `api` of the compile functions.
+    """
+    if type(api) is ApiIndex:
+        return api
+    hit = _API_INDEXES.get(id(api))
+    if hit is not None and hit[0] is api:
+        return hit[1]
+    with _API_INDEXES_LOCK:
+        hit = _API_INDEXES.get(id(api))
+        if hit is not None and hit[0] is api:
+            return hit[1]
+        index = ApiIndex(api)
+        if len(_API_INDEXES) >= 4:
+            _API_INDEXES.pop(next(iter(_API_INDEXES)))
+        _API_INDEXES[id(api)] = (api, index)
+    return index
+
+
+# select.<leaf>: common user wording -> in-game menu wording
+SELECT_LEAF_SYNONYMS = {
+    "приседает": "kradetsya",
+    "нашифте": "kradetsya",
+    "шифт": "kradetsya",
+    "sneak": "kradetsya",
+    "sneaking": "kradetsya",
+}
+
+
+def select_domain(spec: dict) -> str:
+    blob = " ".join(
+        [
+            strip_colors(spec.get("sign2", "")).lower(),
+            strip_colors(spec.get("gui", "")).lower(),
+            strip_colors(spec.get("menu", "")).lower(),
+        ]
+    )
+    if "игрок" in blob:
+        return "player"
+    if "моб" in blob or "сущност" in blob:
+        return "entity"
+    return "player"
+
+
+class SelectorIndex:
+    """
+    "Выбрать объект" actions of the misc module keyed by norm_ident of canon/aliases/menu/gui/sign2.
+    Leaf synonyms and shorthands (SELECT_LEAF_SYNONYMS, SELECT_SHORTHANDS) point at their targets' hits,
+    so resolving a select leaf is one dict lookup. Each hit is (canon, spec, domain).
+    """
+
+    __slots__ = ("by_leaf",)
+
+    def __init__(self, api: dict, sign1_aliases: dict):
+        select_sign1 = norm_key("Выбрать объект")
+        by_key: dict[str, list[tuple[str, dict, str]]] = {}
+        for canon, spec in (api.get("misc") or {}).items():
+            if not isinstance(spec, dict):
+                continue
+            s1n = norm_key(strip_colors(spec.get("sign1", "")).strip())
+            if s1n in sign1_aliases:
+                s1n = norm_key(sign1_aliases[s1n])
+            if s1n != select_sign1:
+                continue
+            hit = (canon, spec, select_domain(spec))
+            keys = [canon, *(spec.get("aliases") or []), spec.get("menu", ""), spec.get("gui", ""), spec.get("sign2", "")]
+            for key in dict.fromkeys(norm_ident(str(k)) for k in keys if k):
+                by_key.setdefault(key, []).append(hit)
+        self.by_leaf = by_key
+        # Synonyms win over a selector that happens to use the same word.
+        for table in (SELECT_LEAF_SYNONYMS, SELECT_SHORTHANDS):
+            for word in table:
+                leaf = SELECT_LEAF_SYNONYMS.get(word, word)
+                target = norm_ident(SELECT_SHORTHANDS.get(leaf, leaf))
+                self.by_leaf[word] = by_key.get(target, [])
+
+    def find(self, chain: str) -> tuple[str, dict]:
+        parts = [p for p in (chain or "").split(".") if p]
+        leaf = parts[-1] if parts else ""
+        if not leaf:
+            raise ValueError("select: empty selector")
+
+        hits = self.by_leaf.get(norm_ident(leaf)) or []
+        if not hits:
+            raise ValueError(f"select: неизвестный селектор `{leaf}` (chain={chain})")
+        if len(hits) == 1:
+            return hits[0][:2]
+
+        def _has_hint(parts_list: list[str], needles: tuple[str, ...]) -> bool:
+            for p in parts_list:
+                np = norm_ident(p)
+                for n in needles:
+                    if n in np:
+                        return True
+            return False
+
+        # Earlier chain segments are domain hints: select.player.<leaf> / select.mob.<leaf>
+        want_player = _has_hint(parts[:-1], ("player", "игрок"))
+        want_entity = _has_hint(parts[:-1], ("entity", "mob", "существо", "сущность", "моб"))
+        if want_player or want_entity:
+            filtered = [
+                h for h in hits if (want_player and h[2] == "player") or (want_entity and h[2] == "entity")
+            ]
+            if len(filtered) == 1:
+                return filtered[0][:2]
+            if filtered:
+                hits = filtered
+
+        opts = ", ".join([f"{c}:{strip_colors(s.get('menu',''))}" for c, s, _ in hits[:8]])
+        more = "..." if len(hits) > 8 else ""
+        raise ValueError(f"select: неоднозначно `{leaf}`. Варианты: {opts}{more}")
+
+
 def find_action(api: dict, module: str, func: str):
-    # module aliases (keep in sync with extension.js)
-    module_aliases = {
-        "игрок": "player",
-        "player": "player",
-        "событие": "event",
-        "event": "event",
-        "select": "misc",
-        "выборка": "misc",
-    }
     orig_module = module
-    module = module_aliases.get(module, module)
-    mod = api.get(module)
-    if not mod:
-        return None, None
+    module = MODULE_ALIASES.get(module, module)
     if orig_module in ("select", "выборка"):
-        key = re.sub(r"[_\\s]+", "", (func or "").strip().lower())
-        select_sh = {
-            "allplayers": "vse_igroki",
-            "allplayer": "vse_igroki",
-            "allmobs": "vse_moby",
-            "allentities": "vse_suschnosti",
-            "randomplayer": "sluchaynyy_igrok",
-            "randommob": "sluchaynyy_mob",
-            "randentity": "sluchaynaya_suschnost",
-            "randomentity": "sluchaynaya_suschnost",
-            "defaultplayer": "igrok_po_umolchaniyu",
-            "defaultentity": "suschnost_po_umolchaniyu",
-        }
-        func = select_sh.get(key, func)
-    # direct name
-    if func in mod:
-        return func, mod[func]
-    # alias match
-    for canon, spec in mod.items():
-        aliases = spec.get("aliases") or []
-        if func in aliases:
-            return canon, spec
-    return None, None
+        key = _SELECT_KEY_RE.sub("", (func or "").strip().lower())
+        func = SELECT_SHORTHANDS.get(key, func)
+    return api_index(api).find(module, func)
 
 def split_args(arg_str: str) -> list[str]:
-    parts: list[str] = []
-    buf = ""
-    in_str = False
-    str_ch = ""
-    esc = False
-    paren = 0
-    brace = 0
-    bracket = 0
-    for ch in arg_str:
-        if esc:
-            buf += ch
-            esc = False
-            continue
-        if ch == "\\":
-            esc = True
-            buf += ch
-            continue
-        if ch in ('"', "'"):
-            if in_str and ch == str_ch:
-                in_str = False
-                str_ch = ""
-            elif not in_str:
-                in_str = True
-                str_ch = ch
-            buf += ch
-            continue
-        if not in_str:
-            if ch == "(":
-                paren += 1
-            elif ch == ")":
-                paren = max(0, paren - 1)
-            elif ch == "{":
-                brace += 1
-            elif ch == "}":
-                brace = max(0, brace - 1)
-            elif ch == "[":
-                bracket += 1
-            elif ch == "]":
-                bracket = max(0, bracket - 1)
-
-        if ch == "," and not in_str and paren == 0 and brace == 0 and bracket == 0:
-            if buf.strip():
-                parts.append(buf.strip())
-            buf = ""
-            continue
-        buf += ch
-    if buf.strip():
-        parts.append(buf.strip())
-    return parts
+    return parse_args(arg_str).parts
 
 def parse_call_args(arg_str: str):
     # supports: a=1, b="x", c=var_save(name), and positional: "hello", text(hi)
-    kv: dict[str, str] = {}
-    pos: list[str] = []
-    if not arg_str.strip():
-        return kv, pos
-
-    def split_top_level_eq(token: str) -> tuple[str, str] | None:
-        s = token or ""
-        in_str = False
-        str_ch = ""
-        esc = False
-        paren = brace = bracket = 0
-        for i, ch in enumerate(s):
-            if esc:
-                esc = False
-                continue
-            if ch == "\\":
-                esc = True
-                continue
-            if ch in ('"', "'"):
-                if in_str and ch == str_ch:
-                    in_str = False
-                    str_ch = ""
-                elif not in_str:
-                    in_str = True
-                    str_ch = ch
-                continue
-            if in_str:
-                continue
-            if ch == "(":
-                paren += 1
-            elif ch == ")":
-                paren = max(0, paren - 1)
-            elif ch == "{":
-                brace += 1
-            elif ch == "}":
-                brace = max(0, brace - 1)
-            elif ch == "[":
-                bracket += 1
-            elif ch == "]":
-                bracket = max(0, bracket - 1)
-            elif ch == "=" and paren == 0 and brace == 0 and bracket == 0:
-                return s[:i], s[i + 1 :]
-        return None
+    args = parse_args(arg_str)
+    return args.kv, args.pos
+
+# Value wrappers the server understands (everything else that looks like a call is rejected).
+VALUE_WRAPPERS = frozenset({"text", "num", "var", "var_save", "arr", "arr_save", "array", "loc", "apple", "item"})
 
-    for p in split_args(arg_str):
-        # If the whole token is quoted, it's always positional (it may contain '=' inside).
-        ps = p.strip()
-        if len(ps) >= 2 and ((ps.startswith('"') and ps.endswith('"')) or (ps.startswith("'") and ps.endswith("'"))):
-            pos.append(ps[1:-1])
-            continue
-        eq = split_top_level_eq(p)
-        if eq is not None:
-            k, v = eq
-            v = v.strip()
-            if len(v) >= 2 and v.startswith('"') and v.endswith('"'):
-                v = v[1:-1]
-            kv[k.strip()] = v
-        else:
-            v = p.strip()
-            if len(v) >= 2 and v.startswith('"') and v.endswith('"'):
-                v = v[1:-1]
-            pos.append(v)
-    return kv, pos
 
 def wrap_value(mode: str | None, value: str) -> str:
     v = (value or "").strip()
     if not v:
         return v
     # Keep only known wrapper forms; everything else that looks like a call is NOT executable on server.
-    m_wrap = re.match(r"^([a-zA-Z_][a-zA-Z0-9_]*)\s*\(.*\)\s*$", v)
-    if m_wrap:
-        head = (m_wrap.group(1) or "").lower()
-        allowed = {
-            "text",
-            "num",
-            "var",
-            "var_save",
-            "arr",
-            "arr_save",
-            "array",
-            "loc",
-            "apple",
-            "item",
-        }
-        if head in allowed:
+    if v.endswith(")"):
+        head = v.partition("(")[0].rstrip()
+        if head.isascii() and head.lower() in VALUE_WRAPPERS:
             return v
     # Prevent accidental "nested calls" being treated as plain text/number/etc.
     # If user really wants the literal text `foo()` they should quote it.
@@ -363,36 +643,8 @@ def wrap_value(mode: str | None, value: str) -> str:
 # Identifiers:
 # - allow %placeholders% inside variable names (e.g. %selected%counter)
 # - keep calls/modules stricter for now (no % in module/function names)
+# Statement syntax itself is recognized by mldsl_parser.
 NAME_RE = r"[%%\w\u0400-\u04FF]+"
-CALL_RE = re.compile(r"^\s*([\w\u0400-\u04FF]+)\.([\w\u0400-\u04FF]+)\s*\((.*)\)\s*;?\s*$")
-# event(<name>) { ... }
-# - allow spaces in names (e.g. "Событие чата")
-# - allow quotes: event("Правый клик")
-EVENT_RE = re.compile(r'^\s*event\s*\(\s*(?:"([^"]+)"|([^)]+?))\s*\)\s*\{\s*$', re.I)
-BARE_CALL_RE = re.compile(r"^\s*([\w\u0400-\u04FF]+)\s*\((.*)\)\s*;?\s*$")
-FUNC_RE = re.compile(
-    rf"^\s*(?:func|function|def|функция)\s*(?:\(\s*)?([\w\u0400-\u04FF]+)(?:\s*\))?(?:\s*\(\s*([^\)]*)\s*\))?\s*\{{\s*$",
-    re.I,
-)
-LOOP_RE = re.compile(rf"^\s*(?:loop|цикл)\s+([\w\u0400-\u04FF]+)(?:\s+every)?\s+(\d+)\s*\{{\s*$", re.I)
-ASSIGN_RE = re.compile(
-    rf"^\s*(?:(save)\s+)?({NAME_RE})\s*(?:~\s*)?(?:(\*)\s*)?=\s*(.+?)\s*;?\s*$",
-    re.I,
-)
-SAVE_SHORTHAND_RE = re.compile(rf"^\s*({NAME_RE})\s*~\s*(.+?)\s*;?\s*$", re.I)
-IMPORT_RE = re.compile(r"^\s*(?:import|use|использовать)\s+([^\s;#]+)\s*;?\s*$", re.I)
-
-IFPLAYER_RE = re.compile(r"^\s*if_?player\.([\w\u0400-\u04FF]+)(?:\s*\((.*)\))?\s*\{\s*$", re.I)
-SELECTOBJECT_IFPLAYER_RE = re.compile(r"^\s*SelectObject\.player\.IfPlayer\.([\w\u0400-\u04FF]+)\s*\{\s*$", re.I)
-IFGAME_RE = re.compile(r"^\s*if_?game\.([\w\u0400-\u04FF]+)(?:\s*\((.*)\))?\s*\{\s*$", re.I)
-IFGAME_OLD_RE = re.compile(r"^\s*IfGame\.([\w\u0400-\u04FF]+)\s*\{\s*$", re.I)
-IF_RE = re.compile(r"^\s*if\s+(.+?)\s*\{\s*$", re.I)
-IFTEXT_RE = re.compile(r"^\s*iftext\s+(.+?)\s*\{\s*$", re.I)
-IFEXISTS_RE = re.compile(rf"^\s*ifexists\s*(?:\(\s*({NAME_RE})\s*\)|\s+({NAME_RE}))\s*\{{\s*$", re.I)
-SELECT_RE = re.compile(
-    r"^\s*select\.([\w\u0400-\u04FF]+(?:\.[\w\u0400-\u04FF]+)*)\s*(?:\(\s*(.*?)\s*\))?\s*(\{)?\s*$",
-    re.I,
-)
 
 
 def spec_menu_name(spec: dict) -> str:
@@ -580,8 +832,7 @@ def compile_if_condition(api: dict, expr: str) -> list[tuple[list[str], dict]]:
     )
     if m_exists:
         v = m_exists.group(1)
-        res = compile_line(api, f"if_value.var(var=var({v}))")
-        return [res]
+        return [build_action(api, "if_value.var", {"var": f"var({v})"})]
 
     # range: low <= x <= high  OR  high >= x >= low
     m_range = re.match(
@@ -619,11 +870,14 @@ def compile_if_condition(api: dict, expr: str) -> list[tuple[list[str], dict]]:
             # enums: tip_proverki_dlya_bolshe (>,≥) and tip_proverki_dlya_menshe (<,≤)
             greater = '≥ (Больше или равно)' if lower_inclusive else '> (Больше)'
             less = '≤ (Меньше или равно)' if upper_inclusive else '< (Меньше)'
-            res = compile_line(
-                api,
-                f'if_value.number_2(num={num}, num2={num2}, num3={num3}, tip_proverki_dlya_bolshe="{greater}", tip_proverki_dlya_menshe="{less}")',
-            )
-            return [res]
+            slots = {
+                "num": num,
+                "num2": num2,
+                "num3": num3,
+                "tip_proverki_dlya_bolshe": greater,
+                "tip_proverki_dlya_menshe": less,
+            }
+            return [build_action(api, "if_value.number_2", slots)]
 
     # simple compare: lhs op rhs (numeric)
     # Use "Сравнить число" (if_value.number_2) because its GUI layout matches:
@@ -638,17 +892,15 @@ def compile_if_condition(api: dict, expr: str) -> list[tuple[list[str], dict]]:
 
         # Defaults on the server are usually strict (< and >). Only click enums for inclusive ops.
         if op in ("<", "<="):
-            args = [f"num={checked}", f"num3={bound}"]
+            slots = {"num": checked, "num3": bound}
             if op == "<=":
-                args.append('tip_proverki_dlya_menshe="≤ (Меньше или равно)"')
-            res = compile_line(api, "if_value.number_2(" + ", ".join(args) + ")")
-            return [res]
+                slots["tip_proverki_dlya_menshe"] = "≤ (Меньше или равно)"
+            return [build_action(api, "if_value.number_2", slots)]
         if op in (">", ">="):
-            args = [f"num={checked}", f"num2={bound}"]
+            slots = {"num": checked, "num2": bound}
             if op == ">=":
-                args.append('tip_proverki_dlya_bolshe="≥ (Больше или равно)"')
-            res = compile_line(api, "if_value.number_2(" + ", ".join(args) + ")")
-            return [res]
+                slots["tip_proverki_dlya_bolshe"] = "≥ (Больше или равно)"
+            return [build_action(api, "if_value.number_2", slots)]
 
     # fallback (advanced): allow direct if_value.<func>(...) by writing: if if_value.xxx(...)
     if e.startswith("if_value.") or e.startswith("if_player.") or e.startswith("if_game."):
@@ -674,9 +926,8 @@ def compile_iftext_condition(api: dict, expr: str) -> list[tuple[list[str], dict
 
     target = operand_to_text_token(target_raw)
     opts = [operand_to_text_token(p) for p in parts[:7]]
-    args = [f"text={target}"] + [f"text{i+2}={v}" for i, v in enumerate(opts)]
-    res = compile_line(api, f"if_value.text(" + ", ".join(args) + ")")
-    return [res]
+    slots = {"text": target, **{f"text{i+2}": v for i, v in enumerate(opts)}}
+    return [build_action(api, "if_value.text", slots)]
 
 def flatten_binop(node, op_type):
     out = []
@@ -706,15 +957,34 @@ def flatten_left_assoc(node, op_type):
     return out
 
 def compile_line(api: dict, line: str):
-    m = CALL_RE.match(line)
-    if not m:
+    # Internal sugar (stack push/pop, temps, ops) compiles the same call text over and over: memoize per api.
+    index = api_index(api)
+    memo = index.lines
+    key = line.strip()
+    hit = memo.get(key)
+    if hit is not None:
+        try:
+            memo.move_to_end(key)
+        except KeyError:  # evicted by another thread meanwhile
+            pass
+        return list(hit[0]), hit[1]
+    st = parse_call(key)
+    if st is None:
         return None
-    module, func, arg_str = m.group(1), m.group(2), m.group(3)
+    pieces, spec = compile_call(api, st.module, st.func, st.args)
+    memo[key] = (tuple(pieces), spec)
+    if len(memo) > LINE_MEMO_SIZE:
+        memo.popitem(last=False)
+    return pieces, spec
+
+def compile_call(api: dict, module: str, func: str, args: CallArgs):
+    index = api_index(api)
     canon, spec = find_action(api, module, func)
     if not spec:
         raise ValueError(f"Unknown action: {module}.{func}")
 
-    kv, pos = parse_call_args(arg_str)
+    kv = dict(args.kv)
+    pos = args.pos
     # Special-case: some actions use a plain chest without any glass "arg markers".
     # For such actions, we still want to support passing items via slot(N)=item(...)
     # so /placeadvanced can fill the chest.
@@ -767,8 +1037,14 @@ def compile_line(api: dict, line: str):
             if pname not in kv:
                 kv[pname] = raw
 
-    for p in params:
-        name = p["name"]
+    pieces.extend(slot_pieces(index, spec, kv))
+    return pieces, spec
+
+def slot_pieces(index: ApiIndex, spec: dict, kv: dict[str, str]) -> list[str]:
+    """Pieces for named values: params -> slot(N)=value, enums -> clicks(N,n)=0."""
+    pieces = []
+    # param names are unique per action (build_api_aliases numbers repeats)
+    for name, p in index.params_by_name(spec).items():
         if name not in kv:
             continue
         val = wrap_value(p.get("mode"), kv[name])
@@ -781,56 +1057,14 @@ def compile_line(api: dict, line: str):
             return s[1:-1]
         return s
 
-    def _norm_enum_value(v: str) -> str:
-        # ignore spaces/punctuation/case for matching; keep RU letters
-        s = strip_colors(v or "").lower()
-        s = re.sub(r"[\s_\\-]+", "", s)
-        s = re.sub(r"[\"'`]+", "", s)
-        return s
-
-    def _resolve_separator_shorthand(raw_val: str, opts: dict[str, int]) -> int | None:
-        # Common server enums: no separator / space / newline.
-        rv = raw_val
-        if rv in ("", None):
-            # Prefer "Без разделения"
-            for k, c in opts.items():
-                lk = strip_colors(k).lower()
-                if "без" in lk and "раздел" in lk:
-                    return c
-            return 0 if opts else None
-        if rv == " ":
-            for k, c in opts.items():
-                lk = strip_colors(k).lower()
-                if "проб" in lk:
-                    return c
-        if rv in ("\\n", "\n", "newline", "line", "new_line"):
-            for k, c in opts.items():
-                lk = strip_colors(k).lower()
-                if ("нов" in lk and "строк" in lk) or "newline" in lk:
-                    return c
-        return None
-
     # enum sugar: if key matches enum name, convert to clicks(slot,n)
-    for e in spec.get("enums") or []:
-        ename = e.get("name")
-        if not ename or ename not in kv:
+    for table in index.enums(spec):
+        ename = table.name
+        if ename not in kv:
             continue
-        raw_token = kv[ename]
-        raw_val = _unquote_preserve_spaces(raw_token)
-        opts = e.get("options") or {}
-
-        clicks = None
-        if isinstance(opts, dict) and opts:
-            # exact
-            if raw_val in opts:
-                clicks = opts[raw_val]
-            else:
-                # separator shorthands: "", " ", "\n"
-                clicks = _resolve_separator_shorthand(raw_val, opts)
-                if clicks is None:
-                    # fuzzy (ignore spaces/case)
-                    norm_map = {_norm_enum_value(k): v for k, v in opts.items()}
-                    clicks = norm_map.get(_norm_enum_value(raw_val))
+        raw_val = _unquote_preserve_spaces(kv[ename])
+        opts = table.options
+        clicks = table.lookup(raw_val)
         if clicks is None:
             # allow numeric
             try:
@@ -844,294 +1078,303 @@ def compile_line(api: dict, line: str):
 
         # IMPORTANT: server already applies 1 click when you put the item; so "clicks(...,0)" is not safe.
         if int(clicks) > 0:
-            pieces.append(f"clicks({e['slot']},{int(clicks)})=0")
+            pieces.append(f"clicks({table.slot},{int(clicks)})=0")
+
+    return pieces
 
+
+def build_action(
+    api: dict, key: str | tuple[str, ...], slots: dict[str, str] | None = None, pos: list[str] | None = None
+) -> tuple[list[str], dict]:
+    """
+    Internal actions without the text -> parse round trip of compile_line().
+    - key: canonical `module.func` (or alternatives, the first one present in the api wins)
+    - slots: param/enum name -> value as written after `=` (outer quotes already removed)
+    - pos: values for the first params in order
+    Names are checked against the spec: a typo in compiler sugar fails loudly instead of dropping a slot.
+    """
+    index = api_index(api)
+    memo_key = (key, tuple(slots.items()) if slots else (), tuple(pos) if pos else ())
+    hit = index.built.get(memo_key)
+    if hit is not None:
+        try:
+            index.built.move_to_end(memo_key)
+        except KeyError:  # evicted by another thread meanwhile
+            pass
+        return list(hit[0]), hit[1]
+    spec = None
+    for k in (key,) if isinstance(key, str) else key:
+        module, _, func = k.partition(".")
+        canon, spec = index.find(module, func)
+        if spec:
+            break
+    if not spec:
+        raise ValueError(f"Unknown action: {key if isinstance(key, str) else ' / '.join(key)}")
+
+    kv = dict(slots or {})
+    params = spec.get("params") or []
+    for idx, raw in enumerate(pos or []):
+        if idx >= len(params):
+            raise ValueError(f"{module}.{canon}: слишком много аргументов ({len(pos)})")
+        kv.setdefault(params[idx]["name"], raw)
+    by_name = index.params_by_name(spec)
+    for name in kv:
+        if name not in by_name and not any(t.name == name for t in index.enums(spec)):
+            raise ValueError(f"{module}.{canon}: неизвестный параметр `{name}`")
+    pieces = slot_pieces(index, spec, kv)
+    index.built[memo_key] = (tuple(pieces), spec)
+    if len(index.built) > LINE_MEMO_SIZE:
+        index.built.popitem(last=False)
     return pieces, spec
 
+def stack_push_action(api: dict, stack: str, value: str) -> tuple[list[str], dict]:
+    """Insert `value` at the top of an internal stack array (args/ret protocol)."""
+    slots = {"arr": f"arr({stack})", "number": f"num({STACK_TOP_INDEX})", "value": value}
+    return build_action(api, "array.vstavit_v_massiv", slots)
+
+
+def stack_peek_action(api: dict, stack: str, target: str) -> tuple[list[str], dict]:
+    """Read the top of an internal stack array into `target` (var(...)/var_save(...))."""
+    slots = {"arr": f"arr({stack})", "number": f"num({STACK_TOP_INDEX})", "var": target}
+    return build_action(api, "array.get_array", slots)
+
+
+def stack_pop_action(api: dict, stack: str) -> tuple[list[str], dict]:
+    return build_action(api, "array.remove_array", {"arr": f"arr({stack})", "number": f"num({STACK_TOP_INDEX})"})
+
+
+def debug_stack_len_actions(api: dict, stack: str, tmp: str, label: str) -> list[tuple[list[str], dict]]:
+    # Debug-only: store the stack length into a temp and print it.
+    var_name = f"{TMP_VAR_PREFIX}{tmp}"
+    return [
+        build_action(api, "array.get_array_2", {"arr": f"arr({stack})", "var": f"var({var_name})"}),
+        build_action(api, "player.message", pos=[f"DBG {label}=%var({var_name})%"]),
+    ]
+
+
 def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None = None, debug_stacks: bool = False):
-    m = BARE_CALL_RE.match(line)
-    if not m or "." in (m.group(1) or ""):
-        # assignment sugar doesn't look like a call
-        m_short = SAVE_SHORTHAND_RE.match(line)
-        if m_short:
-            name = (m_short.group(1) or "").strip()
-            rhs = (m_short.group(2) or "").strip()
-            # Don't treat `name~ = ...` as shorthand; that's regular assignment with "~" marker.
-            if rhs.lstrip().startswith("="):
-                m_short = None
-            else:
-                # Convert to normal assignment form handled below.
-                line = f"save {name} = {rhs}"
+    st = parse_line(line)
+    if st is None:
+        return None
+    if st.kind == "bare_call":
+        return compile_bare_call(api, st.func, st.args, func_sigs=func_sigs, debug_stacks=debug_stacks)
+    if st.kind == "assign":
+        return compile_assign(api, st, func_sigs=func_sigs, debug_stacks=debug_stacks)
+    return None
 
-        m_assign = ASSIGN_RE.match(line)
-        if not m_assign:
-            return None
+def wrap_any_value(token: str) -> str:
+    s = (token or "").strip()
+    if not s:
+        return "text()"
+    # keep explicit wrappers
+    if re.match(r"^(?:text|num|var|var_save|arr|arr_save|loc|item)\s*\(.*\)\s*$", s, re.I):
+        return s
+    # quoted string
+    if (s.startswith('"') and s.endswith('"')) or (s.startswith("'") and s.endswith("'")):
+        inner = s[1:-1]
+        return f"text({inner})"
+    # numeric literal / expr (simple)
+    vnum = safe_eval_number_expr(s)
+    if vnum is not None:
+        if abs(vnum - int(vnum)) < 1e-9:
+            return f"num({int(vnum)})"
+        return f"num({vnum})"
+    # fallback: treat as variable reference
+    if re.match(rf"^{NAME_RE}$", s):
+        return f"var({s})"
+    return s
 
-        save_kw = (m_assign.group(1) or "").strip().lower()
-        name = (m_assign.group(2) or "").strip()
-        op = (m_assign.group(3) or "").strip()
-        rhs = (m_assign.group(4) or "").strip()
+def compile_push_args_stack(
+    api: dict,
+    func_name: str,
+    args: list[str],
+    func_sigs: dict[str, list[str]] | None = None,
+    debug_stacks: bool = False,
+) -> list[tuple[list[str], dict]]:
+    """
+    Pushes args onto global mldsl args stack so nested calls don't overwrite each other.
+    Layout: [argc, arg1, arg2, ...] at the front (index 1..).
+    We implement by inserting argN..arg1 at index=1, then inserting argc at index=1.
+    Returns synthetic actions as list of (pieces, spec).
+    """
+    if func_sigs and func_name in func_sigs:
+        expected = len(func_sigs.get(func_name) or [])
+        if expected != len(args):
+            raise ValueError(f"{func_name}(): ожидалось аргументов {expected}, получено {len(args)}")
 
-        saved = False
-        if save_kw == "save":
-            saved = True
-        # support `name~ = ...` and `name ~ = ...`
-        if re.search(rf"^\s*(?:save\s+)?{re.escape(name)}\s*~", line, re.I):
-            saved = True
+    out = []
+    # We treat the args stack as a stack with top at STACK_TOP_INDEX.
+    # Insert args in reverse order so arg1 becomes the top element.
+    for raw_arg in reversed(args):
+        val = wrap_any_value(raw_arg)
+        out.append(stack_push_action(api, ARGS_STACK_NAME, val))
+    if debug_stacks:
+        out.extend(debug_stack_len_actions(api, ARGS_STACK_NAME, "argslen", "args_len"))
+    return out
 
-        if not name or not rhs:
-            return None
+def compile_assign(api: dict, st: Stmt, func_sigs: dict[str, list[str]] | None = None, debug_stacks: bool = False):
+    """
+    Assignment sugar: `[save] name [~] [*]= value` and `name ~ value`.
+    `st` is an "assign" statement from mldsl_parser (rhs call/list arguments are already split).
+    """
+    name = st.name
+    op = st.op
+    rhs = st.expr
+    saved = st.saved
+
+    def wrap_var_target(var_name: str, save_flag: bool) -> str:
+        return f"var_save({var_name})" if save_flag else f"var({var_name})"
+
+    def wrap_array_target(arr_name: str, save_flag: bool) -> str:
+        return f"arr_save({arr_name})" if save_flag else f"arr({arr_name})"
+
+    # Array literal sugar:
+    #   arr~ = [1, 2, "hello"]
+    # Compiles into array.ochistit_sozdat_massiv(...) + array.add_array(...) in chunks.
+    if rhs.startswith("[") and rhs.endswith("]"):
+        elems = st.args.parts if st.args is not None else []
+        wrapped = [wrap_any_value(e) for e in elems]
+        out = []
 
-        def wrap_var_target(var_name: str, save_flag: bool) -> str:
-            return f"var_save({var_name})" if save_flag else f"var({var_name})"
-
-        def wrap_array_target(arr_name: str, save_flag: bool) -> str:
-            return f"arr_save({arr_name})" if save_flag else f"arr({arr_name})"
-
-        def wrap_any_value(token: str) -> str:
-            s = (token or "").strip()
-            if not s:
-                return "text()"
-            # keep explicit wrappers
-            if re.match(r"^(?:text|num|var|var_save|arr|arr_save|loc|item)\s*\(.*\)\s*$", s, re.I):
-                return s
-            # quoted string
-            if (s.startswith('"') and s.endswith('"')) or (s.startswith("'") and s.endswith("'")):
-                inner = s[1:-1]
-                return f"text({inner})"
-            # numeric literal / expr (simple)
-            vnum = safe_eval_number_expr(s)
-            if vnum is not None:
-                if abs(vnum - int(vnum)) < 1e-9:
-                    return f"num({int(vnum)})"
-                return f"num({vnum})"
-            # fallback: treat as variable reference
-            if re.match(rf"^{NAME_RE}$", s):
-                return f"var({s})"
-            return s
+        def chunk_slots(chunk: list[str]) -> dict[str, str]:
+            slots = {"arr": wrap_array_target(name, saved)}
+            for idx, val in enumerate(chunk, start=1):
+                slots["value" if idx == 1 else f"value{idx}"] = val
+            return slots
 
-        def compile_push_args_stack(func_name: str, args: list[str]) -> list[tuple[list[str], dict]]:
-            """
-            Pushes args onto global mldsl args stack so nested calls don't overwrite each other.
-            Layout: [argc, arg1, arg2, ...] at the front (index 1..).
-            We implement by inserting argN..arg1 at index=1, then inserting argc at index=1.
-            Returns synthetic actions as list of (pieces, spec).
-            """
-            if func_sigs and func_name in func_sigs:
-                expected = len(func_sigs.get(func_name) or [])
-                if expected != len(args):
-                    raise ValueError(f"{func_name}(): ожидалось аргументов {expected}, получено {len(args)}")
+        out.append(build_action(api, ("array.ochistit_sozdat_massiv", "array.sozdat_massiv"), chunk_slots(wrapped[:9])))
+        rest = wrapped[9:]
+        for i in range(0, len(rest), 9):
+            out.append(build_action(api, "array.add_array", chunk_slots(rest[i:i + 9])))
+        return out
 
+    # Slice sugar for text: dst = src[3:5]
+    m_slice = re.match(rf"^({NAME_RE}|\".*?\"|'.*?')\[(\d+)\s*:\s*(\d+)\]$", rhs)
+    if m_slice:
+        src = m_slice.group(1)
+        start = int(m_slice.group(2))
+        end = int(m_slice.group(3))
+        if (src.startswith('"') and src.endswith('"')) or (src.startswith("'") and src.endswith("'")):
+            src_text = f"text({src[1:-1]})"
+        else:
+            src_text = f"text(%var({src})%)"
+        slots = {"var": wrap_var_target(name, saved), "text": src_text, "num": f"num({start})", "num2": f"num({end})"}
+        return [build_action(api, "var.text", slots)]
+
+    # Index sugar for array element: dst = arrName[2]
+    m_idx = re.match(rf"^({NAME_RE})\[(\d+)\]$", rhs)
+    if m_idx:
+        src_arr = m_idx.group(1)
+        idx = int(m_idx.group(2))
+        slots = {"arr": f"arr({src_arr})", "number": f"num({idx})", "var": wrap_var_target(name, saved)}
+        return [build_action(api, "array.get_array", slots)]
+
+    # Function-return sugar (sync only):
+    #   x = foo()
+    # Compiles:
+    #   call(foo)
+    #   x = pop(mldsl ret stack)
+    if st.func and st.args is not None:
+        fn = st.func
+        reserved = {
+            "event",
+            "func",
+            "function",
+            "def",
+            "loop",
+            "цикл",
+            "функция",
+            "if",
+            "iftext",
+            "ifexists",
+        }
+        if fn and fn not in reserved:
+            # positional args only for now
+            args = st.args.parts
             out = []
-            # We treat the args stack as a stack with top at STACK_TOP_INDEX.
-            # Insert args in reverse order so arg1 becomes the top element.
-            for raw_arg in reversed(args):
-                val = wrap_any_value(raw_arg)
-                res = compile_line(
-                    api,
-                    f"array.vstavit_v_massiv(arr=arr({ARGS_STACK_NAME}), number=num({STACK_TOP_INDEX}), value={val})",
-                )
-                if not res:
-                    raise ValueError("args: не найдено действие 'Вставить в массив'")
-                out.append(res)
+            # push args (if any)
+            if args:
+                out.extend(compile_push_args_stack(api, fn, args, func_sigs=func_sigs, debug_stacks=debug_stacks))
+            # 1) call(func) (sync)
+            game = api_index(api).api.get("game", {})
+            spec_call = game.get("call_function") or game.get("вызвать_функцию")
+            if not spec_call:
+                raise ValueError("Function call sugar failed: no call_function action in api")
+            out.append(([f"slot(13)=text({fn})"], spec_call))
             if debug_stacks:
-                res = compile_line(api, f"array.get_array_2(arr=arr({ARGS_STACK_NAME}), var=var({TMP_VAR_PREFIX}argslen))")
-                if res:
-                    out.append(res)
-                res = compile_line(api, f'player.message("DBG args_len=%var({TMP_VAR_PREFIX}argslen)%")')
-                if res:
-                    out.append(res)
-            return out
-
-        # Array literal sugar:
-        #   arr~ = [1, 2, "hello"]
-        # Compiles into array.ochistit_sozdat_massiv(...) + array.add_array(...) in chunks.
-        if rhs.startswith("[") and rhs.endswith("]"):
-            inner = rhs[1:-1].strip()
-            elems = split_args(inner) if inner else []
-            wrapped = [wrap_any_value(e) for e in elems]
-            out = []
-
-            first_chunk = wrapped[:9]
-            parts = [f"arr={wrap_array_target(name, saved)}"]
-            for idx, val in enumerate(first_chunk, start=1):
-                key = "value" if idx == 1 else f"value{idx}"
-                parts.append(f"{key}={val}")
-
-            res = compile_line(api, f"array.ochistit_sozdat_massiv({', '.join(parts)})")
-            if not res:
-                res = compile_line(api, f"array.sozdat_massiv({', '.join(parts)})")
-            if not res:
-                raise ValueError("array literal: не найдено действие 'Очистить/Создать массив'")
-            out.append(res)
-
-            rest = wrapped[9:]
-            for i in range(0, len(rest), 9):
-                chunk = rest[i:i + 9]
-                parts = [f"arr={wrap_array_target(name, saved)}"]
-                for idx, val in enumerate(chunk, start=1):
-                    key = "value" if idx == 1 else f"value{idx}"
-                    parts.append(f"{key}={val}")
-                res = compile_line(api, f"array.add_array({', '.join(parts)})")
-                if not res:
-                    raise ValueError("array literal: не найдено действие 'Добавить в конец массива'")
-                out.append(res)
+                out.extend(debug_stack_len_actions(api, RET_STACK_NAME, "retlen_before", "ret_len_before"))
+            # 2) read ret from __ret[top] into target var, 3) pop __ret[top]
+            out.append(stack_peek_action(api, RET_STACK_NAME, wrap_var_target(name, saved)))
+            out.append(stack_pop_action(api, RET_STACK_NAME))
+            if debug_stacks:
+                out.extend(debug_stack_len_actions(api, RET_STACK_NAME, "retlen_after", "ret_len_after"))
             return out
 
-        # Slice sugar for text: dst = src[3:5]
-        m_slice = re.match(rf"^({NAME_RE}|\".*?\"|'.*?')\[(\d+)\s*:\s*(\d+)\]$", rhs)
-        if m_slice:
-            src = m_slice.group(1)
-            start = int(m_slice.group(2))
-            end = int(m_slice.group(3))
-            if (src.startswith('"') and src.endswith('"')) or (src.startswith("'") and src.endswith("'")):
-                src_text = f"text({src[1:-1]})"
+    # Determine RHS
+    rhs_wrapped = rhs
+    # quoted -> text
+    if (rhs_wrapped.startswith('"') and rhs_wrapped.endswith('"')) or (
+        rhs_wrapped.startswith("'") and rhs_wrapped.endswith("'")
+    ):
+        rhs_wrapped = f"text({rhs_wrapped[1:-1]})"
+    else:
+        # numeric constant expr -> num(result)
+        v = safe_eval_number_expr(rhs_wrapped)
+        if v is not None:
+            # keep integer if possible
+            if abs(v - int(v)) < 1e-9:
+                rhs_wrapped = f"num({int(v)})"
             else:
-                src_text = f"text(%var({src})%)"
-            synthetic = f"var.text(var={wrap_var_target(name, saved)}, text={src_text}, num=num({start}), num2=num({end}))"
-            res = compile_line(api, synthetic)
-            if not res:
-                raise ValueError("slice: не найдено действие 'Обрезать текст'")
-            return [res]
-
-        # Index sugar for array element: dst = arrName[2]
-        m_idx = re.match(rf"^({NAME_RE})\[(\d+)\]$", rhs)
-        if m_idx:
-            src_arr = m_idx.group(1)
-            idx = int(m_idx.group(2))
-            synthetic = f"array.get_array(arr=arr({src_arr}), number=num({idx}), var={wrap_var_target(name, saved)})"
-            res = compile_line(api, synthetic)
-            if not res:
-                raise ValueError("array index: не найдено действие 'Получить элемент массива'")
-            return [res]
-
-        # Function-return sugar (sync only):
-        #   x = foo()
-        # Compiles:
-        #   call(foo)
-        #   x = pop(mldsl ret stack)
-        m_call_expr = re.match(rf"^(?:([\w\u0400-\u04FF]+)\.)?([\w\u0400-\u04FF]+)\s*\((.*)\)\s*$", rhs)
-        if m_call_expr:
-            fn = (m_call_expr.group(2) or "").strip()
-            inside = (m_call_expr.group(3) or "").strip()
-            reserved = {
-                "event",
-                "func",
-                "function",
-                "def",
-                "loop",
-                "цикл",
-                "функция",
-                "if",
-                "iftext",
-                "ifexists",
-            }
-            if fn and fn not in reserved:
-                # positional args only for now
-                if inside:
-                    args = split_args(inside)
-                else:
-                    args = []
-                out = []
-                # push args (if any)
-                if args:
-                    out.extend(compile_push_args_stack(fn, args))
-                # 1) call(func) (sync)
-                spec_call = api.get("game", {}).get("call_function") or api.get("game", {}).get("вызвать_функцию")
-                if not spec_call:
-                    raise ValueError("Function call sugar failed: no call_function action in api")
-                out.append(([f"slot(13)=text({fn})"], spec_call))
-                if debug_stacks:
-                    res = compile_line(api, f"array.get_array_2(arr=arr({RET_STACK_NAME}), var=var({TMP_VAR_PREFIX}retlen_before))")
-                    if res:
-                        out.append(res)
-                    res = compile_line(api, f'player.message("DBG ret_len_before=%var({TMP_VAR_PREFIX}retlen_before)%")')
-                    if res:
-                        out.append(res)
-                # 2) read ret from __ret[top] into target var
-                target_var = wrap_var_target(name, saved)
-                res = compile_line(
-                    api, f"array.get_array(arr=arr({RET_STACK_NAME}), number=num({STACK_TOP_INDEX}), var={target_var})"
-                )
-                if not res:
-                    raise ValueError("return/pop: не найдено действие 'Получить элемент массива'")
-                out.append(res)
-                # 3) pop __ret[top]
-                res = compile_line(api, f"array.remove_array(arr=arr({RET_STACK_NAME}), number=num({STACK_TOP_INDEX}))")
-                if not res:
-                    raise ValueError("return/pop: не найдено действие 'Удалить элемент массива'")
-                out.append(res)
-                if debug_stacks:
-                    res = compile_line(api, f"array.get_array_2(arr=arr({RET_STACK_NAME}), var=var({TMP_VAR_PREFIX}retlen_after))")
-                    if res:
-                        out.append(res)
-                    res = compile_line(api, f'player.message("DBG ret_len_after=%var({TMP_VAR_PREFIX}retlen_after)%")')
-                    if res:
-                        out.append(res)
-                return out
-
-        # Determine RHS
-        rhs_wrapped = rhs
-        # quoted -> text
-        if (rhs_wrapped.startswith('"') and rhs_wrapped.endswith('"')) or (
-            rhs_wrapped.startswith("'") and rhs_wrapped.endswith("'")
-        ):
-            rhs_wrapped = f"text({rhs_wrapped[1:-1]})"
+                rhs_wrapped = f"num({v})"
         else:
-            # numeric constant expr -> num(result)
-            v = safe_eval_number_expr(rhs_wrapped)
-            if v is not None:
-                # keep integer if possible
-                if abs(v - int(v)) < 1e-9:
-                    rhs_wrapped = f"num({int(v)})"
-                else:
-                    rhs_wrapped = f"num({v})"
-            else:
-                # default: if not func-like, treat as text
-                is_func_like = False
-                if rhs_wrapped.endswith(")") and "(" in rhs_wrapped:
-                    prefix = rhs_wrapped.split("(", 1)[0]
-                    if re.match(r"^[a-zA-Z_][a-zA-Z0-9_]*$", prefix or ""):
-                        is_func_like = True
-                if not is_func_like:
-                    rhs_wrapped = f"text({rhs_wrapped})"
-
-        var_token = wrap_var_target(name, saved)
-
-        # Formula compilation: if RHS contains operators or identifiers, compile into numeric actions.
-        rhs_expr = rhs
-        rhs_expr_s, name_map = preprocess_numeric_expr(rhs_expr)
-        try:
-            node = ast.parse(rhs_expr_s, mode="eval").body
-        except Exception:
-            node = None
-
-        if is_supported_numeric_expr_ast(node) and isinstance(node, (ast.BinOp, ast.UnaryOp)):
-            # Compile expression into one or more actions; warn about action count.
-            return compile_numeric_expression(api, target_var=var_token, expr_node=node, name_map=name_map)
-
-        # If RHS is just a name (variable), treat it as number placeholder unless explicitly wrapped.
-        if isinstance(node, ast.Name):
-            rhs_wrapped = f"var({(name_map or {}).get(node.id, node.id)})"
+            # default: if not func-like, treat as text
+            is_func_like = False
+            if rhs_wrapped.endswith(")") and "(" in rhs_wrapped:
+                prefix = rhs_wrapped.split("(", 1)[0]
+                if re.match(r"^[a-zA-Z_][a-zA-Z0-9_]*$", prefix or ""):
+                    is_func_like = True
+            if not is_func_like:
+                rhs_wrapped = f"text({rhs_wrapped})"
+
+    var_token = wrap_var_target(name, saved)
+
+    # Formula compilation: if RHS contains operators or identifiers, compile into numeric actions.
+    rhs_expr = rhs
+    rhs_expr_s, name_map = preprocess_numeric_expr(rhs_expr)
+    try:
+        node = ast.parse(rhs_expr_s, mode="eval").body
+    except Exception:
+        node = None
 
-        # If user explicitly requested multiplication assignment (name * = ...), and it's a pure mul expression,
-        # compile to set_product with multiple operands.
-        if op == "*":
-            try:
-                factors_nodes = flatten_binop(node, ast.Mult) if isinstance(node, ast.BinOp) else None
-            except Exception:
-                factors_nodes = None
-            if factors_nodes and len(factors_nodes) >= 2:
-                return compile_op_action(api, "set_product", var_token, [expr_to_operand(n) for n in factors_nodes])
+    if is_supported_numeric_expr_ast(node) and isinstance(node, (ast.BinOp, ast.UnaryOp)):
+        # Compile expression into one or more actions; warn about action count.
+        return compile_numeric_expression(api, target_var=var_token, expr_node=node, name_map=name_map)
 
-        # default '=' assignment (value can be text/num/...)
-        res = compile_line(api, f"var.set_value(var={var_token}, value={rhs_wrapped})")
-        if not res:
-            raise ValueError("assignment '=' failed: no set_value action")
-        return [res]
-    name = (m.group(1) or "").strip()
-    arg_str = m.group(2) or ""
+    # If RHS is just a name (variable), treat it as number placeholder unless explicitly wrapped.
+    if isinstance(node, ast.Name):
+        rhs_wrapped = f"var({(name_map or {}).get(node.id, node.id)})"
 
+    # If user explicitly requested multiplication assignment (name * = ...), and it's a pure mul expression,
+    # compile to set_product with multiple operands.
+    if op == "*":
+        try:
+            factors_nodes = flatten_binop(node, ast.Mult) if isinstance(node, ast.BinOp) else None
+        except Exception:
+            factors_nodes = None
+        if factors_nodes and len(factors_nodes) >= 2:
+            return compile_op_action(api, "set_product", var_token, [expr_to_operand(n) for n in factors_nodes])
+
+    # default '=' assignment (value can be text/num/...)
+    return [build_action(api, "var.set_value", {"var": var_token, "value": rhs_wrapped})]
+
+def compile_bare_call(
+    api: dict,
+    name: str,
+    args: CallArgs,
+    func_sigs: dict[str, list[str]] | None = None,
+    debug_stacks: bool = False,
+):
+    """Bare `name(args)` forms: loop start/stop, call(...), and `hello()` function-call sugar."""
     def parse_bool(v: str) -> bool:
         if v is None:
             return False
@@ -1142,7 +1385,7 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
     loop_stoppers = {"stoploop", "stop_loop", "остановитьцикл", "остановить_цикл", "стопцикл", "стоп_цикл"}
 
     if name in loop_starters or name in loop_stoppers:
-        kv, pos = parse_call_args(arg_str)
+        kv, pos = dict(args.kv), args.pos
         names = []
         if pos:
             names.extend(pos)
@@ -1158,27 +1401,17 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
             else ("stop_loops", "unnamed_9", "остановить_цикл")
         )
         out = []
+        keys = tuple(f"game.{func_name}" for func_name in target_funcs)
         for i in range(0, len(cleaned), 18):
             chunk = cleaned[i:i + 18]
-            parts = []
-            for idx, val in enumerate(chunk, start=1):
-                key = "text" if idx == 1 else f"text{idx}"
-                parts.append(f"{key}={val}")
-            res = None
-            for func_name in target_funcs:
-                synthetic = f"game.{func_name}({', '.join(parts)})"
-                res = compile_line(api, synthetic)
-                if res:
-                    break
-            if not res:
-                raise ValueError(f"{name}()(): internal compile failed")
-            out.append(res)
+            slots = {("text" if idx == 1 else f"text{idx}"): val for idx, val in enumerate(chunk, start=1)}
+            out.append(build_action(api, keys, slots))
         return out
 
     # Function call by name: call(name, async=true)
     call_aliases = {"call", "invoke", "вызвать", "runfunc", "run_func"}
     if name in call_aliases:
-        kv, pos = parse_call_args(arg_str)
+        kv, pos = dict(args.kv), args.pos
         async_flag = False
         if "async" in kv:
             async_flag = parse_bool(kv.pop("async"))
@@ -1222,7 +1455,7 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
     # Sugar: hello() -> call(hello)
     reserved = loop_starters | loop_stoppers | call_aliases | {"event", "func", "function", "def", "loop", "цикл", "функция"}
     if name and name not in reserved:
-        kv, pos = parse_call_args(arg_str)
+        kv, pos = dict(args.kv), args.pos
         async_flag = False
         if "async" in kv:
             async_flag = parse_bool(kv.pop("async"))
@@ -1233,15 +1466,17 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
         # positional args: push stack frame, then call
         out = []
         if pos:
-            out.extend(compile_push_args_stack(name, pos))
+            # raw pieces keep their quotes, so `hello("x")` pushes text(x) just like `r = hello("x")`
+            out.extend(compile_push_args_stack(api, name, args.pos_raw, func_sigs=func_sigs, debug_stacks=debug_stacks))
 
         pieces = [f"slot(13)=text({name})"]
         if async_flag:
             pieces.append("clicks(16,1)=0")
-        spec = api.get("game", {}).get("call_function")
+        game = api_index(api).api.get("game", {})
+        spec = game.get("call_function")
         if not spec:
             # fallback older name
-            spec = api.get("game", {}).get("вызвать_функцию")
+            spec = game.get("вызвать_функцию")
         if not spec:
             raise ValueError("Function call sugar failed: no call_function action in api")
         out.append((pieces, spec))
@@ -1249,10 +1484,7 @@ def compile_builtin(api: dict, line: str, func_sigs: dict[str, list[str]] | None
         # As a statement-call, discard one return value to keep __ret clean.
         # (Every func gets an implicit return if it doesn't have explicit return.)
         if not async_flag:
-            res = compile_line(api, f"array.remove_array(arr=arr({RET_STACK_NAME}), number=num({STACK_TOP_INDEX}))")
-            if not res:
-                raise ValueError("return/discard: не найдено действие 'Удалить элемент массива'")
-            out.append(res)
+            out.append(stack_pop_action(api, RET_STACK_NAME))
         return out
 
     return None
@@ -1277,19 +1509,15 @@ def compile_op_action(api: dict, func_name: str, target_var: str, operands: list
         tmp_name = f"__mlcc_acc{tmp_idx}"
         chunk = remaining[:max_terms]
         remaining = remaining[max_terms:]
-        out.append(compile_line(api, f"var.{func_name}(var=var({tmp_name}), " + ", ".join(_nums_kv(chunk)) + ")"))
+        out.append(build_action(api, f"var.{func_name}", {"var": f"var({tmp_name})", **_nums_kv(chunk)}))
         # next action uses tmp as first operand
         remaining = [f"num(%var({tmp_name})%)"] + remaining
 
-    out.append(compile_line(api, f"var.{func_name}(var={target_var}, " + ", ".join(_nums_kv(remaining)) + ")"))
+    out.append(build_action(api, f"var.{func_name}", {"var": target_var, **_nums_kv(remaining)}))
     return out
 
-def _nums_kv(operands: list[str]) -> list[str]:
-    parts = []
-    for idx, op in enumerate(operands, start=1):
-        key = "num" if idx == 1 else f"num{idx}"
-        parts.append(f"{key}={op}")
-    return parts
+def _nums_kv(operands: list[str]) -> dict[str, str]:
+    return {("num" if idx == 1 else f"num{idx}"): op for idx, op in enumerate(operands, start=1)}
 
 def compile_numeric_expression(
     api: dict, target_var: str, expr_node, *, name_map: dict[str, str] | None = None
@@ -1326,9 +1554,8 @@ def compile_numeric_expression(
     def compile_into(target_tok: str, node):
         nonlocal actions
         if isinstance(node, (ast.Constant, ast.Name)):
-            actions.append(
-                compile_line(api, f"var.set_value(var={target_tok}, value={expr_to_operand(node, name_map=name_map)})")
-            )
+            value = expr_to_operand(node, name_map=name_map)
+            actions.append(build_action(api, "var.set_value", {"var": target_tok, "value": value}))
             return
 
         if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
@@ -1362,14 +1589,13 @@ def compile_numeric_expression(
         v = safe_eval_number_expr(raw)
         if v is not None:
             val = f"num({int(v) if abs(v-int(v))<1e-9 else v})"
-            res = compile_line(api, f"var.set_value(var={target_tok}, value={val})")
-            actions.append(res)
+            actions.append(build_action(api, "var.set_value", {"var": target_tok, "value": val}))
             return
         raise ValueError("unsupported numeric expression")
 
     compile_into(target_var, expr_node)
 
-    # Flatten compile_op_action outputs; they are already (pieces,spec) from compile_line.
+    # Flatten compile_op_action outputs; they are already (pieces,spec) from build_action.
     flat: list[tuple[list[str], dict]] = []
     for res in actions:
         if not res:
@@ -1379,10 +1605,7 @@ def compile_numeric_expression(
     # warn: number of actions used
     if len(flat) > 1:
         extra = len(flat) - 1
-        print(
-            f"[warn] formula for {target_var} compiled into {len(flat)} actions (+{extra})",
-            file=__import__('sys').stderr,
-        )
+        warn(f"[warn] formula for {target_var} compiled into {len(flat)} actions (+{extra})")
 
     return flat
 
@@ -1404,768 +1627,1115 @@ def build_placeadvanced_command(
     cmd = " ".join(parts)
     return cmd
 
-def compile_entries(path: Path) -> list[dict]:
-    api = load_api()
-    sign1_aliases = load_sign1_aliases()
-    blocks = load_allactions_map()
-    known_events = load_known_events()
-    # Debug-only: can be wired to CLI later.
-    debug_stacks = False
-
-    def norm_ident(s: str) -> str:
-        s = strip_colors(s or "").lower()
-        s = re.sub(r"[\s_\\-]+", "", s)
-        return s
+class Entry:
+    """
+    Plan entry inside the compiler; a plan dict ({"block", "name", "args"}) only at the output (as_dict()).
+    Action args are the tuple of slot pieces, joined (or turned into structured args) when serialized;
+    header args (`no`, loop ticks) are a str; the row separator (NEWLINE) has no name and no args.
+    Immutable: ActionResolver hands out one Entry per distinct action, shared by every place it is used.
+    """
 
-    def compile_action_tuple(module: str, func: str, arg_str: str = "") -> tuple[str, str, str]:
-        res = compile_line(api, f"{module}.{func}({arg_str})")
-        if not res:
-            raise ValueError(f"Unknown action: {module}.{func}")
-        pieces, spec = res
+    __slots__ = ("block", "name", "args", "_row")
+
+    def __init__(self, block: str, name: str | None = None, args: tuple[str, ...] | str | None = None):
+        self.block = block
+        self.name = name
+        self.args = args
+        self._row: tuple | None = None
+
+    def as_dict(self, structured: bool = False) -> dict:
+        args = self.args
+        if args is None:
+            return {"block": self.block}
+        if type(args) is tuple:
+            if structured:
+                args = [piece_to_arg(p) for p in args]
+            else:
+                args = ",".join(args) if args else "no"
+        return {"block": self.block, "name": self.name, "args": args}
+
+    def row(self) -> tuple:
+        """
+        marshal-able form for the caches (see entries_from_rows()). One tuple per Entry: marshal writes a shared
+        object once, so a cached block costs one reference per repeated action.
+        """
+        row = self._row
+        if row is None:
+            row = self._row = (self.block, self.name, self.args)
+        return row
+
+    def __reduce__(self):
+        return (Entry, (self.block, self.name, self.args))
+
+    def __repr__(self) -> str:
+        return f"Entry({self.block!r}, {self.name!r}, {self.args!r})"
+
+
+def entries_from_rows(rows: list[tuple]) -> list[Entry]:
+    """Entries of cached rows; rows shared in the marshal data give shared Entry objects again."""
+    memo: dict[int, Entry] = {}
+    out = []
+    for row in rows:
+        e = memo.get(id(row))
+        if e is None:
+            e = memo[id(row)] = Entry(*row)
+            e._row = row
+        out.append(e)
+    return out
+
+
+NEWLINE = Entry("newline")
+# closes an if bracket (see BlockCompiler._compile)
+SKIP = Entry("skip", "", ())
+
+
+class ActionResolver:
+    """
+    spec -> (block_tok, plan name) for plan entries, resolved once per spec.
+    The plan name embeds metadata for skip-matching: `menu||expectedSign2` (or just the menu name).
+    entry() interns the Entry objects: generated code repeats the same actions over and over.
+    """
+
+    __slots__ = ("sign1_aliases", "blocks", "_resolved", "_entries")
+
+    def __init__(self, sign1_aliases: dict, blocks: dict):
+        self.sign1_aliases = sign1_aliases
+        self.blocks = blocks
+        self._resolved: dict[int, tuple[dict, tuple[str, str]]] = {}
+        self._entries: dict[tuple, Entry] = {}
+
+    def resolve(self, spec: dict) -> tuple[str, str]:
+        hit = self._resolved.get(id(spec))
+        if hit is not None and hit[0] is spec:
+            return hit[1]
         sign1 = strip_colors(spec.get("sign1", "")).strip()
         sign2 = spec_menu_name(spec)
         menu = strip_colors(spec.get("menu", "")).strip()
         sign1_norm = norm_key(sign1)
-        if sign1_norm in sign1_aliases:
-            sign1_norm = norm_key(sign1_aliases[sign1_norm])
-        block = blocks.get(sign1_norm)
+        # apply alias if needed
+        if sign1_norm in self.sign1_aliases:
+            sign1_norm = norm_key(self.sign1_aliases[sign1_norm])
+        block = self.blocks.get(sign1_norm)
         if not block:
             raise ValueError(
                 f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
             )
+        # PlaceModule accepts blockTok without minecraft: prefix too, but keep raw path
         block_tok = block.replace("minecraft:", "")
         expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-        StringName = sign2
+        name = sign2
         if expected_sign2:
-            StringName = f"{(menu or sign2)}||{expected_sign2}"
-        return (block_tok, StringName, ",".join(pieces) if pieces else "no"), spec
-
-    # Selection (Выбрать объект) scoping:
-    # `select.xxx { ... }` restores the previous selection on `}`.
-    DEFAULT_SELECT_PLAYER, _ = compile_action_tuple("misc", "vybrat_igroka_po_umolchaniyu")
-    DEFAULT_SELECT_ENTITY, _ = compile_action_tuple("misc", "vybrat_suschnost_po_umolchaniyu")
-    current_select: tuple[str, str, str] | None = None
-    select_stack: list[tuple[str, str, str] | None] = []
-    select_default_stack: list[tuple[str, str, str]] = []
-
-    def select_domain(spec: dict) -> str:
-        blob = " ".join(
-            [
-                strip_colors(spec.get("sign2", "")).lower(),
-                strip_colors(spec.get("gui", "")).lower(),
-                strip_colors(spec.get("menu", "")).lower(),
-            ]
-        )
-        if "игрок" in blob:
-            return "player"
-        if "моб" in blob or "сущност" in blob:
-            return "entity"
-        return "player"
+            name = f"{(menu or sign2)}||{expected_sign2}"
+        self._resolved[id(spec)] = (spec, (block_tok, name))
+        return block_tok, name
+
+    def entry(self, pieces: list[str], spec: dict) -> Entry:
+        block_tok, name = self.resolve(spec)
+        key = (block_tok, name, *pieces)
+        e = self._entries.get(key)
+        if e is None:
+            e = self._entries[key] = Entry(block_tok, name, tuple(pieces))
+        return e
+
+
+def namespace_prefix_re(namespaces: set[str]) -> re.Pattern | None:
+    """One pattern for all `ns.` prefixes of imported modules (longest first, so `lib2.` wins over `lib.`)."""
+    names = sorted((ns for ns in namespaces if ns), key=lambda ns: (-len(ns), ns))
+    if not names:
+        return None
+    return re.compile(r"\b(?:" + "|".join(re.escape(ns) for ns in names) + r")\.")
 
-    def find_select_action(chain: str) -> tuple[str, dict]:
-        mod = api.get("misc") or {}
-        parts = [p for p in (chain or "").split(".") if p]
-        leaf = parts[-1] if parts else ""
-        if not leaf:
-            raise ValueError("select: empty selector")
 
-        leaf_key = norm_ident(leaf)
-        leaf_syn = {
-            # common user wording -> in-game menu wording
-            "приседает": "kradetsya",
-            "нашифте": "kradetsya",
-            "шифт": "kradetsya",
-            "sneak": "kradetsya",
-            "sneaking": "kradetsya",
-        }
-        leaf_key = leaf_syn.get(leaf_key, leaf_key)
-        leaf_sh = {
-            "allplayers": "vse_igroki",
-            "allplayer": "vse_igroki",
-            "allmobs": "vse_moby",
-            "allentities": "vse_suschnosti",
-            "randomplayer": "sluchaynyy_igrok",
-            "randommob": "sluchaynyy_mob",
-            "randentity": "sluchaynaya_suschnost",
-            "randomentity": "sluchaynaya_suschnost",
-            "defaultplayer": "igrok_po_umolchaniyu",
-            "defaultentity": "suschnost_po_umolchaniyu",
-        }
-        leaf_mapped = leaf_sh.get(leaf_key, leaf_key)
+def resolve_import_path(base: Path, raw: str) -> Path:
+    """`import lib/util` inside `base` -> absolute path of lib/util.mldsl next to it."""
+    rel = raw.replace("\\", "/")
+    if not rel.lower().endswith(".mldsl"):
+        rel += ".mldsl"
+    return (base.parent / rel).resolve()
 
-        select_cands: list[tuple[str, dict]] = []
-        for canon, spec in mod.items():
-            if not isinstance(spec, dict):
-                continue
-            s1 = strip_colors(spec.get("sign1", "")).strip()
-            s1n = norm_key(s1)
-            if s1n in sign1_aliases:
-                s1n = norm_key(sign1_aliases[s1n])
-            if s1n != norm_key("Выбрать объект"):
-                continue
-            select_cands.append((canon, spec))
-
-        target = norm_ident(leaf_mapped)
-        hits: list[tuple[str, dict]] = []
-        for canon, spec in select_cands:
-            keys = []
-            keys.append(canon)
-            keys.extend(spec.get("aliases") or [])
-            keys.extend([spec.get("menu", ""), spec.get("gui", ""), spec.get("sign2", "")])
-            if any(norm_ident(str(k)) == target for k in keys if k):
-                hits.append((canon, spec))
 
-        if not hits:
-            raise ValueError(f"select: неизвестный селектор `{leaf}` (chain={chain})")
+class SigRecorder(dict):
+    """func_sigs that remembers which func names were looked up (a compiled block's dependencies)."""
 
-        if len(hits) == 1:
-            return hits[0]
+    def __init__(self, sigs: dict[str, list[str]]):
+        super().__init__(sigs)
+        self.used: set[str] = set()
 
-        def _has_hint(parts_list: list[str], needles: tuple[str, ...]) -> bool:
-            for p in parts_list:
-                np = norm_ident(p)
-                for n in needles:
-                    if n in np:
-                        return True
-            return False
+    def __contains__(self, name):
+        self.used.add(name)
+        return super().__contains__(name)
 
-        want_player = _has_hint(parts[:-1], ("player", "игрок"))
-        want_entity = _has_hint(parts[:-1], ("entity", "mob", "существо", "сущность", "моб"))
-        if want_player or want_entity:
-            filtered = []
-            for canon, spec in hits:
-                dom = select_domain(spec)
-                if want_player and dom == "player":
-                    filtered.append((canon, spec))
-                elif want_entity and dom == "entity":
-                    filtered.append((canon, spec))
-            if len(filtered) == 1:
-                return filtered[0]
-            if filtered:
-                hits = filtered
+    def get(self, name, default=None):
+        self.used.add(name)
+        return super().get(name, default)
 
-        opts = ", ".join([f"{c}:{strip_colors(s.get('menu',''))}" for c, s in hits[:8]])
-        more = "..." if len(hits) > 8 else ""
-        raise ValueError(f"select: неоднозначно `{leaf}`. Варианты: {opts}{more}")
 
-    def resolve_import_path(base: Path, raw: str) -> Path:
-        rel = raw.replace("\\", "/")
-        if not rel.lower().endswith(".mldsl"):
-            rel += ".mldsl"
-        return (base.parent / rel).resolve()
+class Module(NamedTuple):
+    """One parsed source file (see load_module())."""
 
-    def load_with_imports(entry: Path) -> tuple[list[str], set[str]]:
-        """
-        Loads file and inlines `import/use/использовать <path>` directives.
-        Returns: (lines, namespaces) where namespaces are imported module stems (for optional `ns.` stripping).
-        """
-        visited: set[Path] = set()
-        namespaces: set[str] = set()
-        out: list[str] = []
+    path: str
+    digest: str  # content hash of the source
+    stat: tuple[int, int] | None  # (size, mtime_ns) of the file; None for an editor buffer
+    stmts: list[Stmt]  # without import statements
+    imports: list[tuple[int, str]]  # (position in stmts, import spec) in source order
+    funcs: list[tuple[str, list[str]]]  # func signatures defined in this file (its exports)
 
-        def rec(p: Path):
-            rp = p.resolve()
-            if rp in visited:
-                return
-            visited.add(rp)
-            if not rp.exists():
-                raise ValueError(f"import: файл не найден: {rp}")
-            for raw in rp.read_text(encoding="utf-8-sig").splitlines():
-                m = IMPORT_RE.match(raw.strip())
-                if m:
-                    spec = m.group(1).strip().strip("\"'")
-                    namespaces.add(Path(spec).stem)
-                    rec(resolve_import_path(rp, spec))
-                else:
-                    out.append(raw)
 
-        rec(entry)
-        return out, namespaces
+def _module_artifact_path(path: Path) -> Path:
+    return cache_dir(API_PATH.parent / ".cache") / "modules" / f"{text_digest(str(path))[:24]}{MODULE_ARTIFACT_SUFFIX}"
+
 
-    lines, imported_namespaces = load_with_imports(path)
+# path -> last Module loaded from disk in this process (--serve, --watch): reused while size/mtime match
+_LOADED_MODULES: dict[str, Module] = {}
 
-    # Collect function signatures (name -> param list) in advance so calls can be validated
+
+def load_module(path: Path, text: str | None = None, *, cache: bool = True) -> Module:
+    """
+    Parses one resolved source file, reusing its compiled artifact (<cache dir>/modules/*.mldslc: parsed
+    statements, imports, exported func signatures) while the file is unchanged: same size/mtime, or same
+    content hash. `text` replaces the file's content (editor buffer). Raises ValueError if the file is missing.
+    """
+    stat = None if text is not None else file_stat(path)
+    if text is None and stat is None:
+        raise ValueError(f"import: файл не найден: {path}")
+    if stat is not None and cache:
+        module = _LOADED_MODULES.get(str(path))
+        if module is not None and module.stat == stat:
+            return module
+        module = _load_module(path, None, stat, cache)
+        _LOADED_MODULES[module.path] = module
+        return module
+    return _load_module(path, text, stat, cache)
+
+
+def _load_module(path: Path, text: str | None, stat: tuple[int, int] | None, cache: bool) -> Module:
+    art_path = _module_artifact_path(path) if cache else None
+    art = read_marshal(art_path) if cache else None
+    if not isinstance(art, dict) or art.get("salt") != compiler_fingerprint():
+        art = None
+    source = None
+    if art is not None and (stat is None or art["stat"] != stat):
+        source = text.removeprefix("\ufeff") if text is not None else path.read_text(encoding="utf-8-sig")
+        if text_digest(source) != art["digest"]:
+            art = None
+        elif stat is not None:
+            art["stat"] = stat  # touched only
+            write_marshal(art_path, art)
+    src = str(path)
+    if art is not None:
+        stmts = [load_stmt(t, src) for t in art["stmts"]]
+        return Module(src, art["digest"], stat, stmts, art["imports"], art["funcs"])
+
+    if source is None:
+        source = text.removeprefix("\ufeff") if text is not None else path.read_text(encoding="utf-8-sig")
+    stmts: list[Stmt] = []
+    imports: list[tuple[int, str]] = []
+    funcs: list[tuple[str, list[str]]] = []
+    for st in parse_source(source, path=src):
+        if st.kind == "import":
+            imports.append((len(stmts), st.name.strip("\"'")))
+            continue
+        if st.kind == "func" and st.name:
+            funcs.append((st.name, list(st.params or [])))
+        stmts.append(st)
+    module = Module(src, text_digest(source), stat, stmts, imports, funcs)
+    if cache:
+        art = {
+            "salt": compiler_fingerprint(),
+            "digest": module.digest,
+            "stat": stat,
+            "stmts": [dump_stmt(st) for st in stmts],
+            "imports": imports,
+            "funcs": funcs,
+        }
+        write_marshal(art_path, art)
+    return module
+
+
+class Program(NamedTuple):
+    """Parsed entry file with its imports inlined (see load_program())."""
+
+    stmts: list[Stmt]
+    func_sigs: dict[str, list[str]]
+    # absolute path -> (content digest, stat) of every file read (entry included)
+    files: dict[str, tuple[str, tuple[int, int] | None]]
+
+
+class SourceError(NamedTuple):
+    """A problem at a source position (1-based line/col; 0 when unknown), as collected by --check."""
+
+    path: str
+    line: int
+    col: int
+    message: str
+
+
+def _import_position(path: str, text: str | None, spec: str) -> tuple[int, int]:
+    """(line, col) of the `import spec` statement in a module (only looked up when the import fails)."""
+    try:
+        source = text if text is not None else Path(path).read_text(encoding="utf-8-sig")
+    except (OSError, ValueError):
+        return 0, 0
+    for st in parse_source(source):
+        if st.kind == "import" and st.name.strip("\"'") == spec:
+            return st.line, st.col
+    return 0, 0
+
+
+def load_program(
+    path: Path, text: str | None = None, *, cache: bool = True, errors: list[SourceError] | None = None
+) -> Program:
+    """
+    Loads `path` and inlines `import/use/использовать <path>` directives (statements of all files in include
+    order), strips `ns.` prefixes of imported modules and collects func signatures.
+    `text`, if given, replaces the content of `path` (unsaved editor buffer).
+    Every file goes through load_module(), so a library imported by many entry files is parsed once.
+    With `errors`, an import that cannot be loaded and an invalid func parameter name are appended there and
+    loading goes on (--check); otherwise they raise ValueError.
+    """
+    visited: set[Path] = set()
+    namespaces: set[str] = set()
+    loaded: list[Stmt] = []
+    files: dict[str, tuple[str, tuple[int, int] | None]] = {}
+    entry_path = path.resolve()
+
+    def rec(p: Path):
+        rp = p.resolve()
+        if rp in visited:
+            return
+        visited.add(rp)
+        with profile_phase("load_module"):
+            module = load_module(rp, text if rp == entry_path else None, cache=cache)
+        files[module.path] = (module.digest, module.stat)
+        pos = 0
+        for at, spec in module.imports:
+            loaded.extend(module.stmts[pos:at])
+            pos = at
+            namespaces.add(Path(spec).stem)
+            try:
+                rec(resolve_import_path(rp, spec))
+            except (ValueError, OSError) as e:
+                if errors is None:
+                    raise
+                line, col = _import_position(module.path, text if rp == entry_path else None, spec)
+                message = str(e) if type(e) is ValueError else f"import {spec}: {e}"
+                errors.append(SourceError(module.path, line, col, message))
+        loaded.extend(module.stmts[pos:])
+
+    rec(path)
+
+    # Optional namespace sugar:
+    # If user wrote `import test2` and then uses `test2.hello()`, strip `test2.`.
+    # Server has no namespaces; this is only readability sugar (collisions are user's responsibility).
+    # Function signatures (name -> param list) are collected in the same pass so calls can be validated
     # even if the function is declared later in the file.
+    stmts: list[Stmt] = []
     func_sigs: dict[str, list[str]] = {}
-    for raw in lines:
-        m = FUNC_RE.match((raw or "").strip())
-        if not m:
-            continue
-        fname = (m.group(1) or "").strip()
-        if not fname:
-            continue
-        params_raw = (m.group(2) or "").strip()
-        params = []
-        if params_raw:
-            for part in split_args(params_raw):
-                pn = (part or "").strip()
-                if not pn:
-                    continue
+    func_defs: dict[str, Stmt] = {}
+    ns_re = namespace_prefix_re(namespaces)
+    with profile_phase("func_sigs"):
+        for st in loaded:
+            if ns_re is not None and "." in st.text:
+                line = ns_re.sub("", st.text)
+                if line != st.text:
+                    reparsed = parse_line(line, line=st.line, path=st.path)
+                    if reparsed is None:
+                        continue
+                    reparsed.col = st.col
+                    st = reparsed
+            stmts.append(st)
+            if st.kind != "func" or not st.name:
+                continue
+            for pn in st.params or []:
                 if not re.match(rf"^{NAME_RE}$", pn):
-                    raise ValueError(f"func {fname}(): недопустимое имя параметра: {pn}")
-                params.append(pn)
-        func_sigs[fname] = params
-    entries: list[dict] = []
+                    message = f"func {st.name}(): недопустимое имя параметра: {pn}"
+                    if errors is None:
+                        raise ValueError(message)
+                    errors.append(SourceError(st.path or "", st.line, st.col, message))
+            prev = func_defs.get(st.name)
+            if prev is not None and prev.path != st.path:
+                warn(
+                    f"[warn] func {st.name}: defined in {prev.path}:{prev.line} and {st.path}:{st.line}; "
+                    "the last definition's signature is used"
+                )
+            func_defs[st.name] = st
+            func_sigs[st.name] = list(st.params or [])
+    return Program(stmts, func_sigs, files)
 
-    in_block = False
-    current_kind = None  # event|func|loop
-    current_name = None
-    current_loop_ticks = None
-    current_actions: list[tuple[str, str, str]] = []
-    block_stack: list[str] = []  # nested blocks inside event/func/loop (e.g. if)
-    current_func_params: list[str] = []
-    current_func_has_return = False
-
-    def flush_block():
-        nonlocal current_kind, current_name, current_loop_ticks, current_actions, current_func_params, current_func_has_return
-        if not current_kind:
-            return
 
-        if current_kind == "event":
-            ev_name = event_variant_to_name(current_name or "")
-            nk = norm_key(ev_name)
-            if known_events and nk in known_events:
-                block, menu_name, expected_sign2 = known_events[nk]
-                entries.append({"block": block, "name": f"{menu_name}||{expected_sign2}", "args": "no"})
-            elif known_events:
-                raise ValueError(f"неизвестное событие: {ev_name}")
+BLOCK_KINDS = ("event", "func", "loop")
+# statements opening a nested `{ ... }` inside a block (select only with a block)
+NESTED_BLOCK_KINDS = ("if_player", "if_game", "ifexists", "iftext", "if")
+
+
+def split_blocks(stmts: list[Stmt]) -> list[list[Stmt]]:
+    """
+    Top-level event/func/loop blocks, each starting with its header statement and ending with its `}`.
+    Statements outside blocks are dropped (the compiler ignores them), except if-statements, which become
+    one-statement pseudo-blocks so compiling them reports the usual error in source order.
+    """
+    out: list[list[Stmt]] = []
+    cur: list[Stmt] | None = None
+    depth = 0
+    for st in stmts:
+        kind = st.kind
+        if kind in BLOCK_KINDS:
+            cur = [st]
+            out.append(cur)
+            depth = 0
+            continue
+        if cur is None:
+            if kind in NESTED_BLOCK_KINDS:
+                out.append([st])
+            continue
+        cur.append(st)
+        if kind in NESTED_BLOCK_KINDS or (kind == "select" and st.has_block):
+            depth += 1
+        elif kind == "close":
+            if depth == 0:
+                cur = None
             else:
-                # Fallback when no catalog is available.
-                entries.append({"block": "diamond_block", "name": ev_name, "args": "no"})
-        elif current_kind == "func":
-            entries.append({"block": "lapis_block", "name": (current_name or ""), "args": "no"})
-        elif current_kind == "loop":
-            ticks = int(current_loop_ticks or 5)
-            ticks = max(5, ticks)
-            entries.append({"block": "emerald_block", "name": (current_name or ""), "args": str(ticks)})
-        else:
-            raise ValueError(f"Unknown block kind: {current_kind}")
-
-        def to_tuple(res):
-            pieces, spec = res
-            args_str = ",".join(pieces) if pieces else "no"
-            sign1 = strip_colors(spec.get("sign1", "")).strip()
-            sign2 = spec_menu_name(spec)
-            menu = strip_colors(spec.get("menu", "")).strip()
-            sign1_norm = norm_key(sign1)
-            if sign1_norm in sign1_aliases:
-                sign1_norm = norm_key(sign1_aliases[sign1_norm])
-            block = blocks.get(sign1_norm)
-            if not block:
-                raise ValueError(
-                    f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-                )
-            block_tok = block.replace("minecraft:", "")
-            expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-            string_name = sign2
-            if expected_sign2:
-                string_name = f"{(menu or sign2)}||{expected_sign2}"
-            return (block_tok, string_name, args_str)
-
-        # Function prologue: pop args stack into declared param variables (sync-only protocol).
-        if current_kind == "func" and current_func_params:
-            insert_at = 0
-            for pn in current_func_params:
-                res = compile_line(
-                    api,
-                    f"array.get_array(arr=arr({ARGS_STACK_NAME}), number=num({STACK_TOP_INDEX}), var=var({pn}))",
-                )
-                if not res:
-                    raise ValueError("func args: не найдено действие 'Получить элемент массива'")
-                current_actions.insert(insert_at, to_tuple(res))
-                insert_at += 1
-                res = compile_line(
-                    api, f"array.remove_array(arr=arr({ARGS_STACK_NAME}), number=num({STACK_TOP_INDEX}))"
-                )
-                if not res:
-                    raise ValueError("func args: не найдено действие 'Удалить элемент массива'")
-                current_actions.insert(insert_at, to_tuple(res))
-                insert_at += 1
-
-        # Implicit return to keep return stack consistent.
-        if current_kind == "func" and not current_func_has_return:
-            res = compile_line(
-                api, f"array.vstavit_v_massiv(arr=arr({RET_STACK_NAME}), number=num({STACK_TOP_INDEX}), value=text())"
-            )
-            if not res:
-                raise ValueError("implicit return: не найдено действие 'Вставить в массив'")
-            current_actions.append(to_tuple(res))
+                depth -= 1
+    return out
+
+
+def block_source_key(stmts: list[Stmt]) -> str:
+    """Block fingerprint over what compilation reads from its statements (text after `ns.` stripping)."""
+    return text_digest(*(st.text for st in stmts))
+
+
+def block_tmp_count(stmts: list[Stmt]) -> int:
+    """__mldsl_tmpN variables the block uses: one per nested message(), known before compiling."""
+    return sum(1 for st in stmts if st.kind == "nested_message")
+
+
+class BlockResult(NamedTuple):
+    entries: list[Entry]
+    tmps: int  # __mldsl_tmpN variables used (numbered from the block's tmp_start)
+    deps: dict[str, list[str] | None]  # func name -> signature the block was compiled against
+    warnings: list[str]  # [warn] lines printed while compiling
 
-        for block, name, args in current_actions:
-            entries.append({"block": block, "name": name, "args": (args or "no")})
 
-        current_kind = None
+def block_warnings(e: ValueError) -> list[str]:
+    """[warn] lines a failed block printed before its error (see BlockCompiler.compile())."""
+    return getattr(e, "warnings", None) or []
+
+
+class BlockCompiler:
+    """
+    Compiles one top-level block (see split_blocks()) into plan entries. Holds only read-only state (api,
+    resolver, selectors, func signatures), so blocks compile independently of each other; the only state
+    threaded between blocks is the first free __mldsl_tmp number.
+    """
+
+    def __init__(
+        self,
+        inputs: CompilerInputs,
+        func_sigs: dict[str, list[str]],
+        debug_stacks: bool = False,
+        selectors: SelectorIndex | None = None,
+        index: ApiIndex | None = None,
+    ):
+        self.inputs = inputs
+        # passed as `api` to the compile functions (see api_index())
+        self.api = index or api_index(inputs.api)
+        self.func_sigs = func_sigs
+        # Debug-only: can be wired to CLI later.
+        self.debug_stacks = debug_stacks
+        self.resolver = ActionResolver(inputs.sign1_aliases, inputs.blocks)
+        self.selectors = selectors or SelectorIndex(inputs.api, inputs.sign1_aliases)
+        # Selection (Выбрать объект) scoping:
+        # `select.xxx { ... }` restores the previous selection on `}`.
+        self.default_select_player, _ = self.action_tuple("misc", "vybrat_igroka_po_umolchaniyu")
+        self.default_select_entity, _ = self.action_tuple("misc", "vybrat_suschnost_po_umolchaniyu")
+
+    def action_tuple(self, module: str, func: str, args: CallArgs | None = None) -> tuple[Entry, dict]:
+        pieces, spec = compile_call(self.api, module, func, args or CallArgs())
+        return self.resolver.entry(pieces, spec), spec
+
+    def compile(self, stmts: list[Stmt], tmp_start: int = 0) -> BlockResult:
+        """
+        Compiles the block; [warn] lines are not printed but returned in the result (printed in source order).
+        On a compile error, the lines collected up to it are attached to the ValueError (block_warnings()).
+        """
+        func_sigs = SigRecorder(self.func_sigs)
+        with collect_warnings() as warnings:
+            try:
+                entries, tmps = self._compile(stmts, tmp_start, func_sigs)
+            except ValueError as e:
+                e.warnings = warnings
+                raise
+        deps = {name: self.func_sigs.get(name) for name in sorted(func_sigs.used)}
+        return BlockResult(entries, tmps, deps, warnings)
+
+    def _compile(self, stmts: list[Stmt], tmp_start: int, func_sigs: dict[str, list[str]]) -> tuple[list[Entry], int]:
+        api = self.api
+        known_events = self.inputs.known_events
+        resolver = self.resolver
+        selectors = self.selectors
+        debug_stacks = self.debug_stacks
+        compile_action_tuple = self.action_tuple
+        DEFAULT_SELECT_PLAYER = self.default_select_player
+        DEFAULT_SELECT_ENTITY = self.default_select_entity
+        current_select: Entry | None = None
+        select_stack: list[Entry | None] = []
+        select_default_stack: list[Entry] = []
+        entries: list[Entry] = []
+
+        in_block = False
+        current_kind = None  # event|func|loop
         current_name = None
         current_loop_ticks = None
-        current_actions = []
-        current_func_params = []
+        current_actions: list[Entry] = []
+        block_stack: list[str] = []  # nested blocks inside event/func/loop (e.g. if)
+        current_func_params: list[str] = []
         current_func_has_return = False
 
-    def begin_new_row():
-        # split rows by inserting a newline marker between blocks
-        if entries:
-            entries.append({"block": "newline"})
+        def flush_block():
+            nonlocal current_kind, current_name, current_loop_ticks, current_actions, current_func_params, current_func_has_return
+            if not current_kind:
+                return
 
-    tmp_counter = 0
+            if current_kind == "event":
+                ev_name = event_variant_to_name(current_name or "")
+                nk = norm_key(ev_name)
+                if known_events and nk in known_events:
+                    block, menu_name, expected_sign2 = known_events[nk]
+                    entries.append(Entry(block, f"{menu_name}||{expected_sign2}", "no"))
+                elif known_events:
+                    raise ValueError(f"неизвестное событие: {ev_name}")
+                else:
+                    # Fallback when no catalog is available.
+                    entries.append(Entry("diamond_block", ev_name, "no"))
+            elif current_kind == "func":
+                entries.append(Entry("lapis_block", current_name or "", "no"))
+            elif current_kind == "loop":
+                ticks = int(current_loop_ticks or 5)
+                ticks = max(5, ticks)
+                entries.append(Entry("emerald_block", current_name or "", str(ticks)))
+            else:
+                raise ValueError(f"Unknown block kind: {current_kind}")
+
+            # Function prologue: pop args stack into declared param variables (sync-only protocol).
+            if current_kind == "func" and current_func_params:
+                insert_at = 0
+                for pn in current_func_params:
+                    current_actions.insert(insert_at, resolver.entry(*stack_peek_action(api, ARGS_STACK_NAME, f"var({pn})")))
+                    insert_at += 1
+                    current_actions.insert(insert_at, resolver.entry(*stack_pop_action(api, ARGS_STACK_NAME)))
+                    insert_at += 1
+
+            # Implicit return to keep return stack consistent.
+            if current_kind == "func" and not current_func_has_return:
+                current_actions.append(resolver.entry(*stack_push_action(api, RET_STACK_NAME, "text()")))
+
+            entries.extend(current_actions)
+
+            current_kind = None
+            current_name = None
+            current_loop_ticks = None
+            current_actions = []
+            current_func_params = []
+            current_func_has_return = False
 
-    for raw in lines:
-        line = raw.strip()
-        if not line or line.startswith("#"):
-            continue
+        tmp_counter = tmp_start
+        # --profile: the time from one statement to the next is charged to the first one's handler
+        prof = PROFILER
+        prof_kind = None
+        prof_wall = prof_cpu = 0.0
+
+        for st in stmts:
+            kind = st.kind
+            if prof is not None:
+                now, now_cpu = time.perf_counter(), time.process_time()
+                if prof_kind is not None:
+                    prof.handler(prof_kind, now - prof_wall, now_cpu - prof_cpu)
+                prof_kind, prof_wall, prof_cpu = kind, now, now_cpu
+
+            # Close nested blocks first (so } inside event/func doesn't flush the whole outer block).
+            if kind == "close" and block_stack:
+                closed = block_stack.pop()
+                if closed == "if":
+                    # Exit the server-side piston bracket by advancing the code cursor without placing anything.
+                    # (Using "air" as a pause causes some servers to desync/teleport the player.)
+                    current_actions.append(SKIP)
+                elif closed == "select":
+                    prev = select_stack.pop() if select_stack else None
+                    restore_default = select_default_stack.pop() if select_default_stack else DEFAULT_SELECT_PLAYER
+                    current_select = prev
+                    if prev is not None:
+                        current_actions.append(prev)
+                    else:
+                        # Restore to default selection to avoid leaking selection outside the scope.
+                        # Heuristic: if the last select was entity-like, restore entity default, else player default.
+                        # (If we don't know, prefer player.)
+                        current_actions.append(restore_default)
+                        current_select = restore_default
+                continue
+
+            if kind == "if_player":
+                if not in_block:
+                    raise ValueError("if_player must be inside event/func/loop block")
+                block_stack.append("if")
+                current_actions.append(resolver.entry(*compile_call(api, "if_player", st.func, st.args)))
+                continue
 
-        # Optional namespace sugar:
-        # If user wrote `import test2` and then uses `test2.hello()`, strip `test2.`.
-        # Server has no namespaces; this is only readability sugar (collisions are user's responsibility).
-        for ns in imported_namespaces:
-            if ns:
-                line = re.sub(rf"\b{re.escape(ns)}\.", "", line)
+            if kind == "if_game":
+                if not in_block:
+                    raise ValueError("if_game must be inside event/func/loop block")
+                block_stack.append("if")
+                current_actions.append(resolver.entry(*compile_call(api, "if_game", st.func, st.args)))
+                continue
+
+            if kind == "ifexists":
+                if not in_block:
+                    raise ValueError("ifexists must be inside event/func/loop block")
+                block_stack.append("if")
+                v = st.name
+                current_actions.append(resolver.entry(*build_action(api, "if_value.var", {"var": f"var({v})"})))
+                continue
+
+            if kind == "iftext":
+                if not in_block:
+                    raise ValueError("iftext must be inside event/func/loop block")
+                block_stack.append("if")
+                for pieces, spec in compile_iftext_condition(api, st.expr):
+                    current_actions.append(resolver.entry(pieces, spec))
+                continue
 
-        # Close nested blocks first (so } inside event/func doesn't flush the whole outer block).
-        if line == "}" and block_stack:
-            kind = block_stack.pop()
             if kind == "if":
-                # Exit the server-side piston bracket by advancing the code cursor without placing anything.
-                # (Using "air" as a pause causes some servers to desync/teleport the player.)
-                current_actions.append(("skip", "", "no"))
-            elif kind == "select":
-                prev = select_stack.pop() if select_stack else None
-                restore_default = select_default_stack.pop() if select_default_stack else DEFAULT_SELECT_PLAYER
-                current_select = prev
-                if prev is not None:
-                    current_actions.append(prev)
-                else:
-                    # Restore to default selection to avoid leaking selection outside the scope.
-                    # Heuristic: if the last select was entity-like, restore entity default, else player default.
-                    # (If we don't know, prefer player.)
-                    current_actions.append(restore_default)
-                    current_select = restore_default
-            continue
+                if not in_block:
+                    raise ValueError("if must be inside event/func/loop block")
+                block_stack.append("if")
+                for pieces, spec in compile_if_condition(api, st.expr):
+                    current_actions.append(resolver.entry(pieces, spec))
+                continue
 
-        m_ifp = IFPLAYER_RE.match(line)
-        if m_ifp:
+            if kind == "event":
+                flush_block()
+                current_kind = "event"
+                current_name = st.name
+                in_block = True
+                continue
+            if kind == "func":
+                flush_block()
+                current_kind = "func"
+                current_name = st.name
+                current_func_params = func_sigs.get(current_name or "", [])
+                current_func_has_return = False
+                in_block = True
+                continue
+            if kind == "loop":
+                flush_block()
+                current_kind = "loop"
+                current_name = st.name
+                current_loop_ticks = st.ticks
+                in_block = True
+                continue
+            if kind == "close":
+                in_block = False
+                flush_block()
+                continue
             if not in_block:
-                raise ValueError("if_player must be inside event/func/loop block")
-            block_stack.append("if")
-            func = (m_ifp.group(1) or "").strip()
-            arg_str = m_ifp.group(2) or ""
-            res = compile_line(api, f"if_player.{func}({arg_str})")
-            if not res:
-                raise ValueError(f"Unknown if_player condition: {func}")
-            pieces, spec = res
-            sign1 = strip_colors(spec.get("sign1", "")).strip()
-            sign2 = spec_menu_name(spec)
-            menu = strip_colors(spec.get("menu", "")).strip()
-            sign1_norm = norm_key(sign1)
-            if sign1_norm in sign1_aliases:
-                sign1_norm = norm_key(sign1_aliases[sign1_norm])
-            block = blocks.get(sign1_norm)
-            if not block:
-                raise ValueError(
-                    f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-                )
-            block_tok = block.replace("minecraft:", "")
-            # For plan: embed metadata for skip-matching.
-            # name: menu||expectedSign2
-            expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-            StringName = sign2
-            if expected_sign2:
-                StringName = f"{(menu or sign2)}||{expected_sign2}"
-            current_actions.append((block_tok, StringName, ",".join(pieces) if pieces else "no"))
-            continue
+                continue
 
-        m_select_ifp = SELECTOBJECT_IFPLAYER_RE.match(line)
-        if m_select_ifp:
-            if not in_block:
-                raise ValueError("SelectObject.player.IfPlayer must be inside event/func/loop block")
-            block_stack.append("if")
-            func = (m_select_ifp.group(1) or "").strip()
-            # Convert to lowercase for api lookup
-            func_lower = func.lower()
-            res = compile_line(api, f"if_player.{func_lower}()")
-            if not res:
-                raise ValueError(f"Unknown if_player condition: {func}")
-            pieces, spec = res
-            sign1 = strip_colors(spec.get("sign1", "")).strip()
-            sign2 = spec_menu_name(spec)
-            menu = strip_colors(spec.get("menu", "")).strip()
-            sign1_norm = norm_key(sign1)
-            if sign1_norm in sign1_aliases:
-                sign1_norm = norm_key(sign1_aliases[sign1_norm])
-            block = blocks.get(sign1_norm)
-            if not block:
-                raise ValueError(
-                    f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-                )
-            block_tok = block.replace("minecraft:", "")
-            # For plan: embed metadata for skip-matching.
-            # name: menu||expectedSign2
-            expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-            StringName = sign2
-            if expected_sign2:
-                StringName = f"{(menu or sign2)}||{expected_sign2}"
-            current_actions.append((block_tok, StringName, ",".join(pieces) if pieces else "no"))
-            continue
+            # Selection (Выбрать объект) sugar:
+            # - select.<alias>(args?)
+            # - select.player.ifplayer.<alias>(args?)  (only last segment is matched; earlier segments are hints)
+            # - select.<alias> { ... }  (restores previous selection on })
+            if kind == "select":
+                chain = st.name
+                has_block = st.has_block
+
+                prev_select = current_select
+                canon, _spec = selectors.find(chain)
+                sel_tuple, sel_spec = compile_action_tuple("misc", canon, st.args)
+                current_actions.append(sel_tuple)
+                current_select = sel_tuple
+
+                if has_block:
+                    block_stack.append("select")
+                    select_stack.append(prev_select)
+                    dom = select_domain(sel_spec)
+                    select_default_stack.append(DEFAULT_SELECT_ENTITY if dom == "entity" else DEFAULT_SELECT_PLAYER)
+                continue
 
-        m_ifgame = IFGAME_RE.match(line)
-        if m_ifgame:
-            if not in_block:
-                raise ValueError("if_game must be inside event/func/loop block")
-            block_stack.append("if")
-            func = (m_ifgame.group(1) or "").strip()
-            arg_str = m_ifgame.group(2) or ""
-            res = compile_line(api, f"if_game.{func}({arg_str})")
-            if not res:
-                raise ValueError(f"Unknown if_game condition: {func}")
-            pieces, spec = res
-            sign1 = strip_colors(spec.get("sign1", "")).strip()
-            sign2 = spec_menu_name(spec)
-            menu = strip_colors(spec.get("menu", "")).strip()
-            sign1_norm = norm_key(sign1)
-            if sign1_norm in sign1_aliases:
-                sign1_norm = norm_key(sign1_aliases[sign1_norm])
-            block = blocks.get(sign1_norm)
-            if not block:
-                raise ValueError(
-                    f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-                )
-            block_tok = block.replace("minecraft:", "")
-            # For plan: embed metadata for skip-matching.
-            # name: menu||expectedSign2
-            expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-            StringName = sign2
-            if expected_sign2:
-                StringName = f"{(menu or sign2)}||{expected_sign2}"
-            current_actions.append((block_tok, StringName, ",".join(pieces) if pieces else "no"))
-            continue
+            # Special-case: allow simple nested return in message:
+            #   player.message(foo("x"))
+            # becomes:
+            #   __tmpN = foo()
+            #   player.message("%var(__tmpN)%")
+            if kind == "nested_message":
+                fn = st.func
+                inside = st.expr
+                tmp_counter += 1
+                tmp = f"{TMP_VAR_PREFIX}{tmp_counter}"
+                builtins = compile_builtin(api, f"{tmp} = {fn}({inside})", func_sigs=func_sigs)
+                if not builtins:
+                    raise ValueError(f"Не получилось скомпилировать вызов функции {fn}() для вложенного message()")
+                current_actions.extend(resolver.entry(pieces, spec) for pieces, spec in builtins)
+                # Now emit the message itself using the computed tmp var.
+                current_actions.append(resolver.entry(*build_action(api, "player.message", pos=[f"%var({tmp})%"])))
+                continue
 
-        m_ifgame_old = IFGAME_OLD_RE.match(line)
-        if m_ifgame_old:
-            if not in_block:
-                raise ValueError("IfGame must be inside event/func/loop block")
-            block_stack.append("if")
-            func = (m_ifgame_old.group(1) or "").strip()
-            # Convert to lowercase for api lookup
-            func_lower = func.lower()
-            res = compile_line(api, f"if_game.{func_lower}()")
-            if not res:
-                raise ValueError(f"Unknown if_game condition: {func}")
-            pieces, spec = res
-            sign1 = strip_colors(spec.get("sign1", "")).strip()
-            sign2 = spec_menu_name(spec)
-            menu = strip_colors(spec.get("menu", "")).strip()
-            sign1_norm = norm_key(sign1)
-            if sign1_norm in sign1_aliases:
-                sign1_norm = norm_key(sign1_aliases[sign1_norm])
-            block = blocks.get(sign1_norm)
-            if not block:
-                raise ValueError(
-                    f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-                )
-            block_tok = block.replace("minecraft:", "")
-            # For plan: embed metadata for skip-matching.
-            # name: menu||expectedSign2
-            expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-            StringName = sign2
-            if expected_sign2:
-                StringName = f"{(menu or sign2)}||{expected_sign2}"
-            current_actions.append((block_tok, StringName, ",".join(pieces) if pieces else "no"))
-            continue
+            if kind == "return":
+                if current_kind != "func":
+                    raise ValueError("return можно использовать только внутри func{}")
+                current_func_has_return = True
+                expr = st.expr
+                # default: return empty text
+                if not expr:
+                    expr = "text()"
+                else:
+                    # normalize simple literals for return
+                    if (expr.startswith('"') and expr.endswith('"')) or (expr.startswith("'") and expr.endswith("'")):
+                        expr = f"text({expr[1:-1]})"
+                    elif re.match(r"^-?\d+(?:\.\d+)?$", expr):
+                        expr = f"num({expr})"
+                    elif re.match(rf"^{NAME_RE}$", expr) and not expr.lower().startswith(("text(", "num(", "var(", "arr(", "loc(")):
+                        expr = f"var({expr})"
+                current_actions.append(resolver.entry(*stack_push_action(api, RET_STACK_NAME, expr)))
+                continue
 
-        m_ifexists = IFEXISTS_RE.match(line)
-        if m_ifexists:
-            if not in_block:
-                raise ValueError("ifexists must be inside event/func/loop block")
-            block_stack.append("if")
-            v = (m_ifexists.group(1) or m_ifexists.group(2) or "").strip()
-            res = compile_line(api, f"if_value.var(var=var({v}))")
-            pieces, spec = res
-            sign1 = strip_colors(spec.get("sign1", "")).strip()
-            sign2 = spec_menu_name(spec)
-            menu = strip_colors(spec.get("menu", "")).strip()
-            sign1_norm = norm_key(sign1)
-            if sign1_norm in sign1_aliases:
-                sign1_norm = norm_key(sign1_aliases[sign1_norm])
-            block = blocks.get(sign1_norm)
-            if not block:
-                raise ValueError(
-                    f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-                )
-            block_tok = block.replace("minecraft:", "")
-            expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-            StringName = sign2
-            if expected_sign2:
-                StringName = f"{(menu or sign2)}||{expected_sign2}"
-            current_actions.append((block_tok, StringName, ",".join(pieces) if pieces else "no"))
-            continue
+            builtins = None
+            if kind == "bare_call":
+                builtins = compile_bare_call(api, st.func, st.args, func_sigs=func_sigs, debug_stacks=debug_stacks)
+            elif kind == "assign":
+                builtins = compile_assign(api, st, func_sigs=func_sigs, debug_stacks=debug_stacks)
+            if builtins:
+                current_actions.extend(resolver.entry(pieces, spec) for pieces, spec in builtins)
+                continue
 
-        m_ift = IFTEXT_RE.match(line)
-        if m_ift:
-            if not in_block:
-                raise ValueError("iftext must be inside event/func/loop block")
-            block_stack.append("if")
-            for res in compile_iftext_condition(api, m_ift.group(1)):
-                pieces, spec = res
-                sign1 = strip_colors(spec.get("sign1", "")).strip()
-                sign2 = spec_menu_name(spec)
-                menu = strip_colors(spec.get("menu", "")).strip()
-                sign1_norm = norm_key(sign1)
-                if sign1_norm in sign1_aliases:
-                    sign1_norm = norm_key(sign1_aliases[sign1_norm])
-                block = blocks.get(sign1_norm)
-                if not block:
-                    raise ValueError(
-                        f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-                    )
-                block_tok = block.replace("minecraft:", "")
-                expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-                StringName = sign2
-                if expected_sign2:
-                    StringName = f"{(menu or sign2)}||{expected_sign2}"
-                current_actions.append((block_tok, StringName, ",".join(pieces) if pieces else "no"))
-            continue
+            if kind != "call":
+                continue
+            current_actions.append(resolver.entry(*compile_call(api, st.module, st.func, st.args)))
 
-        m_if = IF_RE.match(line)
-        if m_if:
-            if not in_block:
-                raise ValueError("if must be inside event/func/loop block")
-            block_stack.append("if")
-            for res in compile_if_condition(api, m_if.group(1)):
-                pieces, spec = res
-                sign1 = strip_colors(spec.get("sign1", "")).strip()
-                sign2 = spec_menu_name(spec)
-                menu = strip_colors(spec.get("menu", "")).strip()
-                sign1_norm = norm_key(sign1)
-                if sign1_norm in sign1_aliases:
-                    sign1_norm = norm_key(sign1_aliases[sign1_norm])
-                block = blocks.get(sign1_norm)
-                if not block:
-                    raise ValueError(
-                        f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-                    )
-                block_tok = block.replace("minecraft:", "")
-                expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-                StringName = sign2
-                if expected_sign2:
-                    StringName = f"{(menu or sign2)}||{expected_sign2}"
-                current_actions.append((block_tok, StringName, ",".join(pieces) if pieces else "no"))
-            continue
+        flush_block()
+        if prof is not None and prof_kind is not None:
+            prof.handler(prof_kind, time.perf_counter() - prof_wall, time.process_time() - prof_cpu)
+        return entries, tmp_counter - tmp_start
 
-        m_ev = EVENT_RE.match(line)
-        if m_ev:
-            flush_block()
-            begin_new_row()
-            current_kind = "event"
-            current_name = (m_ev.group(1) or m_ev.group(2) or "").strip()
-            in_block = True
-            continue
-        m_fn = FUNC_RE.match(line)
-        if m_fn:
-            flush_block()
-            begin_new_row()
-            current_kind = "func"
-            current_name = m_fn.group(1)
-            params_raw = (m_fn.group(2) or "").strip()
-            params = func_sigs.get(current_name or "", [])
-            if params_raw and not params:
-                # should not happen (we pre-scanned), but keep safe
-                params = [p.strip() for p in split_args(params_raw) if p.strip()]
-            current_func_params = params
-            current_func_has_return = False
-            in_block = True
-            continue
-        m_lp = LOOP_RE.match(line)
-        if m_lp:
-            flush_block()
-            begin_new_row()
-            current_kind = "loop"
-            current_name = m_lp.group(1)
-            current_loop_ticks = int(m_lp.group(2))
-            in_block = True
-            continue
-        if line == "}":
-            in_block = False
-            flush_block()
-            continue
-        if not in_block:
-            continue
 
-        # Selection (Выбрать объект) sugar:
-        # - select.<alias>(args?)
-        # - select.player.ifplayer.<alias>(args?)  (only last segment is matched; earlier segments are hints)
-        # - select.<alias> { ... }  (restores previous selection on })
-        m_sel = SELECT_RE.match(line)
-        if m_sel:
-            chain = (m_sel.group(1) or "").strip()
-            arg_str = (m_sel.group(2) or "").strip()
-            has_block = bool(m_sel.group(3))
-
-            prev_select = current_select
-            canon, _spec = find_select_action(chain)
-            sel_tuple, sel_spec = compile_action_tuple("misc", canon, arg_str)
-            current_actions.append(sel_tuple)
-            current_select = sel_tuple
-
-            if has_block:
-                block_stack.append("select")
-                select_stack.append(prev_select)
-                dom = select_domain(sel_spec)
-                select_default_stack.append(DEFAULT_SELECT_ENTITY if dom == "entity" else DEFAULT_SELECT_PLAYER)
-            continue
+def compiler_fingerprint() -> str:
+    """Content hash of the compiler's own modules: compiled-block caches die with any compiler change."""
+    global _COMPILER_FINGERPRINT
+    if _COMPILER_FINGERPRINT is None:
+        here = Path(__file__).resolve().parent
+        digests = [file_digest(here / name) or "" for name in COMPILER_MODULES]
+        _COMPILER_FINGERPRINT = text_digest(str(BLOCK_CACHE_VERSION), *digests)
+    return _COMPILER_FINGERPRINT
 
-        # Special-case: allow simple nested return in message:
-        #   player.message(foo("x"))
-        # becomes:
-        #   __tmpN = foo()
-        #   player.message("%var(__tmpN)%")
-        m_nested_msg = re.match(r"^\s*player\.message\s*\(\s*([\w\u0400-\u04FF]+)\s*\((.*)\)\s*\)\s*;?\s*$", line, re.I)
-        if m_nested_msg:
-            fn = (m_nested_msg.group(1) or "").strip()
-            inside = (m_nested_msg.group(2) or "").strip()
-            tmp_counter += 1
-            tmp = f"{TMP_VAR_PREFIX}{tmp_counter}"
-            builtins = compile_builtin(api, f"{tmp} = {fn}({inside})", func_sigs=func_sigs)
-            if not builtins:
-                raise ValueError(f"Не получилось скомпилировать вызов функции {fn}() для вложенного message()")
-            for pieces, spec in builtins:
-                args_str = ",".join(pieces)
-                sign1 = strip_colors(spec.get("sign1", "")).strip()
-                sign2 = spec_menu_name(spec)
-                menu = strip_colors(spec.get("menu", "")).strip()
-                sign1_norm = norm_key(sign1)
-                if sign1_norm in sign1_aliases:
-                    sign1_norm = norm_key(sign1_aliases[sign1_norm])
-                block = blocks.get(sign1_norm)
-                if not block:
-                    raise ValueError(
-                        f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-                    )
-                block_tok = block.replace("minecraft:", "")
-                expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-                StringName = sign2
-                if expected_sign2:
-                    StringName = f"{(menu or sign2)}||{expected_sign2}"
-                current_actions.append((block_tok, StringName, args_str))
-            # Now emit the message itself using the computed tmp var.
-            res = compile_line(api, f'player.message("%var({tmp})%")')
-            if not res:
-                raise ValueError("Не найдено действие player.message()")
-            pieces, spec = res
-            args_str = ",".join(pieces)
-            sign1 = strip_colors(spec.get("sign1", "")).strip()
-            sign2 = spec_menu_name(spec)
-            menu = strip_colors(spec.get("menu", "")).strip()
-            sign1_norm = norm_key(sign1)
-            if sign1_norm in sign1_aliases:
-                sign1_norm = norm_key(sign1_aliases[sign1_norm])
-            block = blocks.get(sign1_norm)
-            if not block:
-                raise ValueError(
-                    f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-                )
-            block_tok = block.replace("minecraft:", "")
-            expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-            StringName = sign2
-            if expected_sign2:
-                StringName = f"{(menu or sign2)}||{expected_sign2}"
-            current_actions.append((block_tok, StringName, args_str))
-            continue
 
-        m_ret = re.match(r"^\s*return(?:\s*\(\s*(.*?)\s*\)\s*|\s+(.*))\s*$", line, re.I)
-        if m_ret:
-            if current_kind != "func":
-                raise ValueError("return можно использовать только внутри func{}")
-            current_func_has_return = True
-            expr = (m_ret.group(1) or m_ret.group(2) or "").strip()
-            # default: return empty text
-            if not expr:
-                expr = "text()"
-            else:
-                # normalize simple literals for return
-                if (expr.startswith('"') and expr.endswith('"')) or (expr.startswith("'") and expr.endswith("'")):
-                    expr = f"text({expr[1:-1]})"
-                elif re.match(r"^-?\d+(?:\.\d+)?$", expr):
-                    expr = f"num({expr})"
-                elif re.match(rf"^{NAME_RE}$", expr) and not expr.lower().startswith(("text(", "num(", "var(", "arr(", "loc(")):
-                    expr = f"var({expr})"
-            res = compile_line(
-                api,
-                f"array.vstavit_v_massiv(arr=arr({RET_STACK_NAME}), number=num({STACK_TOP_INDEX}), value={expr})",
-            )
-            if not res:
-                raise ValueError("return: не найдено действие 'Вставить в массив'")
-            pieces, spec = res
-            args_str = ",".join(pieces)
-            sign1 = strip_colors(spec.get("sign1", "")).strip()
-            sign2 = spec_menu_name(spec)
-            menu = strip_colors(spec.get("menu", "")).strip()
-            sign1_norm = norm_key(sign1)
-            if sign1_norm in sign1_aliases:
-                sign1_norm = norm_key(sign1_aliases[sign1_norm])
-            block = blocks.get(sign1_norm)
-            if not block:
-                raise ValueError(
-                    f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-                )
-            block_tok = block.replace("minecraft:", "")
-            expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-            StringName = sign2
-            if expected_sign2:
-                StringName = f"{(menu or sign2)}||{expected_sign2}"
-            current_actions.append((block_tok, StringName, args_str))
-            continue
+_COMPILER_FINGERPRINT: str | None = None
 
-        builtins = compile_builtin(api, line, func_sigs=func_sigs, debug_stacks=debug_stacks)
-        if builtins:
-            for pieces, spec in builtins:
-                args_str = ",".join(pieces)
-                sign1 = strip_colors(spec.get("sign1", "")).strip()
-                sign2 = spec_menu_name(spec)
-                menu = strip_colors(spec.get("menu", "")).strip()
-                sign1_norm = norm_key(sign1)
-                if sign1_norm in sign1_aliases:
-                    sign1_norm = norm_key(sign1_aliases[sign1_norm])
-                block = blocks.get(sign1_norm)
-                if not block:
-                    raise ValueError(
-                        f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json"
-                    )
-                block_tok = block.replace("minecraft:", "")
-                expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-                StringName = sign2
-                if expected_sign2:
-                    StringName = f"{(menu or sign2)}||{expected_sign2}"
-                current_actions.append((block_tok, StringName, args_str))
+
+class BlockCache:
+    """
+    Compiled blocks on disk: <cache dir>/blocks/<hash of source path>.marshal, grouped by the file a block
+    comes from, so the blocks of a shared library are reused by every entry file that imports it.
+    A record is found by block_source_key() and is valid while the salt (compiler + catalog fingerprint) and
+    the signatures of the funcs the block called are unchanged; blocks that used __mldsl_tmp variables also
+    need the same starting tmp number. Entries are stored as Entry.row() tuples.
+    Builds running in parallel threads (--serve) share one BlockCache; its methods hold its lock.
+    """
+
+    def __init__(self, root: Path, salt: str):
+        self.root = root
+        self.salt = salt
+        self.lock = threading.Lock()
+        self._stores: dict[str, dict] = {}
+        self._used: dict[str, set[str]] = {}
+        self._dirty: set[str] = set()
+
+    @classmethod
+    def open(cls, root: Path, salt: str) -> "BlockCache":
+        """The cache of the previous build in this process if root and salt match (stores stay in memory)."""
+        global _BLOCK_CACHE
+        with _BLOCK_CACHE_LOCK:
+            cache = _BLOCK_CACHE
+            if cache is None or cache.root != root or cache.salt != salt:
+                cache = _BLOCK_CACHE = cls(root, salt)
+        with cache.lock:
+            for used in cache._used.values():
+                used.clear()
+        return cache
+
+    def _path(self, src: str) -> Path:
+        return self.root / f"{text_digest(src)[:24]}.marshal"
+
+    def _store(self, src: str) -> dict:
+        store = self._stores.get(src)
+        if store is None:
+            data = read_marshal(self._path(src))
+            ok = isinstance(data, dict) and data.get("salt") == self.salt and isinstance(data.get("blocks"), dict)
+            store = data["blocks"] if ok else {}
+            self._stores[src] = store
+            self._used[src] = set()
+        return store
+
+    def get(self, src: str, key: str, func_sigs: dict[str, list[str]], tmp_start: int) -> BlockResult | None:
+        with self.lock:
+            return self._get(src, key, func_sigs, tmp_start)
+
+    def _get(self, src: str, key: str, func_sigs: dict[str, list[str]], tmp_start: int) -> BlockResult | None:
+        for rows, tmps, deps, warnings, rec_tmp_start in self._store(src).get(key, ()):
+            if tmps and rec_tmp_start != tmp_start:
+                continue
+            if any(func_sigs.get(name) != sig for name, sig in deps.items()):
+                continue
+            self._used[src].add(key)
+            return BlockResult(entries_from_rows(rows), tmps, deps, warnings)
+        return None
+
+    def put(self, src: str, key: str, tmp_start: int, result: BlockResult) -> None:
+        rows = [e.row() for e in result.entries]
+        with self.lock:
+            variants = self._store(src).setdefault(key, [])
+            variants.insert(0, (rows, result.tmps, result.deps, result.warnings, tmp_start))
+            del variants[BLOCK_CACHE_VARIANTS:]
+            self._used[src].add(key)
+            self._dirty.add(src)
+
+    def save(self) -> None:
+        with self.lock:
+            for src in self._dirty:
+                store = self._stores[src]
+                used = self._used[src]
+                # keep this build's blocks plus a few stale ones (other importers, undo of an edit)
+                spare = [k for k in store if k not in used][:BLOCK_CACHE_SPARE]
+                blocks = {k: store[k] for k in (*used, *spare)}
+                self._stores[src] = blocks
+                write_marshal(self._path(src), {"salt": self.salt, "blocks": blocks})
+            self._dirty.clear()
+
+
+_BLOCK_CACHE: BlockCache | None = None
+_BLOCK_CACHE_LOCK = threading.Lock()
+
+
+def _build_cache_path(root: Path, path: Path) -> Path:
+    return root / f"{text_digest(str(path.resolve()))[:24]}.marshal"
+
+
+def _cached_build(record_path: Path, salt: str, path: Path, text: str | None) -> dict | None:
+    """
+    Whole-build record if the salt and every file the build read are unchanged. The record holds only
+    the check data; entries (Entry.row() tuples) are in a sibling file, read only on a hit.
+    """
+    rec = read_marshal(record_path)
+    if not isinstance(rec, dict) or rec.get("salt") != salt:
+        return None
+    entry = str(path.resolve())
+    for name, (digest, stat) in (rec.get("files") or {}).items():
+        if text is not None and name == entry:
+            current = text_digest(text.removeprefix("\ufeff"))
+        elif stat is not None and file_stat(Path(name)) == stat:
             continue
+        else:
+            try:
+                current = text_digest(Path(name).read_text(encoding="utf-8-sig"))
+            except (OSError, ValueError):
+                return None
+        if current != digest:
+            return None
+    payload = read_marshal(record_path.with_suffix(".entries"))
+    if not isinstance(payload, dict) or payload.get("key") != rec.get("key"):
+        return None
+    return payload
 
-        res = compile_line(api, line)
-        if not res:
+
+def _save_build(record_path: Path, salt: str, files: dict[str, tuple], entries: list[Entry], warnings: list[str]) -> None:
+    key = text_digest(salt, *(f"{name}={digest}" for name, (digest, _stat) in sorted(files.items())))
+    rows = [e.row() for e in entries]
+    # payload first: a reader that sees the new record always finds its entries
+    write_marshal(record_path.with_suffix(".entries"), {"key": key, "entries": rows, "warnings": warnings})
+    write_marshal(record_path, {"salt": salt, "key": key, "files": files})
+
+
+# Block worker processes (compile_blocks_parallel): each builds its BlockCompiler once.
+_WORKER_COMPILER: BlockCompiler | None = None
+# below this many blocks to compile, starting the worker processes costs more than it saves
+PARALLEL_MIN_BLOCKS = 64
+
+
+def _init_block_worker(paths: tuple[str, str, str], func_sigs: dict[str, list[str]]) -> None:
+    global API_PATH, ALIASES_PATH, ALLACTIONS_PATH, _WORKER_COMPILER
+    # workers may be spawned (Windows): re-apply the input paths of the parent process
+    API_PATH, ALIASES_PATH, ALLACTIONS_PATH = (Path(p) for p in paths)
+    _WORKER_COMPILER = BlockCompiler(load_inputs(), func_sigs)
+
+
+def _compile_block_batch(
+    batch: list[tuple[int, list[tuple], int]],
+) -> list[tuple[int, BlockResult | None, tuple[str, list[str]] | None]]:
+    """
+    [(block index, result, (error, its [warn] lines))]; stops at the first error (later blocks of the batch
+    are not needed).
+    """
+    out = []
+    for idx, dumped, tmp_start in batch:
+        stmts = [load_stmt(data, path) for path, data in dumped]
+        try:
+            out.append((idx, _WORKER_COMPILER.compile(stmts, tmp_start), None))
+        except ValueError as e:
+            out.append((idx, None, (str(e), block_warnings(e))))
+            break
+    return out
+
+
+def compile_blocks_parallel(
+    todo: list[tuple[int, list[Stmt], int]], func_sigs: dict[str, list[str]], jobs: int
+) -> dict[int, BlockResult | ValueError]:
+    """
+    Compiles independent blocks [(index, stmts, tmp_start)] in `jobs` worker processes.
+    Blocks share nothing but the read-only inputs and func signatures, and every tmp_start is fixed up front
+    (block_tmp_count), so the results are the same as compiling them one after another.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    # contiguous batches (a few per worker, to even out block sizes) keep the pickling overhead per block low
+    n_batches = min(len(todo), jobs * 4)
+    size = -(-len(todo) // n_batches)
+    batches = [
+        [(idx, [(st.path, dump_stmt(st)) for st in stmts], tmp_start) for idx, stmts, tmp_start in todo[i : i + size]]
+        for i in range(0, len(todo), size)
+    ]
+    paths = (str(API_PATH), str(ALIASES_PATH), str(ALLACTIONS_PATH))
+    # workers unpickle the functions by module name; under `python mldsl_compile.py` this one is __main__
+    worker = sys.modules.get("mldsl_compile") or __import__("mldsl_compile")
+    out: dict[int, BlockResult | ValueError] = {}
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=worker._init_block_worker, initargs=(paths, dict(func_sigs))
+    ) as pool:
+        for batch in pool.map(worker._compile_block_batch, batches):
+            for idx, result, error in batch:
+                if result is not None:
+                    out[idx] = BlockResult(*result)
+                else:
+                    out[idx] = err = ValueError(error[0])
+                    err.warnings = error[1]
+    return out
+
+
+def iter_entries(
+    path: Path, text: str | None = None, *, cache: bool = True, jobs: int = 1, structured_args: bool = False
+) -> Iterator[dict]:
+    """
+    Compiles `path` (and its imports) into plan entries (dicts), yielded block by block in plan order.
+    With `structured_args`, action args are lists of slot objects (see mldsl_plan.py) instead of strings.
+    See iter_plan_entries() for the rest.
+    """
+    for e in iter_plan_entries(path, text, cache=cache, jobs=jobs):
+        yield e.as_dict(structured_args)
+
+
+def iter_plan_entries(path: Path, text: str | None = None, *, cache: bool = True, jobs: int = 1) -> Iterator[Entry]:
+    """
+    Compiles `path` (and its imports) into Entry objects, yielded block by block in plan order.
+    `text`, if given, is used as the content of `path` instead of the file on disk (unsaved editor buffer);
+    imports are still read from disk relative to `path`.
+    With `cache`, results are reused from the cache dir: the whole build when no file it read changed,
+    otherwise per top-level block (see BlockCache); only changed blocks are compiled. The caches are written
+    once the iterator is exhausted. Without `cache`, only the block being yielded is held in memory.
+    With `jobs` > 1, the blocks to compile are spread over that many worker processes (compile_blocks_parallel);
+    the output, warnings and the first error reported are the same as with jobs=1.
+    """
+    inputs = load_inputs()
+    root = cache_dir(API_PATH.parent / ".cache")
+    salt = text_digest(compiler_fingerprint(), inputs.fingerprint)
+    record_path = _build_cache_path(root / "builds", path)
+    stats = STATS
+    # statistics are counted per block: the whole-build record has no blocks
+    if cache and stats is None:
+        with profile_phase("build_cache.check"):
+            rec = _cached_build(record_path, salt, path, text)
+        if rec is not None:
+            for w in rec["warnings"]:
+                warn(w)
+            yield from entries_from_rows(rec["entries"])
+            return
+
+    blocks = BlockCache.open(root / "blocks", salt) if cache else None
+    try:
+        with collect_warnings() as warnings:
+            with profile_phase("load_program"):
+                program = load_program(path, text, cache=cache)
+            with profile_phase("compiler.init"):
+                compiler = BlockCompiler(inputs, program.func_sigs)
+    finally:
+        for w in warnings:
+            warn(w)
+
+    # tmp numbering continues across blocks; the offsets are known before compiling anything
+    work = []
+    tmp_next = 0
+    with profile_phase("split_blocks"):
+        split = split_blocks(program.stmts)
+    with profile_phase("block_cache.lookup"):
+        for stmts in split:
+            src = stmts[0].path or ""
+            key = block_source_key(stmts)
+            cached = blocks.get(src, key, program.func_sigs, tmp_next) if blocks is not None else None
+            work.append((stmts, src, key, tmp_next, cached))
+            tmp_next += block_tmp_count(stmts)
+
+    todo = [(i, stmts, tmp) for i, (stmts, _src, _key, tmp, cached) in enumerate(work) if cached is None]
+    if jobs > 1 and len(todo) >= PARALLEL_MIN_BLOCKS:
+        with profile_phase("blocks.parallel"):
+            done = compile_blocks_parallel(todo, program.func_sigs, jobs)
+    else:
+        done = {}
+    prof = PROFILER
+    # the whole-build record needs every entry and [warn] line (the block cache keeps every block's rows too);
+    # without the cache nothing is kept past its block
+    entries: list[Entry] | None = [] if blocks is not None else None
+    first = True
+    for i, (stmts, src, key, tmp_start, result) in enumerate(work):
+        cached = result is not None
+        if prof is not None:
+            wall, cpu = time.perf_counter(), time.process_time()
+        if result is None:
+            result = done.pop(i, None)
+            try:
+                if result is None:
+                    # sequential path (also blocks after a worker's first error, which are never needed)
+                    result = compiler.compile(stmts, tmp_start)
+                elif isinstance(result, ValueError):
+                    raise result
+            except ValueError as e:
+                # the failed block's [warn] lines still come before its error
+                for w in block_warnings(e):
+                    warn(w)
+                raise
+            if blocks is not None and result.entries:
+                blocks.put(src, key, tmp_start, result)
+        if prof is not None:
+            head = stmts[0]
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            prof.phase_add("blocks", wall, cpu)
+            prof.block(head.path, head.line, head.text.strip()[:60], len(stmts), wall, cpu, cached)
+        if stats is not None:
+            stats.block(stmts, result.entries)
+        for w in result.warnings:
+            warn(w)
+        if entries is not None:
+            warnings.extend(result.warnings)
+        if not result.entries:
             continue
-        pieces, spec = res
-        args_str = ",".join(pieces)
+        # split rows by inserting a newline marker between blocks
+        if not first:
+            if entries is not None:
+                entries.append(NEWLINE)
+            yield NEWLINE
+        first = False
+        if entries is not None:
+            entries.extend(result.entries)
+        yield from result.entries
+    if blocks is not None:
+        with profile_phase("block_cache.save"):
+            blocks.save()
+            _save_build(record_path, salt, program.files, entries, warnings)
+
+
+def compile_entries(
+    path: Path, text: str | None = None, *, cache: bool = True, jobs: int = 1, structured_args: bool = False
+) -> list[dict]:
+    """All plan entries of `path` as a list (see iter_entries())."""
+    return list(iter_entries(path, text, cache=cache, jobs=jobs, structured_args=structured_args))
+
+
+class Catalog:
+    """
+    Compiler inputs loaded once for library use (compile_source()): the api, sign1 aliases, allactions blocks
+    and known events, plus the api index and the selector table over them. The Catalog owns its index (not the
+    per-process api_index() cache), so its tables and memos live as long as the Catalog however many are loaded.
+    Never modified after loading (the api index only fills its memos, under its lock), so one Catalog serves
+    any number of compile_source() calls, from any number of threads. Unlike load_inputs(), it does not read
+    the module globals (API_PATH, ...).
+    """
 
-        sign1 = strip_colors(spec.get("sign1", "")).strip()
-        sign2 = spec_menu_name(spec)
-        menu = strip_colors(spec.get("menu", "")).strip()
-        sign1_norm = norm_key(sign1)
-        # apply alias if needed
-        if sign1_norm in sign1_aliases:
-            sign1_norm = norm_key(sign1_aliases[sign1_norm])
-        block = blocks.get(sign1_norm)
-        if not block:
-            raise ValueError(f"Unknown block for sign1='{sign1}' (norm='{sign1_norm}'). Add to allactions.txt or Aliases.json")
-        # PlaceModule accepts blockTok without minecraft: prefix too, but keep raw path
-        block_tok = block.replace("minecraft:", "")
-        expected_sign2 = strip_colors(spec.get("sign2", "")).strip() or strip_colors(spec.get("gui", "")).strip()
-        StringName = sign2
-        if expected_sign2:
-            StringName = f"{(menu or sign2)}||{expected_sign2}"
-        current_actions.append((block_tok, StringName, args_str))
+    __slots__ = ("inputs", "paths", "index", "selectors")
 
-    flush_block()
-    return entries
+    def __init__(self, inputs: CompilerInputs, paths: dict[str, Path] | None = None):
+        self.inputs = inputs
+        self.paths = dict(paths or {})
+        self.index = ApiIndex(inputs.api)
+        self.selectors = SelectorIndex(inputs.api, inputs.sign1_aliases)
 
-def compile_commands(path: Path) -> list[str]:
-    entries = compile_entries(path)
+    @classmethod
+    def load(cls, api_path: Path, aliases_path: Path, allactions_path: Path, *, snapshot: bool = True) -> "Catalog":
+        """
+        Reads the inputs from explicit paths (actions_catalog.json is next to the api). With `snapshot`, through
+        the marshal snapshot under the cache dir, like the CLI.
+        """
+        paths = input_paths(Path(api_path), Path(aliases_path), Path(allactions_path))
+        return cls(read_inputs(paths, snapshot=snapshot), paths)
+
+    @classmethod
+    def current(cls) -> "Catalog":
+        """The inputs the module globals point at (what the CLI compiles against)."""
+        return cls(load_inputs(), input_paths())
+
+    @property
+    def fingerprint(self) -> str:
+        return self.inputs.fingerprint
+
+
+class CompileOptions(NamedTuple):
+    name: str = "source.mldsl"  # file name of the source in messages; imports resolve next to it
+    structured_args: bool = False  # args as lists of slot objects (see mldsl_plan.py)
+    debug_stacks: bool = False
+    ir_only: bool = False  # stop after loading: no entries, only the program
+
+
+class SourceResult(NamedTuple):
+    entries: list[dict]
+    warnings: list[str]
+    # the IR: statements with imports inlined, func signatures and the files read
+    program: Program
+
+
+def compile_source(
+    text: str, catalog: Catalog, *, base_dir: Path | None = None, options: CompileOptions | None = None
+) -> SourceResult:
+    """
+    Compiles source text against `catalog`; imports are read relative to `base_dir` (default: current dir).
+    Reentrant: no module globals, no disk caches, no output: [warn] lines are returned in the result.
+    Raises ValueError on a compile error, like compile_entries(); block_warnings() of it are the [warn] lines
+    up to the error.
+    """
+    options = options or CompileOptions()
+    path = Path(base_dir or Path.cwd()).resolve() / options.name
+    entries: list[dict] = []
+    with collect_warnings() as warnings:
+        program = load_program(path, text, cache=False)
+        if options.ir_only:
+            return SourceResult(entries, warnings, program)
+        compiler = BlockCompiler(
+            catalog.inputs, program.func_sigs, options.debug_stacks, catalog.selectors, catalog.index
+        )
+        structured = options.structured_args
+        tmp_next = 0
+        for stmts in split_blocks(program.stmts):
+            try:
+                result = compiler.compile(stmts, tmp_next)
+            except ValueError as e:
+                # every [warn] line up to the error, in source order
+                warnings.extend(block_warnings(e))
+                e.warnings = warnings
+                raise
+            tmp_next += block_tmp_count(stmts)
+            warnings.extend(result.warnings)
+            if not result.entries:
+                continue
+            if entries:
+                entries.append(NEWLINE.as_dict())
+            entries.extend(e.as_dict(structured) for e in result.entries)
+    return SourceResult(entries, warnings, program)
+
+
+def compile_commands(path: Path, text: str | None = None, *, cache: bool = True, jobs: int = 1) -> list[str]:
+    entries = compile_entries(path, text, cache=cache, jobs=jobs)
     out: list[str] = []
     i = 0
     while i < len(entries):
@@ -2187,7 +2757,114 @@ def compile_commands(path: Path) -> list[str]:
         out.append(cmd)
     return out
 
+def write_plan(
+    out_path: Path,
+    entries: Iterable[dict],
+    *,
+    compact: bool = False,
+    plan_format: int = 1,
+    intern_args: bool = False,
+) -> int:
+    """
+    Plan file (see mldsl_plan.py for the formats) into `out_path`, atomically (tmp file + replace): a reader
+    (the mod, --watch) never sees a half-written plan, and a compile error while streaming leaves the
+    previous plan in place.
+    """
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(f"{out_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="\n", buffering=1 << 16) as f:
+            if plan_format == PLAN_FORMAT_V2:
+                n = dump_plan_v2(entries, f, intern_args=intern_args)
+            else:
+                n = dump_plan(entries, f, compact=compact)
+        os.replace(tmp, out_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return n
+
+
+def _rpc_source(params: dict) -> tuple[Path, str | None]:
+    """(path, text) of a --serve request; RpcError(INVALID_PARAMS) for a missing or mistyped one."""
+    from mldsl_server import INVALID_PARAMS, RpcError
+
+    path = params.get("path")
+    if not isinstance(path, str) or not path:
+        raise RpcError(INVALID_PARAMS, "params.path: ожидается непустая строка")
+    text = params.get("text")
+    if text is not None and not isinstance(text, str):
+        raise RpcError(INVALID_PARAMS, "params.text: ожидается строка")
+    return Path(path), text
+
+
+def _rpc_call(fn, params: dict) -> dict:
+    """
+    Runs fn(path, text) for a --serve request; [warn] lines go to result["warnings"] instead of stderr.
+    Requests run in parallel threads: the warnings are collected per thread (collect_warnings()).
+    """
+    from mldsl_server import COMPILE_ERROR, RpcError
+
+    path, text = _rpc_source(params)
+    with collect_warnings() as warnings:
+        try:
+            value = fn(path, text)
+        except ValueError as e:
+            raise RpcError(COMPILE_ERROR, str(e), {"warnings": warnings})
+    return {"value": value, "warnings": warnings}
+
+
+def _rpc_compile(params: dict) -> dict:
+    res = _rpc_call(compile_commands, params)
+    return {"commands": res["value"], "warnings": res["warnings"]}
+
+
+def _rpc_plan(params: dict) -> dict:
+    from mldsl_server import INVALID_PARAMS, RpcError
+
+    if params.get("out") is not None and not isinstance(params["out"], str):
+        raise RpcError(INVALID_PARAMS, "params.out: ожидается строка")
+    res = _rpc_call(compile_entries, params)
+    out = {"entries": res["value"], "warnings": res["warnings"]}
+    if params.get("out"):
+        write_plan(Path(params["out"]), res["value"])
+        out["out"] = params["out"]
+    return out
+
+
+def _rpc_check(params: dict) -> dict:
+    import mldsl_check
+
+    path, text = _rpc_source(params)
+    report = mldsl_check.check_file(path, text).as_dict()
+    return {"ok": report["ok"], "errors": report["errors"], "warnings": report["warnings"]}
+
+
+def _rpc_ping(params: dict) -> dict:
+    return {"pid": os.getpid(), "api": str(API_PATH)}
+
+
+RPC_METHODS = {
+    "compile": _rpc_compile,
+    "plan": _rpc_plan,
+    "check": _rpc_check,
+    "ping": _rpc_ping,
+}
+
+
+def serve(addr: str) -> None:
+    """--serve: keeps inputs and api index warm between requests (see mldsl_server.py for the protocol)."""
+    from mldsl_server import parse_address, serve_stdio, serve_tcp
+
+    where = parse_address(addr)
+    load_inputs()  # warm up before the first request
+    if where is None:
+        serve_stdio(RPC_METHODS)
+    else:
+        serve_tcp(RPC_METHODS, *where)
+
+
 def main():
+    global PROFILER, STATS
     try:
         import sys
         sys.stdout.reconfigure(encoding="utf-8")
@@ -2195,27 +2872,163 @@ def main():
         pass
 
     ap = argparse.ArgumentParser(add_help=True)
-    ap.add_argument("file", help="Path to .mldsl file")
+    ap.add_argument("file", nargs="?", help="Path to .mldsl file")
     ap.add_argument("--plan", dest="plan_path", default=None, help="Write plan.json (entries format) to this path")
     ap.add_argument("--print-plan", action="store_true", help="Print plan.json (entries format) to stdout")
+    ap.add_argument(
+        "--compact",
+        action="store_true",
+        help="--plan/--print-plan: no indentation, one entry per line (smaller, faster to write and load)",
+    )
+    ap.add_argument(
+        "--plan-format",
+        type=int,
+        choices=(1, PLAN_FORMAT_V2),
+        default=1,
+        help="--plan/--print-plan: 2 = interned action table (smaller, faster to load; see mldsl_plan.py)",
+    )
+    ap.add_argument("--intern-args", action="store_true", help="--plan-format 2: also intern repeated args strings")
+    ap.add_argument(
+        "--structured-args",
+        action="store_true",
+        help="--plan/--print-plan: action args as [{slot, kind, value} | {slot, clicks}] instead of strings",
+    )
+    ap.add_argument(
+        "--check",
+        action="store_true",
+        help="Only check the file and its imports: report every error with file:line:col, write no plan",
+    )
+    ap.add_argument("--json", action="store_true", help="--check: print the report as JSON to stdout")
+    ap.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Compile every block from scratch (skip the compiled-block/whole-build cache in the cache dir)",
+    )
+    ap.add_argument("--project", metavar="MANIFEST", help="Build every entry script listed in a project manifest")
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes (0 = one per CPU core): entry scripts of --project, or top-level blocks of one file",
+    )
+    ap.add_argument("--summary", default=None, help="--project: write the combined build summary JSON here")
+    ap.add_argument(
+        "--serve",
+        nargs="?",
+        const="stdio",
+        default=None,
+        metavar="ADDR",
+        help="Run a persistent JSON-RPC compile server on stdio (default) or PORT / HOST:PORT",
+    )
+    ap.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="REPORT.json",
+        help="Time every compiler phase, block and statement handler; prints a table, writes JSON if a path is given",
+    )
+    ap.add_argument("--profile-top", type=int, default=15, metavar="N", help="--profile: rows per table section")
+    ap.add_argument(
+        "--stats",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="STATS.json",
+        help="Per event/func/loop: actions, compiler sugar, temporaries, /placeadvanced length; JSON if a path is given",
+    )
+    ap.add_argument("--stats-top", type=int, default=15, metavar="N", help="--stats: blocks in the table (0 = all)")
+    ap.add_argument(
+        "--watch",
+        metavar="PATH",
+        help="Recompile on every save of a file (and its imports) or of the scripts in a folder; needs --plan",
+    )
     args = ap.parse_args()
 
+    if args.serve is not None:
+        serve(args.serve)
+        return
+    if args.project:
+        import mldsl_project
+
+        jobs = args.jobs if args.jobs > 0 else mldsl_project.default_jobs()
+        summary = mldsl_project.build_project(
+            Path(args.project),
+            jobs,
+            cache=not args.no_cache,
+            summary_path=Path(args.summary) if args.summary else None,
+        )
+        mldsl_project.print_summary(summary)
+        sys.exit(0 if summary["ok"] else 1)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if args.watch:
+        import mldsl_watch
+
+        if not args.plan_path:
+            ap.error("--watch needs --plan (a plan file, or a folder when watching a folder)")
+        mldsl_watch.watch(Path(args.watch), Path(args.plan_path), cache=not args.no_cache, jobs=jobs)
+        return
+    if not args.file:
+        ap.error("the following arguments are required: file")
+
     src = Path(args.file)
+    if args.check:
+        import mldsl_check
 
-    if args.plan_path or args.print_plan:
-        entries = compile_entries(src)
-        plan = {"entries": entries}
-        if args.plan_path:
-            out_path = Path(args.plan_path)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(json.dumps(plan, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-        if args.print_plan:
-            print(json.dumps(plan, ensure_ascii=False, indent=2))
-        return
+        report = mldsl_check.check_file(src, cache=not args.no_cache)
+        if args.json:
+            print(json.dumps(report.as_dict(), ensure_ascii=False, indent=2))
+        else:
+            mldsl_check.print_report(report)
+        sys.exit(0 if report.ok else 1)
+    if args.profile is not None:
+        from mldsl_profile import Profiler
+
+        PROFILER = Profiler()
+    if args.stats is not None:
+        from mldsl_stats import CompileStats
+
+        STATS = CompileStats(load_inputs())
+    try:
+        if args.plan_path or args.print_plan:
+            entries = iter_entries(src, cache=not args.no_cache, jobs=jobs, structured_args=args.structured_args)
+            if (args.plan_path and args.print_plan) or PROFILER is not None:
+                # when profiling, compile first so that serialization is timed on its own
+                with profile_phase("compile"):
+                    entries = list(entries)
+            with profile_phase("serialize"):
+                if args.plan_path:
+                    write_plan(
+                        Path(args.plan_path),
+                        entries,
+                        compact=args.compact,
+                        plan_format=args.plan_format,
+                        intern_args=args.intern_args,
+                    )
+                if args.print_plan:
+                    if args.plan_format == PLAN_FORMAT_V2:
+                        dump_plan_v2(entries, sys.stdout, intern_args=args.intern_args)
+                    else:
+                        dump_plan(entries, sys.stdout, compact=args.compact)
+            return
 
-    cmds = compile_commands(src)
-    for c in cmds:
-        print(c)
+        with profile_phase("compile"):
+            cmds = compile_commands(src, cache=not args.no_cache, jobs=jobs)
+        for c in cmds:
+            print(c)
+    finally:
+        if PROFILER is not None:
+            # also after a compile error: the phases up to the failing block are still useful
+            print(PROFILER.table(args.profile_top), file=sys.stderr)
+            if args.profile:
+                report = {"file": str(src.resolve()), "cache": not args.no_cache, "jobs": jobs, **PROFILER.report()}
+                Path(args.profile).write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        if STATS is not None:
+            # also after a compile error (a too long /placeadvanced): the blocks counted so far
+            print(STATS.table(args.stats_top), file=sys.stderr)
+            if args.stats:
+                report = {"file": str(src.resolve()), **STATS.report()}
+                Path(args.stats).write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
 
 
 if __name__ == "__main__":
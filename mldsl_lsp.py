@@ -0,0 +1,380 @@
+"""
+Language server for .mldsl (stdlib only): `python mldsl_lsp.py` speaks LSP over stdio.
+
+Reuses the compiler's parser, inputs and api index. Documents use incremental sync; after every change the
+document is re-split into top-level event/func/loop blocks (lines are parsed through a cache, so unchanged
+lines cost a dict lookup) and only blocks whose text changed, or whose called funcs changed signature, are
+checked again. A block is checked by running each statement through the same compile functions the
+compiler uses, so diagnostics carry the compiler's own messages:
+- unknown actions / params / enum values, select targets, blocks missing from allactions.txt
+- unknown events
+- func call argument count (the func_sigs check), including funcs from imported files
+- statements that need an enclosing block
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import sys
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+import mldsl_compile as mc
+from mldsl_cache import file_stat
+from mldsl_check import StmtChecker
+from mldsl_parser import Stmt, parse_line
+
+SEVERITY_ERROR = 1
+SYNC_INCREMENTAL = 2
+PARSE_CACHE_SIZE = 65536
+
+OPEN_KINDS = mc.BLOCK_KINDS
+NESTED_KINDS = mc.NESTED_BLOCK_KINDS
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_cached(raw: str, ns_pattern: str | None) -> Stmt | None:
+    """parse_line() + optional `ns.` stripping (as in compile_entries); shared result, do not mutate."""
+    st = parse_line(raw)
+    if st is not None and ns_pattern is not None and "." in st.text:
+        line = _ns_re(ns_pattern).sub("", st.text)
+        if line != st.text:
+            reparsed = parse_line(line)
+            if reparsed is not None:
+                reparsed.col = st.col
+            st = reparsed
+    return st
+
+
+@lru_cache(maxsize=64)
+def _ns_re(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+
+def uri_to_path(uri: str) -> Path:
+    parsed = urlparse(uri)
+    path = unquote(parsed.path)
+    # file:///C:/x -> C:/x on Windows
+    if len(path) >= 3 and path[0] == "/" and path[2] == ":":
+        path = path[1:]
+    return Path(path)
+
+
+def utf16_to_index(line: str, character: int) -> int:
+    """LSP positions count UTF-16 code units."""
+    if line.isascii():
+        return min(character, len(line))
+    units = 0
+    for i, ch in enumerate(line):
+        if units >= character:
+            return i
+        units += 2 if ord(ch) > 0xFFFF else 1
+    return len(line)
+
+
+def index_to_utf16(line: str, index: int) -> int:
+    return index + sum(1 for ch in line[:index] if ord(ch) > 0xFFFF)
+
+
+@dataclass(slots=True)
+class Block:
+    start: int  # 0-based line of the header
+    lines: tuple[str, ...]
+    stmts: list[tuple[int, Stmt]]  # (0-based line, stmt)
+
+
+@dataclass(slots=True)
+class BlockResult:
+    diags: list[tuple[int, int, int, str, int]]  # (line offset, start col, end col, message, severity)
+    deps: dict[str, tuple[str, ...] | None]
+
+
+@dataclass
+class Document:
+    uri: str
+    path: Path
+    lines: list[str]
+    version: int = 0
+    # block text -> last analysis, valid for `inputs` and `ns_pattern` (the imports decide how lines parse)
+    results: dict[tuple[str, ...], BlockResult] = field(default_factory=dict)
+    inputs: object = None
+    ns_pattern: str | None = None
+
+    def apply_change(self, change: dict) -> None:
+        rng = change.get("range")
+        if rng is None:
+            self.lines = change["text"].split("\n")
+            return
+        start, end = rng["start"], rng["end"]
+        sl, el = start["line"], end["line"]
+        while len(self.lines) <= max(sl, el):
+            self.lines.append("")
+        head = self.lines[sl][: utf16_to_index(self.lines[sl], start["character"])]
+        tail = self.lines[el][utf16_to_index(self.lines[el], end["character"]) :]
+        self.lines[sl : el + 1] = (head + change["text"] + tail).split("\n")
+
+
+class Analyzer:
+    """Checks documents block by block against the currently loaded compiler inputs."""
+
+    def __init__(self):
+        self.inputs: mc.CompilerInputs | None = None
+        self.checker: StmtChecker | None = None
+        self._imports: dict[Path, tuple] = {}
+
+    def refresh_inputs(self) -> None:
+        """Picks up a rebuilt out/ (load_inputs() returns the same object while nothing changed)."""
+        inputs = mc.load_inputs()
+        if inputs is self.inputs:
+            return
+        self.inputs = inputs
+        self.checker = StmtChecker(inputs)
+
+    # --- imports -------------------------------------------------------------------------------------
+
+    def _import_info(self, path: Path) -> tuple[list[tuple[str, list[str]]], list[str]]:
+        """(func sigs in order, nested import specs) of an imported file, via its compiled module artifact."""
+        stat = file_stat(path)
+        hit = self._imports.get(path)
+        if hit is not None and hit[0] == stat:
+            return hit[1]
+        module = mc.load_module(path)
+        info = (module.funcs, [spec for _at, spec in module.imports])
+        self._imports[path] = (stat, info)
+        return info
+
+    def _collect_import(self, base: Path, spec: str, visited: set[Path], sigs: dict, namespaces: set[str]):
+        """Func sigs and namespaces of one import and everything it imports, in compiler (inlining) order."""
+        rp = mc.resolve_import_path(base, spec)
+        if rp in visited:
+            return
+        visited.add(rp)
+        file_sigs, nested = self._import_info(rp)
+        for child in nested:
+            namespaces.add(Path(child).stem)
+            self._collect_import(rp, child, visited, sigs, namespaces)
+        for name, params in file_sigs:
+            sigs[name] = params
+
+    # --- document ------------------------------------------------------------------------------------
+
+    def analyze(self, doc: Document) -> list[dict]:
+        self.refresh_inputs()
+        if doc.inputs is not self.inputs:
+            doc.results.clear()
+            doc.inputs = self.inputs
+        diags: list[dict] = []
+
+        def add(line: int, start: int, end: int, message: str, severity: int = SEVERITY_ERROR):
+            text = doc.lines[line] if line < len(doc.lines) else ""
+            diags.append(
+                {
+                    "range": {
+                        "start": {"line": line, "character": index_to_utf16(text, start)},
+                        "end": {"line": line, "character": index_to_utf16(text, max(end, start + 1))},
+                    },
+                    "severity": severity,
+                    "source": "mldsl",
+                    "message": message,
+                }
+            )
+
+        # pass 1: imports (namespaces affect how the rest of the lines parse) and their func sigs
+        sigs: dict[str, list[str]] = {}
+        namespaces: set[str] = set()
+        visited = {doc.path.resolve()}
+        for i, raw in enumerate(doc.lines):
+            st = parse_cached(raw, None)
+            if st is None or st.kind != "import":
+                continue
+            spec = st.name.strip("\"'")
+            namespaces.add(Path(spec).stem)
+            try:
+                self._collect_import(doc.path, spec, visited, sigs, namespaces)
+            except (ValueError, OSError) as e:
+                add(i, st.col - 1, len(raw), str(e))
+        ns_re = mc.namespace_prefix_re(namespaces)
+        ns_pattern = ns_re.pattern if ns_re is not None else None
+        if ns_pattern != doc.ns_pattern:
+            doc.results.clear()
+            doc.ns_pattern = ns_pattern
+
+        # pass 2: statements, func sigs, top-level blocks
+        blocks: list[Block] = []
+        cur: Block | None = None
+        depth = 0
+        for i, raw in enumerate(doc.lines):
+            try:
+                st = parse_cached(raw, ns_pattern)
+            except ValueError as e:
+                add(i, 0, len(raw), str(e))
+                continue
+            if st is None or st.kind == "import":
+                continue
+            kind = st.kind
+            if kind in OPEN_KINDS:
+                cur = Block(i, (), [])
+                blocks.append(cur)
+                depth = 0
+                if kind == "func" and st.name:
+                    sigs[st.name] = list(st.params or [])
+            elif cur is None:
+                if kind in NESTED_KINDS:
+                    add(i, st.col - 1, len(raw), f"{kind} must be inside event/func/loop block")
+                continue
+            cur.stmts.append((i, st))
+            if kind in NESTED_KINDS or (kind == "select" and st.has_block):
+                depth += 1
+            elif kind == "close":
+                if depth == 0:
+                    cur.lines = tuple(doc.lines[cur.start : i + 1])
+                    cur = None
+                else:
+                    depth -= 1
+        if cur is not None:
+            cur.lines = tuple(doc.lines[cur.start :])
+
+        # pass 3: blocks, reusing results whose text and called signatures are unchanged
+        results: dict[tuple[str, ...], BlockResult] = {}
+        for block in blocks:
+            res = doc.results.get(block.lines) or results.get(block.lines)
+            if res is None or any(
+                (tuple(sigs[n]) if n in sigs else None) != sig for n, sig in res.deps.items()
+            ):
+                res = self.check_block(block, sigs)
+            results[block.lines] = res
+            for off, start, end, message, severity in res.diags:
+                add(block.start + off, start, end, message, severity)
+        doc.results = results
+        return diags
+
+    def check_block(self, block: Block, sigs: dict[str, list[str]]) -> BlockResult:
+        func_sigs = mc.SigRecorder(sigs)
+        diags: list[tuple[int, int, int, str, int]] = []
+        current_kind = None
+
+        for line, st in block.stmts:
+            off = line - block.start
+            end = len(block.lines[off]) if off < len(block.lines) else st.col
+            try:
+                with mc.collect_warnings():
+                    self.checker.check(st, current_kind, func_sigs)
+            except ValueError as e:
+                diags.append((off, st.col - 1, end, str(e), SEVERITY_ERROR))
+            if st.kind in OPEN_KINDS:
+                current_kind = st.kind
+
+        deps = {n: (tuple(sigs[n]) if n in sigs else None) for n in func_sigs.used}
+        return BlockResult(diags, deps)
+
+
+class LanguageServer:
+    def __init__(self, stdin, stdout):
+        self.stdin = stdin
+        self.stdout = stdout
+        self.docs: dict[str, Document] = {}
+        self.analyzer = Analyzer()
+        self.shutdown_requested = False
+
+    # --- transport (Content-Length framed JSON-RPC) ----------------------------------------------------
+
+    def read_message(self) -> dict | None:
+        length = None
+        while True:
+            header = self.stdin.readline()
+            if not header:
+                return None
+            header = header.strip()
+            if not header:
+                break
+            name, _, value = header.decode("ascii", errors="replace").partition(":")
+            if name.lower() == "content-length":
+                length = int(value.strip())
+        if length is None:
+            return {}
+        return json.loads(self.stdin.read(length).decode("utf-8"))
+
+    def send(self, msg: dict) -> None:
+        body = json.dumps(msg, ensure_ascii=False).encode("utf-8")
+        self.stdout.write(f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+        self.stdout.flush()
+
+    def notify(self, method: str, params: dict) -> None:
+        self.send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    # --- handlers --------------------------------------------------------------------------------------
+
+    def publish(self, doc: Document) -> None:
+        try:
+            diags = self.analyzer.analyze(doc)
+        except Exception as e:  # keep the server alive on analyzer bugs / broken out/
+            print(f"[lsp] analyze {doc.uri}: {type(e).__name__}: {e}", file=sys.stderr)
+            diags = []
+        self.notify("textDocument/publishDiagnostics", {"uri": doc.uri, "version": doc.version, "diagnostics": diags})
+
+    def on_request(self, method: str, params: dict):
+        if method == "initialize":
+            return {
+                "capabilities": {
+                    "textDocumentSync": {"openClose": True, "change": SYNC_INCREMENTAL, "save": True},
+                },
+                "serverInfo": {"name": "mldsl-lsp"},
+            }
+        if method == "shutdown":
+            self.shutdown_requested = True
+            return None
+        raise KeyError(method)
+
+    def on_notification(self, method: str, params: dict) -> None:
+        if method == "textDocument/didOpen":
+            td = params["textDocument"]
+            doc = Document(td["uri"], uri_to_path(td["uri"]), td["text"].split("\n"), td.get("version", 0))
+            self.docs[doc.uri] = doc
+            self.publish(doc)
+        elif method == "textDocument/didChange":
+            doc = self.docs.get(params["textDocument"]["uri"])
+            if doc is None:
+                return
+            for change in params["contentChanges"]:
+                doc.apply_change(change)
+            doc.version = params["textDocument"].get("version", doc.version)
+            self.publish(doc)
+        elif method == "textDocument/didSave":
+            # an imported file may have been saved; re-check everything open
+            for doc in self.docs.values():
+                self.publish(doc)
+        elif method == "textDocument/didClose":
+            uri = params["textDocument"]["uri"]
+            self.docs.pop(uri, None)
+            self.notify("textDocument/publishDiagnostics", {"uri": uri, "diagnostics": []})
+
+    def run(self) -> int:
+        while True:
+            msg = self.read_message()
+            if msg is None:
+                return 0 if self.shutdown_requested else 1
+            method = msg.get("method")
+            if method == "exit":
+                return 0 if self.shutdown_requested else 1
+            params = msg.get("params") or {}
+            if "id" in msg and method:
+                try:
+                    self.send({"jsonrpc": "2.0", "id": msg["id"], "result": self.on_request(method, params)})
+                except KeyError:
+                    self.send(
+                        {"jsonrpc": "2.0", "id": msg["id"], "error": {"code": -32601, "message": f"unknown method: {method}"}}
+                    )
+            elif method:
+                self.on_notification(method, params)
+
+
+def main() -> None:
+    server = LanguageServer(sys.stdin.buffer, sys.stdout.buffer)
+    sys.exit(server.run())
+
+
+if __name__ == "__main__":
+    main()
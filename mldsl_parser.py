@@ -0,0 +1,549 @@
+"""
+Lexer + statement parser for MLDSL sources.
+
+Each source line is tokenized once (one master regex, left to right) and classified by its leading
+tokens into a `Stmt`. Call arguments are split from the same token stream, so the compiler never
+has to re-scan argument text character by character.
+
+Statements are still line-based (one statement per line), exactly like the old regex cascade in
+`mldsl_compile.compile_entries`; this module only replaces how a line is recognized.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+NAME = "name"
+STRING = "string"
+ESCAPE = "escape"
+OP = "op"
+
+# Leading whitespace is skipped by every match. Order matters: identifiers (incl. %placeholders%), quoted
+# strings, `\x` escapes, then any single char. An unterminated quote falls through to OP, like the old
+# split_args which just kept going.
+_TOKEN_RE = re.compile(
+    r"""
+    \s*(?:
+    (?P<name>[%\w\u0400-\u04FF]+)
+    |(?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    |(?P<escape>\\.?)
+    |(?P<op>\S)
+    )
+    """,
+    re.X | re.S,
+)
+
+IF_PLAYER_WORDS = ("if_player", "ifplayer")
+IF_GAME_WORDS = ("if_game", "ifgame")
+FUNC_WORDS = ("func", "function", "def", "функция")
+LOOP_WORDS = ("loop", "цикл")
+IMPORT_WORDS = ("import", "use", "использовать")
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+    start: int
+    end: int
+
+
+@dataclass(slots=True)
+class CallArgs:
+    """
+    Arguments of one call, split at top-level commas.
+    - parts: every top-level piece as written (what split_args returned)
+    - kv/pos: keyword and positional values with outer double quotes removed (parse_call_args)
+    - pos_raw: positional pieces as written (quotes kept)
+    """
+
+    raw: str = ""
+    parts: list[str] = field(default_factory=list)
+    kv: dict[str, str] = field(default_factory=dict)
+    pos: list[str] = field(default_factory=list)
+    pos_raw: list[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Stmt:
+    """
+    One parsed source line.
+
+    kind: close | if_player | if_game | ifexists | iftext | if | event | func | loop | select |
+          nested_message | return | bare_call | assign | call | import | unknown
+    """
+
+    kind: str
+    text: str
+    line: int = 0
+    col: int = 0
+    path: str | None = None
+    name: str = ""
+    module: str = ""
+    func: str = ""
+    args: CallArgs | None = None
+    expr: str = ""
+    op: str = ""
+    saved: bool = False
+    has_block: bool = False
+    params: list[str] | None = None
+    ticks: int = 0
+
+
+def tokenize(text: str) -> list[Token]:
+    new = tuple.__new__
+    return [new(Token, (m.lastgroup, m.group(m.lastgroup), *m.span(m.lastgroup))) for m in _TOKEN_RE.finditer(text)]
+
+
+def _ident(tok: Token | None) -> bool:
+    # module/function names: no %placeholders%
+    return tok is not None and tok.kind == NAME and "%" not in tok.text
+
+
+def _is_op(tok: Token | None, ch: str) -> bool:
+    return tok is not None and tok.kind == OP and tok.text == ch
+
+
+def _word(tok: Token | None) -> str:
+    return tok.text.lower() if tok is not None and tok.kind == NAME else ""
+
+
+def _adjacent(a: Token, b: Token) -> bool:
+    return a.end == b.start
+
+
+def _unquote_dq(v: str) -> str:
+    if len(v) >= 2 and v.startswith('"') and v.endswith('"'):
+        return v[1:-1]
+    return v
+
+
+def _args_from_tokens(text: str, toks: list[Token], lo: int, hi: int, raw: str) -> CallArgs:
+    """Split toks[lo:hi] at top-level commas; `=` at depth 0 separates key from value."""
+    args = CallArgs(raw=raw)
+    paren = brace = bracket = 0
+    piece_lo = lo
+    eq: Token | None = None
+    for i in range(lo, hi):
+        tok = toks[i]
+        if tok.kind != OP:
+            continue
+        ch = tok.text
+        if ch == "(":
+            paren += 1
+        elif ch == ")":
+            paren = max(0, paren - 1)
+        elif ch == "{":
+            brace += 1
+        elif ch == "}":
+            brace = max(0, brace - 1)
+        elif ch == "[":
+            bracket += 1
+        elif ch == "]":
+            bracket = max(0, bracket - 1)
+        elif paren == 0 and brace == 0 and bracket == 0:
+            if ch == ",":
+                if i > piece_lo:
+                    _add_piece(args, text, toks[piece_lo].start, toks[i - 1].end, eq)
+                piece_lo = i + 1
+                eq = None
+            elif ch == "=" and eq is None:
+                eq = tok
+    if hi > piece_lo:
+        _add_piece(args, text, toks[piece_lo].start, toks[hi - 1].end, eq)
+    return args
+
+
+def _add_piece(args: CallArgs, text: str, start: int, end: int, eq: Token | None) -> None:
+    piece = text[start:end]
+    args.parts.append(piece)
+    # A fully quoted piece is always positional (it may contain '=' inside).
+    if len(piece) >= 2 and piece[0] == piece[-1] and piece[0] in ('"', "'"):
+        args.pos.append(piece[1:-1])
+        args.pos_raw.append(piece)
+        return
+    if eq is not None:
+        key = text[start : eq.start].strip()
+        args.kv[key] = _unquote_dq(text[eq.end : end].strip())
+        return
+    args.pos.append(_unquote_dq(piece))
+    args.pos_raw.append(piece)
+
+
+def parse_args(arg_str: str) -> CallArgs:
+    """Parse `a=1, "b", c(d, e)` into CallArgs."""
+    toks = tokenize(arg_str)
+    return _args_from_tokens(arg_str, toks, 0, len(toks), arg_str.strip())
+
+
+class _LineParser:
+    """Recursive-descent recognizer for a single (stripped) source line."""
+
+    __slots__ = ("text", "toks", "n", "end")
+
+    def __init__(self, text: str, toks: list[Token]):
+        self.text = text
+        self.toks = toks
+        self.n = len(toks)
+        # index past the last meaningful token (a trailing ';' is optional everywhere it was before)
+        self.end = self.n - 1 if self.n and _is_op(toks[-1], ";") else self.n
+
+    def tok(self, i: int) -> Token | None:
+        return self.toks[i] if 0 <= i < self.n else None
+
+    def span(self, lo: int, hi: int) -> str:
+        """Source text from token lo up to (not including) token hi."""
+        if hi <= lo:
+            return ""
+        return self.text[self.toks[lo].start : self.toks[hi - 1].end]
+
+    def between(self, open_i: int, close_i: int) -> str:
+        """Source text strictly between two tokens (e.g. inside parentheses)."""
+        return self.text[self.toks[open_i].end : self.toks[close_i].start].strip()
+
+    def args(self, open_i: int, close_i: int) -> CallArgs:
+        return _args_from_tokens(self.text, self.toks, open_i + 1, close_i, self.between(open_i, close_i))
+
+    def new(self, kind: str, **kw) -> Stmt:
+        return Stmt(kind, self.text, **kw)
+
+    # --- entry point -------------------------------------------------------------------------
+
+    def parse(self) -> Stmt:
+        if self.text == "}":
+            return self.new("close")
+        word = _word(self.toks[0])
+        rule = _KEYWORD_RULES.get(word)
+        if rule is not None:
+            st = rule(self)
+            if st is not None:
+                return st
+        return self.bare_call() or self.save_shorthand() or self.assign() or self.call() or self.new("unknown")
+
+    # --- block openers -----------------------------------------------------------------------
+
+    def block_body(self) -> int | None:
+        """If the line ends with `{`, return the index of that brace."""
+        last = self.n - 1
+        if self.n >= 2 and _is_op(self.toks[last], "{"):
+            return last
+        return None
+
+    def cond_call(self, module: str) -> Stmt | None:
+        # if_player.<func> {   |   if_player.<func>(args) {
+        brace = self.block_body()
+        if brace is None:
+            return None
+        t = self.toks
+        if brace < 3 or not (_is_op(t[1], ".") and _ident(t[2])):
+            return None
+        if not (_adjacent(t[0], t[1]) and _adjacent(t[1], t[2])):
+            return None
+        if brace == 3:
+            return self.new(module, module=module, func=t[2].text, args=CallArgs())
+        if _is_op(t[3], "(") and _is_op(t[brace - 1], ")") and brace - 1 > 3:
+            return self.new(module, module=module, func=t[2].text, args=self.args(3, brace - 1))
+        return None
+
+    def if_player(self) -> Stmt | None:
+        return self.cond_call("if_player")
+
+    def if_game(self) -> Stmt | None:
+        return self.cond_call("if_game")
+
+    def select_object(self) -> Stmt | None:
+        # legacy: SelectObject.player.IfPlayer.<Func> {
+        t = self.toks
+        if self.block_body() != 7:
+            return None
+        words = [_word(t[0]), _word(t[2]), _word(t[4])]
+        if words != ["selectobject", "player", "ifplayer"]:
+            return None
+        if not all(_is_op(t[i], ".") for i in (1, 3, 5)) or not _ident(t[6]):
+            return None
+        return self.new("if_player", module="if_player", func=t[6].text.lower(), args=CallArgs())
+
+    def ifexists(self) -> Stmt | None:
+        # ifexists(var) {   |   ifexists var {
+        brace = self.block_body()
+        t = self.toks
+        if brace == 2 and t[1].kind == NAME and t[1].start > t[0].end:
+            return self.new("ifexists", name=t[1].text)
+        if brace == 4 and _is_op(t[1], "(") and t[2].kind == NAME and _is_op(t[3], ")"):
+            return self.new("ifexists", name=t[2].text)
+        return None
+
+    def cond_expr(self, kind: str) -> Stmt | None:
+        # if <expr> {   |   iftext <expr> {
+        brace = self.block_body()
+        t = self.toks
+        if brace is None or brace < 2 or t[1].start == t[0].end:
+            return None
+        return self.new(kind, expr=self.span(1, brace))
+
+    def if_(self) -> Stmt | None:
+        return self.cond_expr("if")
+
+    def iftext(self) -> Stmt | None:
+        return self.cond_expr("iftext")
+
+    def event(self) -> Stmt | None:
+        # event(<name>) {   |   event("Name with spaces") {
+        brace = self.block_body()
+        t = self.toks
+        if brace is None or brace < 4 or not _is_op(t[1], "(") or not _is_op(t[brace - 1], ")"):
+            return None
+        inner = t[2 : brace - 1]
+        if len(inner) == 1 and inner[0].kind == STRING:
+            s = inner[0].text
+            if s[0] == '"' and len(s) > 2 and '"' not in s[1:-1]:
+                return self.new("event", name=s[1:-1])
+        name = self.between(1, brace - 1)
+        if ")" in name:
+            return None
+        return self.new("event", name=name)
+
+    def func(self) -> Stmt | None:
+        # func name {  |  func name(a, b) {  |  func(name) {  |  func(name)(a, b) {
+        brace = self.block_body()
+        if brace is None:
+            return None
+        t = self.toks
+        i = 1
+        if _is_op(t[i], "("):
+            if not (_ident(self.tok(i + 1)) and _is_op(self.tok(i + 2), ")")):
+                return None
+            name = t[i + 1].text
+            i += 3
+        elif _ident(t[i]):
+            name = t[i].text
+            i += 1
+        else:
+            return None
+        params: list[str] = []
+        if i < brace:
+            if not (_is_op(t[i], "(") and _is_op(t[brace - 1], ")") and brace - 1 > i):
+                return None
+            if any(_is_op(x, ")") for x in t[i + 1 : brace - 1]):
+                return None
+            params = [p for p in self.args(i, brace - 1).parts if p]
+        return self.new("func", name=name, params=params)
+
+    def loop(self) -> Stmt | None:
+        # loop <name> [every] <ticks> {
+        brace = self.block_body()
+        t = self.toks
+        if brace not in (3, 4) or not _ident(t[1]):
+            return None
+        if brace == 4 and _word(t[2]) != "every":
+            return None
+        ticks = t[brace - 1]
+        if ticks.kind != NAME or not ticks.text.isdecimal():
+            return None
+        if any(t[k].start == t[k - 1].end for k in range(1, brace)):
+            return None
+        return self.new("loop", name=t[1].text, ticks=int(ticks.text))
+
+    # --- statements inside blocks ------------------------------------------------------------
+
+    def select(self) -> Stmt | None:
+        # select.<a>[.<b>...] [(args)] [{]
+        t = self.toks
+        if self.n < 3:
+            return None
+        i = 1
+        chain: list[str] = []
+        prev = t[0]
+        while _is_op(self.tok(i), ".") and _ident(self.tok(i + 1)):
+            if not (_adjacent(prev, t[i]) and _adjacent(t[i], t[i + 1])):
+                return None
+            chain.append(t[i + 1].text)
+            prev = t[i + 1]
+            i += 2
+        if not chain:
+            return None
+        end = self.n
+        has_block = _is_op(t[end - 1], "{")
+        if has_block:
+            end -= 1
+        args = CallArgs()
+        if i < end:
+            if not (_is_op(t[i], "(") and _is_op(t[end - 1], ")") and end - 1 > i):
+                return None
+            args = self.args(i, end - 1)
+        return self.new("select", name=".".join(chain), args=args, has_block=has_block)
+
+    def nested_message(self) -> Stmt | None:
+        # player.message(fn(...))  ->  tmp = fn(...); player.message("%var(tmp)%")
+        t = self.toks
+        e = self.end
+        if e < 8 or _word(t[2]) != "message" or not (_is_op(t[1], ".") and _adjacent(t[0], t[1]) and _adjacent(t[1], t[2])):
+            return None
+        if not (_is_op(t[3], "(") and _ident(t[4]) and _is_op(t[5], "(")):
+            return None
+        if not (_is_op(t[e - 1], ")") and _is_op(t[e - 2], ")")):
+            return None
+        return self.new("nested_message", func=t[4].text, expr=self.between(5, e - 2))
+
+    def return_(self) -> Stmt | None:
+        # return(expr)  |  return expr
+        t = self.toks
+        if self.n < 2:
+            return None
+        if _is_op(t[1], "(") and _is_op(t[-1], ")"):
+            return self.new("return", expr=self.between(1, self.n - 1))
+        if t[1].start == t[0].end:
+            return None
+        return self.new("return", expr=self.text[t[1].start :].strip())
+
+    def import_(self) -> Stmt | None:
+        # import <path>  |  use <path>  |  использовать <path>
+        t = self.toks
+        if self.end < 2 or t[1].start == t[0].end:
+            return None
+        spec = self.span(1, self.end)
+        if not spec or any(ch.isspace() or ch in ";#" for ch in spec):
+            return None
+        return self.new("import", name=spec)
+
+    # --- generic forms -----------------------------------------------------------------------
+
+    def bare_call(self) -> Stmt | None:
+        # name(args)
+        t = self.toks
+        e = self.end
+        if e < 3 or not _ident(t[0]) or not _is_op(t[1], "(") or not _is_op(t[e - 1], ")"):
+            return None
+        return self.new("bare_call", func=t[0].text, args=self.args(1, e - 1))
+
+    def save_shorthand(self) -> Stmt | None:
+        # name ~ value   (sugar for: save name = value)
+        t = self.toks
+        if self.n < 3 or t[0].kind != NAME or not _is_op(t[1], "~") or _is_op(t[2], "="):
+            return None
+        return self.assign_rhs(name=t[0].text, saved=True, op="", rhs_lo=2)
+
+    def assign(self) -> Stmt | None:
+        # [save] name [~] [*] = value
+        t = self.toks
+        i = 0
+        saved = False
+        if _word(t[0]) == "save" and self.n > 1 and t[1].kind == NAME:
+            saved = True
+            i = 1
+        if t[i].kind != NAME:
+            return None
+        name = t[i].text
+        i += 1
+        if _is_op(self.tok(i), "~"):
+            saved = True
+            i += 1
+        op = ""
+        if _is_op(self.tok(i), "*"):
+            op = "*"
+            i += 1
+        if not _is_op(self.tok(i), "="):
+            return None
+        return self.assign_rhs(name=name, saved=saved, op=op, rhs_lo=i + 1)
+
+    def assign_rhs(self, *, name: str, saved: bool, op: str, rhs_lo: int) -> Stmt | None:
+        if rhs_lo >= self.n:
+            return None
+        hi = self.end if self.end > rhs_lo else self.n
+        st = self.new("assign", name=name, saved=saved, op=op, expr=self.span(rhs_lo, hi))
+        t = self.toks
+        # Pre-split right-hand sides that the assignment sugar needs as argument lists.
+        if _is_op(t[rhs_lo], "[") and _is_op(t[hi - 1], "]"):
+            st.args = self.args(rhs_lo, hi - 1) if hi - 1 > rhs_lo else CallArgs()
+            return st
+        i = rhs_lo
+        if _ident(t[i]) and _is_op(self.tok(i + 1), ".") and _ident(self.tok(i + 2)) and _adjacent(t[i], t[i + 1]):
+            st.module = t[i].text
+            i += 2
+        if _ident(t[i]) and _is_op(self.tok(i + 1), "(") and _is_op(t[hi - 1], ")") and hi - 1 > i + 1:
+            st.func = t[i].text
+            st.args = self.args(i + 1, hi - 1)
+        else:
+            st.module = ""
+        return st
+
+    def call(self) -> Stmt | None:
+        # module.func(args)
+        t = self.toks
+        e = self.end
+        if e < 5 or not (_ident(t[0]) and _is_op(t[1], ".") and _ident(t[2]) and _is_op(t[3], "(")):
+            return None
+        if not (_adjacent(t[0], t[1]) and _adjacent(t[1], t[2])) or not _is_op(t[e - 1], ")"):
+            return None
+        return self.new("call", module=t[0].text, func=t[2].text, args=self.args(3, e - 1))
+
+
+_KEYWORD_RULES = {
+    **{w: _LineParser.if_player for w in IF_PLAYER_WORDS},
+    **{w: _LineParser.if_game for w in IF_GAME_WORDS},
+    "selectobject": _LineParser.select_object,
+    "ifexists": _LineParser.ifexists,
+    "iftext": _LineParser.iftext,
+    "if": _LineParser.if_,
+    "event": _LineParser.event,
+    **{w: _LineParser.func for w in FUNC_WORDS},
+    **{w: _LineParser.loop for w in LOOP_WORDS},
+    "select": _LineParser.select,
+    "player": _LineParser.nested_message,
+    "return": _LineParser.return_,
+    **{w: _LineParser.import_ for w in IMPORT_WORDS},
+}
+
+
+def parse_line(raw: str, *, line: int = 0, path: str | None = None) -> Stmt | None:
+    """
+    Parse one source line. Returns None for blank lines and `#` comments.
+    Positions are 1-based; `col` points at the first non-blank character.
+    """
+    text = raw.strip()
+    if not text or text.startswith("#"):
+        return None
+    st = _LineParser(text, tokenize(text)).parse()
+    st.line = line
+    st.col = len(raw) - len(raw.lstrip()) + 1
+    st.path = path
+    return st
+
+
+def parse_call(text: str) -> Stmt | None:
+    """Parse `module.func(args)` only (what compile_line accepts)."""
+    text = text.strip()
+    toks = tokenize(text)
+    if not toks:
+        return None
+    return _LineParser(text, toks).call()
+
+
+def parse_source(text: str, *, path: str | None = None) -> list[Stmt]:
+    """Parse a whole file; blank and comment lines are dropped."""
+    out: list[Stmt] = []
+    for lineno, raw in enumerate(text.splitlines(), start=1):
+        st = parse_line(raw, line=lineno, path=path)
+        if st is not None:
+            out.append(st)
+    return out
+
+
+def dump_stmt(st: Stmt) -> tuple:
+    """Stmt as plain tuples (marshal-able, for compiled module artifacts); `path` is not stored."""
+    a = st.args
+    args = None if a is None else (a.raw, a.parts, a.kv, a.pos, a.pos_raw)
+    return (
+        st.kind, st.text, st.line, st.col, st.name, st.module, st.func,
+        args, st.expr, st.op, st.saved, st.has_block, st.params, st.ticks,
+    )
+
+
+def load_stmt(data: tuple, path: str | None = None) -> Stmt:
+    """Inverse of dump_stmt()."""
+    kind, text, line, col, name, module, func, args, expr, op, saved, has_block, params, ticks = data
+    return Stmt(
+        kind, text, line, col, path, name, module, func,
+        None if args is None else CallArgs(*args), expr, op, saved, has_block, params, ticks,
+    )
@@ -0,0 +1,239 @@
+"""
+Plan files: what `mldsl_compile.py --plan` writes and the mod's `/mldsl run` reads.
+
+v1 (default) - every entry spelled out:
+  {"entries": [{"block": "iron_block", "name": "Установить значение||=", "args": "slot(13)=var(x)"},
+               {"block": "newline"}, ...]}
+
+v2 (`--plan-format 2`) - the (block, name) pairs are interned into a header table, entries reference them:
+  {"format": 2,
+   "actions": [["iron_block", "Установить значение||="], ["newline"], ...],
+   "args": ["no", "slot(13)=var(x)", ...],
+   "entries": [[0, "slot(13)=num(5)"], [1], [0, 1], ...]}
+  An entry is [action] or [action, args]; `action` indexes "actions", `args` is the value itself or, when it
+  is an int, an index into "args". "args" is only written with intern_args (arg strings used more than once).
+  Both tables are ordered by use count, so the most common actions get the shortest indices.
+
+Structured args (`--structured-args`, either format): the "args" of every action is a list instead of the
+comma-joined string, one object per piece as compiled:
+  slot(13)=text(hi)  ->  {"slot": 13, "kind": "text", "value": "hi"}
+  slot(0)=stone      ->  {"slot": 0, "kind": "", "value": "stone"}      (value without a wrapper)
+  clicks(22,2)=0     ->  {"slot": 22, "clicks": 2}
+  no                 ->  []
+Row headers (the first entry of the plan and every entry after a "newline": event/func/loop) keep their
+string args ("no", loop ticks). decode_args() splits the legacy string form.
+
+`python mldsl_plan.py IN OUT [--format 1|2] [--intern-args] [--compact] [--args legacy|structured]` converts
+between the forms (and checks that the result decodes back to the same entries).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import IO, Iterable, Iterator
+
+PLAN_FORMAT_V2 = 2
+
+_SLOT_RE = re.compile(r"slot\((\d+)\)=(.*)", re.S)
+_WRAPPED_RE = re.compile(r"(\w+)\((.*)\)", re.S)
+_CLICKS_RE = re.compile(r"clicks\((\d+),(\d+)\)=0")
+# a legacy args string is split only before a comma that starts the next piece, so commas inside text stay
+_PIECE_SEP_RE = re.compile(r",(?=slot\(\d+\)=|clicks\(\d+,\d+\)=)")
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False, indent=2)
+_ENCODER_COMPACT = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def dump_plan(entries: Iterable[dict], f: IO[str], *, compact: bool = False) -> int:
+    """
+    Streams a v1 plan {"entries": [...]} to `f` one entry at a time; returns the number of entries.
+    The default output is the same text as json.dumps(plan, ensure_ascii=False, indent=2) + newline;
+    `compact` writes no indentation, one entry per line.
+    """
+    if compact:
+        encode, head, sep, tail = _ENCODER_COMPACT.encode, '{"entries":[\n', ",\n", "\n]}\n"
+    else:
+        # an entry is a single line unless it has nested args; JSON strings never contain raw newlines
+        def encode(e: dict) -> str:
+            return "    " + _ENCODER.encode(e).replace("\n", "\n    ")
+
+        head, sep, tail = '{\n  "entries": [\n', ",\n", "\n  ]\n}\n"
+    n = 0
+    for e in entries:
+        f.write(sep if n else head)
+        f.write(encode(e))
+        n += 1
+    f.write(tail if n else ('{"entries":[]}\n' if compact else '{\n  "entries": []\n}\n'))
+    return n
+
+
+def piece_to_arg(piece: str) -> dict:
+    """One compiled piece (`slot(N)=kind(value)` / `clicks(N,n)=0`) as a structured arg."""
+    m = _SLOT_RE.fullmatch(piece)
+    if m is not None:
+        w = _WRAPPED_RE.fullmatch(m.group(2))
+        kind, value = (w.group(1), w.group(2)) if w is not None else ("", m.group(2))
+        return {"slot": int(m.group(1)), "kind": kind, "value": value}
+    m = _CLICKS_RE.fullmatch(piece)
+    if m is not None:
+        return {"slot": int(m.group(1)), "clicks": int(m.group(2))}
+    raise ValueError(f"plan: неизвестный аргумент действия: {piece!r}")
+
+
+def arg_to_piece(arg: dict) -> str:
+    if "clicks" in arg:
+        return f"clicks({arg['slot']},{arg['clicks']})=0"
+    value = f"{arg['kind']}({arg['value']})" if arg["kind"] else arg["value"]
+    return f"slot({arg['slot']})={value}"
+
+
+def decode_args(args: str) -> list[dict]:
+    """
+    Structured args of a legacy args string (`slot(13)=text(a,b),clicks(22,2)=0`; "no" -> []).
+    The legacy form is ambiguous for a text that itself contains `,slot(N)=`; structured plans are not.
+    """
+    if not args or args == "no":
+        return []
+    return [piece_to_arg(piece) for piece in _PIECE_SEP_RE.split(args)]
+
+
+def encode_args(args: list[dict]) -> str:
+    """Legacy args string of structured args (inverse of decode_args)."""
+    return ",".join(map(arg_to_piece, args)) if args else "no"
+
+
+def _convert_args(entries: Iterable[dict], convert) -> Iterator[dict]:
+    header = True
+    for e in entries:
+        if header or "args" not in e:
+            yield e
+        else:
+            yield {**e, "args": convert(e["args"])}
+        header = e.get("block") == "newline"
+
+
+def structured_entries(entries: Iterable[dict]) -> Iterator[dict]:
+    """Entries with the args of every action decoded (already structured args are kept)."""
+    return _convert_args(entries, lambda a: decode_args(a) if isinstance(a, str) else a)
+
+
+def legacy_entries(entries: Iterable[dict]) -> Iterator[dict]:
+    """Entries with structured args joined back into legacy strings."""
+    return _convert_args(entries, lambda a: encode_args(a) if isinstance(a, list) else a)
+
+
+def _action_key(e: dict) -> tuple[str, ...]:
+    if "name" in e:
+        return (e["block"], e["name"])
+    return (e["block"],)
+
+
+def encode_v2(entries: Iterable[dict], *, intern_args: bool = False) -> dict:
+    """v2 plan object for plan entries (see the module docstring)."""
+    entries = list(entries)
+    for e in entries:
+        if "block" not in e or not e.keys() <= {"block", "name", "args"}:
+            raise ValueError(f"plan v2: неподдерживаемая запись плана: {e!r}")
+    action_uses = Counter(_action_key(e) for e in entries)
+    actions = {key: i for i, (key, _n) in enumerate(action_uses.most_common())}
+    args: dict[str, int] = {}
+    if intern_args:
+        arg_uses = Counter(e["args"] for e in entries if isinstance(e.get("args"), str))
+        args = {s: i for i, (s, n) in enumerate(arg_uses.most_common()) if n > 1}
+    out_entries = []
+    for e in entries:
+        item: list = [actions[_action_key(e)]]
+        if "args" in e:
+            value = e["args"]
+            item.append(args.get(value, value) if isinstance(value, str) else value)
+        out_entries.append(item)
+    plan: dict = {"format": PLAN_FORMAT_V2, "actions": [list(key) for key in actions]}
+    if args:
+        plan["args"] = list(args)
+    plan["entries"] = out_entries
+    return plan
+
+
+def dump_plan_v2(entries: Iterable[dict], f: IO[str], *, intern_args: bool = False) -> int:
+    """Writes a v2 plan: the tables on their own lines, then one entry per line. Returns the number of entries."""
+    plan = encode_v2(entries, intern_args=intern_args)
+    encode = _ENCODER_COMPACT.encode
+    f.write(f'{{"format":{PLAN_FORMAT_V2},\n"actions":{encode(plan["actions"])},\n')
+    if "args" in plan:
+        f.write(f'"args":{encode(plan["args"])},\n')
+    items = plan["entries"]
+    f.write('"entries":[\n' + ",\n".join(map(encode, items)) + "\n]}\n" if items else '"entries":[]}\n')
+    return len(items)
+
+
+def decode(plan: dict) -> list[dict]:
+    """Plan entries (v1 dicts) of a loaded v1 or v2 plan object. Raises ValueError on a malformed plan."""
+    if not isinstance(plan, dict) or not isinstance(plan.get("entries"), list):
+        raise ValueError("plan: ожидается объект с массивом `entries`")
+    fmt = plan.get("format", 1)
+    if fmt == 1:
+        return plan["entries"]
+    if fmt != PLAN_FORMAT_V2:
+        raise ValueError(f"plan: неизвестный формат {fmt!r}")
+    actions = [dict(zip(("block", "name"), key)) for key in plan.get("actions") or ()]
+    args = plan.get("args") or []
+    out: list[dict] = []
+    try:
+        for item in plan["entries"]:
+            e = dict(actions[item[0]])
+            if len(item) > 1:
+                value = item[1]
+                e["args"] = args[value] if type(value) is int else value
+            out.append(e)
+    except (IndexError, KeyError, TypeError):
+        raise ValueError(f"plan v2: битая запись #{len(out)}: {plan['entries'][len(out)]!r}")
+    return out
+
+
+def read_plan(path: Path) -> list[dict]:
+    """Entries of a plan file in either format."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8-sig"))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"plan: не удалось прочитать {path}: {e}")
+    return decode(data)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Convert a plan.json between the v1 and v2 formats")
+    ap.add_argument("src", help="Plan to read (v1 or v2)")
+    ap.add_argument("dst", help="Plan to write")
+    ap.add_argument("--format", type=int, choices=(1, PLAN_FORMAT_V2), default=PLAN_FORMAT_V2)
+    ap.add_argument("--intern-args", action="store_true", help="v2: also intern repeated args strings")
+    ap.add_argument("--compact", action="store_true", help="v1: no indentation, one entry per line")
+    ap.add_argument("--args", choices=("legacy", "structured"), default=None, help="Convert action args")
+    args = ap.parse_args()
+
+    src, dst = Path(args.src), Path(args.dst)
+    try:
+        entries = read_plan(src)
+        if args.args == "structured":
+            entries = list(structured_entries(entries))
+        elif args.args == "legacy":
+            entries = list(legacy_entries(entries))
+        with open(dst, "w", encoding="utf-8", newline="\n") as f:
+            if args.format == PLAN_FORMAT_V2:
+                dump_plan_v2(entries, f, intern_args=args.intern_args)
+            else:
+                dump_plan(entries, f, compact=args.compact)
+        if read_plan(dst) != entries:
+            raise ValueError(f"plan: {dst} не совпадает с {src} после чтения (ошибка кодирования)")
+    except ValueError as e:
+        print(f"[error] {e}", file=sys.stderr)
+        sys.exit(1)
+    before, after = src.stat().st_size, dst.stat().st_size
+    print(f"[plan] {len(entries)} entries: {before} -> {after} bytes ({after / max(before, 1):.0%})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compile profiler: `mldsl_compile.py file.mldsl --plan plan.json --profile [report.json]`.
+
+Records wall and CPU time of every compiler phase, of every top-level block and of every statement handler
+(the parser's statement kinds: call, assign, if, select, ...). Phases may nest (load_module runs inside
+load_program), their times are inclusive. In a library:
+
+    with mldsl_profile.profiling() as prof:
+        mldsl_compile.compile_entries(path)
+    prof.report()   # JSON-able dict
+    print(prof.table())
+
+Blocks compiled by --jobs worker processes are only timed as a whole (phase `blocks.parallel`).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import time
+from pathlib import Path
+from typing import Iterator
+
+
+class Timing:
+    __slots__ = ("count", "wall", "cpu")
+
+    def __init__(self):
+        self.count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def add(self, wall: float, cpu: float) -> None:
+        self.count += 1
+        self.wall += wall
+        self.cpu += cpu
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "wall": round(self.wall, 6), "cpu": round(self.cpu, 6)}
+
+
+class Profiler:
+    def __init__(self):
+        self.phases: dict[str, Timing] = {}
+        self.handlers: dict[str, Timing] = {}
+        self.blocks: list[dict] = []
+        self._start = (time.perf_counter(), time.process_time())
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.phase_add(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def phase_add(self, name: str, wall: float, cpu: float) -> None:
+        timing = self.phases.get(name) or self.phases.setdefault(name, Timing())
+        timing.add(wall, cpu)
+
+    def handler(self, kind: str, wall: float, cpu: float) -> None:
+        timing = self.handlers.get(kind) or self.handlers.setdefault(kind, Timing())
+        timing.add(wall, cpu)
+
+    def block(self, path: str | None, line: int, header: str, statements: int, wall: float, cpu: float, cached: bool) -> None:
+        self.blocks.append(
+            {
+                "file": path or "",
+                "line": line,
+                "header": header,
+                "statements": statements,
+                "cached": cached,
+                "wall": round(wall, 6),
+                "cpu": round(cpu, 6),
+            }
+        )
+
+    def report(self) -> dict:
+        wall = time.perf_counter() - self._start[0]
+        cpu = time.process_time() - self._start[1]
+        return {
+            "total": {"wall": round(wall, 6), "cpu": round(cpu, 6)},
+            "phases": {name: t.as_dict() for name, t in sorted(self.phases.items(), key=lambda kv: -kv[1].wall)},
+            "handlers": {kind: t.as_dict() for kind, t in sorted(self.handlers.items(), key=lambda kv: -kv[1].wall)},
+            "blocks": self.blocks,
+        }
+
+    def table(self, top: int = 15) -> str:
+        """Human-readable summary: phases, handlers and the `top` slowest blocks."""
+        rep = self.report()
+        lines = [f"total: {rep['total']['wall'] * 1000:.1f} ms wall, {rep['total']['cpu'] * 1000:.1f} ms cpu"]
+
+        def section(title: str, rows: dict) -> None:
+            if not rows:
+                return
+            lines.append("")
+            lines.append(f"{title:<32} {'count':>8} {'wall ms':>10} {'cpu ms':>10}")
+            for name, t in list(rows.items())[:top]:
+                lines.append(f"{name:<32} {t['count']:>8} {t['wall'] * 1000:>10.1f} {t['cpu'] * 1000:>10.1f}")
+
+        section("phase", rep["phases"])
+        section("handler", rep["handlers"])
+        slow = sorted(rep["blocks"], key=lambda b: -b["wall"])[:top]
+        if slow:
+            lines.append("")
+            lines.append(f"{'block':<48} {'stmts':>6} {'wall ms':>10} {'cpu ms':>10}")
+            for b in slow:
+                where = f"{Path(b['file']).name}:{b['line']} {b['header']}"
+                mark = " (cached)" if b["cached"] else ""
+                lines.append(
+                    f"{where[:48]:<48} {b['statements']:>6} {b['wall'] * 1000:>10.1f} {b['cpu'] * 1000:>10.1f}{mark}"
+                )
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def profiling() -> Iterator[Profiler]:
+    """Installs a Profiler into mldsl_compile for the duration of the block."""
+    import mldsl_compile as mc
+
+    prev = mc.PROFILER
+    prof = mc.PROFILER = Profiler()
+    try:
+        yield prof
+    finally:
+        mc.PROFILER = prev
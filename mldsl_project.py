@@ -0,0 +1,180 @@
+"""
+Project build: `mldsl_compile.py --project mldsl.project.json [--jobs N]`.
+
+Manifest (paths are relative to the manifest's folder):
+  {
+    "plan_dir": "out/plans",                      # default folder for plans (optional)
+    "summary": "out/plans/summary.json",          # combined summary (optional)
+    "entries": [
+      "modes/bedwars.mldsl",                      # plan: <plan_dir>/bedwars.json
+      {"src": "modes/skywars.mldsl", "plan": "out/sw_plan.json"}
+    ]
+  }
+
+The import graph of all entries is resolved once in the main process (every module is parsed once into its
+.mldslc artifact and the catalog snapshot is warmed), then the entry scripts are compiled by a pool of
+`--jobs` worker processes, each loading the catalog once for all the scripts it gets.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import mldsl_compile as mc
+
+
+def load_manifest(path: Path) -> tuple[list[tuple[Path, Path]], Path | None]:
+    """[(source, plan path)] in manifest order, and the summary path (if any)."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"project: не удалось прочитать манифест {path}: {e}")
+    if not isinstance(data, dict) or not isinstance(data.get("entries"), list):
+        raise ValueError(f"project: {path}: ожидается объект с массивом `entries`")
+    base = path.resolve().parent
+    plan_dir = base / data.get("plan_dir", "plans")
+    out: list[tuple[Path, Path]] = []
+    for item in data["entries"]:
+        if isinstance(item, str):
+            item = {"src": item}
+        if not isinstance(item, dict) or not item.get("src"):
+            raise ValueError(f"project: {path}: запись без `src`: {item!r}")
+        src = (base / item["src"]).resolve()
+        plan = base / item["plan"] if item.get("plan") else plan_dir / f"{src.stem}.json"
+        out.append((src, plan.resolve()))
+    summary = base / data["summary"] if data.get("summary") else None
+    return out, summary
+
+
+def _init_worker(api_path: str, aliases_path: str, allactions_path: str) -> None:
+    # workers may be spawned (Windows): re-apply the input paths of the parent process
+    mc.API_PATH = Path(api_path)
+    mc.ALIASES_PATH = Path(aliases_path)
+    mc.ALLACTIONS_PATH = Path(allactions_path)
+
+
+def compile_job(src: str, plan: str, cache: bool = True) -> dict:
+    """Compiles one entry script and writes its plan; never raises (errors go into the result)."""
+    t0 = time.perf_counter()
+    err = io.StringIO()
+    res = {"src": src, "plan": plan, "ok": False}
+    try:
+        with contextlib.redirect_stderr(err):
+            entries = mc.compile_entries(Path(src), cache=cache)
+        mc.write_plan(Path(plan), entries)
+        res["ok"] = True
+        res["entries"] = len(entries)
+        res["actions"] = sum(1 for e in entries if e.get("block") not in ("newline", "skip"))
+    except ValueError as e:
+        res["error"] = str(e)
+    except Exception as e:  # a compiler bug in one script must not take down the whole project build
+        res["error"] = f"{type(e).__name__}: {e}"
+    res["warnings"] = err.getvalue().splitlines()
+    res["seconds"] = round(time.perf_counter() - t0, 3)
+    return res
+
+
+def resolve_graph(sources: list[Path], cache: bool = True) -> tuple[dict[str, list[str]], dict[str, str]]:
+    """
+    Walks the union import graph once (parsing each module once, into its artifact).
+    Returns (module -> entry scripts importing it, entry -> error for entries that cannot be loaded).
+    """
+    users: dict[str, list[str]] = {}
+    errors: dict[str, str] = {}
+    for src in sources:
+        try:
+            program = mc.load_program(src, cache=cache)
+        except (ValueError, OSError) as e:
+            errors[str(src)] = str(e)
+            continue
+        for module in program.files:
+            users.setdefault(module, []).append(str(src))
+    return users, errors
+
+
+def split_seeds(todo: list[tuple[int, str, str]], users: dict[str, list[str]]) -> list[list[tuple[int, str, str]]]:
+    """[seed jobs, remaining jobs]: seeds cover every module imported by several entry scripts."""
+    seeds: set[str] = set()
+    for module, who in users.items():
+        if len(who) > 1 and not seeds.intersection(who):
+            seeds.add(who[0])
+    first = [job for job in todo if job[1] in seeds]
+    rest = [job for job in todo if job[1] not in seeds]
+    return [phase for phase in (first, rest) if phase]
+
+
+def build_project(manifest: Path, jobs: int = 1, *, cache: bool = True, summary_path: Path | None = None) -> dict:
+    t0 = time.perf_counter()
+    targets, manifest_summary = load_manifest(manifest)
+    summary_path = summary_path or manifest_summary
+
+    mc.load_inputs()  # builds/refreshes the catalog snapshot once; workers only load it
+    with contextlib.redirect_stderr(io.StringIO()):
+        users, load_errors = resolve_graph([src for src, _plan in targets], cache)
+
+    results: list[dict | None] = [None] * len(targets)
+    todo = []
+    for i, (src, plan) in enumerate(targets):
+        if str(src) in load_errors:
+            error = load_errors[str(src)]
+            results[i] = {"src": str(src), "plan": str(plan), "ok": False, "error": error, "warnings": []}
+        else:
+            todo.append((i, str(src), str(plan)))
+
+    jobs = max(1, min(jobs, len(todo) or 1))
+    if jobs == 1:
+        for i, src, plan in todo:
+            results[i] = compile_job(src, plan, cache)
+    else:
+        paths = (str(mc.API_PATH), str(mc.ALIASES_PATH), str(mc.ALLACTIONS_PATH))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=paths) as pool:
+            # Seeds first: one importer per shared module compiles (and caches) the module's blocks, the
+            # other importers then reuse them instead of all compiling the same library at once.
+            phases = split_seeds(todo, users) if cache else [todo]
+            for phase in phases:
+                futures = [(i, pool.submit(compile_job, src, plan, cache)) for i, src, plan in phase]
+                for i, fut in futures:
+                    results[i] = fut.result()
+
+    summary = {
+        "manifest": str(manifest.resolve()),
+        "jobs": jobs,
+        "ok": all(r["ok"] for r in results),
+        "compiled": sum(1 for r in results if r["ok"]),
+        "failed": sum(1 for r in results if not r["ok"]),
+        "modules": len(users),
+        "shared_modules": sorted(m for m, who in users.items() if len(who) > 1),
+        "seconds": round(time.perf_counter() - t0, 3),
+        "entries": results,
+    }
+    if summary_path is not None:
+        summary_path.parent.mkdir(parents=True, exist_ok=True)
+        summary_path.write_text(json.dumps(summary, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return summary
+
+
+def print_summary(summary: dict, out=sys.stderr) -> None:
+    for r in summary["entries"]:
+        for w in r.get("warnings") or []:
+            print(f"{r['src']}: {w}", file=out)
+        if r["ok"]:
+            print(f"[ok] {r['src']} -> {r['plan']} ({r['actions']} actions, {r['seconds']}s)", file=out)
+        else:
+            print(f"[error] {r['src']}: {r['error']}", file=out)
+    print(
+        f"[project] {summary['compiled']} compiled, {summary['failed']} failed, "
+        f"{summary['modules']} modules ({len(summary['shared_modules'])} shared), "
+        f"jobs={summary['jobs']}, {summary['seconds']}s",
+        file=out,
+    )
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
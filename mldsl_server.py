@@ -0,0 +1,139 @@
+"""
+Line-delimited JSON-RPC transport for `mldsl_compile.py --serve`.
+
+One request per line, one response per line (UTF-8 JSON, JSON-RPC 2.0 envelope):
+  -> {"jsonrpc": "2.0", "id": 1, "method": "plan", "params": {"path": "main.mldsl", "text": "..."}}
+  <- {"jsonrpc": "2.0", "id": 1, "result": {...}}
+  <- {"jsonrpc": "2.0", "id": 1, "error": {"code": 1, "message": "...", "data": {...}}}
+
+The methods themselves are supplied by the caller as plain functions `params -> result`. Each socket client
+is served by its own thread, so requests of different clients run concurrently; handlers must be thread-safe
+(the compiler's are: its shared memos and caches are locked, [warn] lines are collected per thread).
+Handlers reject bad params with RpcError(INVALID_PARAMS); any other exception is an internal error.
+"""
+
+from __future__ import annotations
+
+import json
+import socketserver
+import sys
+import threading
+from typing import Callable
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+# ValueError raised by a handler = user-facing compile error
+COMPILE_ERROR = 1
+
+Handler = Callable[[dict], object]
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str, data: object = None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+class RpcDispatcher:
+    def __init__(self, handlers: dict[str, Handler]):
+        self.handlers = handlers
+        self.shutdown = threading.Event()
+
+    def _call(self, method: str, params: dict) -> object:
+        if method == "shutdown":
+            self.shutdown.set()
+            return None
+        handler = self.handlers.get(method)
+        if handler is None:
+            raise RpcError(METHOD_NOT_FOUND, f"unknown method: {method}")
+        return handler(params)
+
+    def handle_line(self, line: str) -> str | None:
+        """Response line for one request line; None for notifications (no id) and blank lines."""
+        if not line.strip():
+            return None
+        req_id = None
+        try:
+            try:
+                req = json.loads(line)
+            except ValueError as e:
+                raise RpcError(PARSE_ERROR, f"invalid json: {e}")
+            if not isinstance(req, dict) or not isinstance(req.get("method"), str):
+                raise RpcError(INVALID_REQUEST, "request must be an object with a string `method`")
+            req_id = req.get("id")
+            params = req.get("params") or {}
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, "params must be an object")
+            try:
+                result = self._call(req["method"], params)
+            except RpcError:
+                raise
+            except ValueError as e:
+                raise RpcError(COMPILE_ERROR, str(e))
+            except Exception as e:
+                raise RpcError(INTERNAL_ERROR, f"{type(e).__name__}: {e}")
+            if "id" not in req:
+                return None
+            resp = {"jsonrpc": "2.0", "id": req_id, "result": result}
+        except RpcError as e:
+            err = {"code": e.code, "message": str(e)}
+            if e.data is not None:
+                err["data"] = e.data
+            resp = {"jsonrpc": "2.0", "id": req_id, "error": err}
+        return json.dumps(resp, ensure_ascii=False)
+
+
+def serve_stdio(handlers: dict[str, Handler]) -> None:
+    rpc = RpcDispatcher(handlers)
+    stdin = open(sys.stdin.fileno(), "r", encoding="utf-8", closefd=False)
+    stdout = open(sys.stdout.fileno(), "w", encoding="utf-8", closefd=False)
+    for line in stdin:
+        resp = rpc.handle_line(line)
+        if resp is not None:
+            stdout.write(resp + "\n")
+            stdout.flush()
+        if rpc.shutdown.is_set():
+            break
+
+
+class _RpcStreamHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        rpc: RpcDispatcher = self.server.rpc
+        for raw in self.rfile:
+            resp = rpc.handle_line(raw.decode("utf-8", errors="replace"))
+            if resp is not None:
+                self.wfile.write(resp.encode("utf-8") + b"\n")
+                self.wfile.flush()
+            if rpc.shutdown.is_set():
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                break
+
+
+class _RpcTcpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve_tcp(handlers: dict[str, Handler], host: str, port: int) -> None:
+    with _RpcTcpServer((host, port), _RpcStreamHandler) as server:
+        server.rpc = RpcDispatcher(handlers)
+        host, port = server.server_address[:2]
+        # clients started with port 0 read the real port from this line
+        print(f"[serve] listening on {host}:{port}", file=sys.stderr, flush=True)
+        server.serve_forever()
+
+
+def parse_address(addr: str) -> tuple[str, int] | None:
+    """`stdio` -> None, `PORT` / `HOST:PORT` -> (host, port); host defaults to 127.0.0.1."""
+    if addr in ("", "-", "stdio"):
+        return None
+    host, _, port = addr.rpartition(":")
+    try:
+        return (host or "127.0.0.1", int(port))
+    except ValueError:
+        raise ValueError(f"--serve: ожидается stdio, PORT или HOST:PORT, получено: {addr}")
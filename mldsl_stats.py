@@ -0,0 +1,181 @@
+"""
+Compile statistics: `mldsl_compile.py file.mldsl --stats [stats.json]` (alone, or with --plan / --print-plan).
+
+For every top-level event/func/loop: the actions emitted, how many of them the compiler added for sugar (args/ret
+stack traffic of func calls, writes to formula temporaries, select restores, `skip` closing if brackets), the
+distinct temporary variables and the length of the block's /placeadvanced command against MAX_CMD_LEN.
+In a library:
+
+    with mldsl_stats.collecting() as stats:
+        mldsl_compile.compile_entries(path)
+    stats.report()   # JSON-able dict
+    print(stats.table())
+
+Blocks are counted from their compiled entries, so cached blocks and --jobs are counted like any other
+(only the whole-build cache is skipped while collecting).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import re
+from pathlib import Path
+from typing import Iterator
+
+import mldsl_compile as mc
+from mldsl_compile import Entry
+from mldsl_parser import Stmt
+
+SUGAR_KEYS = (
+    "args_push",
+    "args_peek",
+    "args_pop",
+    "ret_push",
+    "ret_peek",
+    "ret_pop",
+    "temp_writes",
+    "select_restores",
+    "skips",
+)
+# actions the compiler writes temporaries with: a numeric formula step, or a stack peek into `var`
+TEMP_WRITERS = (
+    ("var", "set_value"),
+    ("var", "set_sum"),
+    ("var", "set_difference"),
+    ("var", "set_product"),
+    ("var", "set_quotient"),
+    ("array", "get_array"),
+)
+TEMP_VAR_RE = re.compile(rf"=var\(((?:__mlcc_tmp|__mlcc_acc|{mc.TMP_VAR_PREFIX})\d+)\)$")
+
+
+class CompileStats:
+    def __init__(self, inputs: mc.CompilerInputs):
+        api = inputs.api
+        resolver = mc.ActionResolver(inputs.sign1_aliases, inputs.blocks)
+        index = mc.api_index(api)
+        # (block, name) of the stack protocol actions (mldsl_compile.stack_*_action)
+        self.stack_ops = {
+            resolver.resolve(mc.stack_push_action(api, mc.ARGS_STACK_NAME, "text()")[1]): "push",
+            resolver.resolve(mc.stack_peek_action(api, mc.ARGS_STACK_NAME, "var(x)")[1]): "peek",
+            resolver.resolve(mc.stack_pop_action(api, mc.ARGS_STACK_NAME)[1]): "pop",
+        }
+        self.stacks = {f"=arr({mc.ARGS_STACK_NAME})": "args", f"=arr({mc.RET_STACK_NAME})": "ret"}
+        # (block, name) -> `slot(N)=` prefix of the variable the action writes
+        self.temp_writers: dict[tuple[str, str], str] = {}
+        for module, func in TEMP_WRITERS:
+            _canon, spec = index.find(module, func)
+            param = index.params_by_name(spec).get("var") if spec else None
+            if param is not None:
+                self.temp_writers[resolver.resolve(spec)] = f"slot({param['slot']})="
+        self.blocks: list[dict] = []
+
+    def block(self, stmts: list[Stmt], entries: list[Entry]) -> None:
+        """Counts one compiled top-level block (its statements and its entries, header first)."""
+        if not entries:
+            return
+        head, actions = entries[0], entries[1:]
+        sugar = dict.fromkeys(SUGAR_KEYS, 0)
+        temps: set[str] = set()
+        placed = []
+        for e in actions:
+            args = e.args if type(e.args) is tuple else ()
+            key = (e.block, e.name)
+            placed.append((e.block, e.name or "", e.as_dict()["args"]))
+            if e.block == "skip":
+                sugar["skips"] += 1
+                continue
+            stack = None
+            op = self.stack_ops.get(key)
+            if op is not None and args:
+                stack = next((s for suffix, s in self.stacks.items() if args[0].endswith(suffix)), None)
+                if stack is not None:
+                    sugar[f"{stack}_{op}"] += 1
+            prefix = self.temp_writers.get(key)
+            if prefix is not None:
+                for piece in args:
+                    if piece.startswith(prefix):
+                        m = TEMP_VAR_RE.search(piece)
+                        if m:
+                            temps.add(m.group(1))
+                            # a stack peek into a temporary is already counted as stack traffic
+                            if stack is None:
+                                sugar["temp_writes"] += 1
+                        break
+        # every `select.x { ... }` restores the previous selection with one action at its `}`
+        sugar["select_restores"] = sum(1 for st in stmts if st.kind == "select" and st.has_block)
+        cmd = mc.build_placeadvanced_command(event_block=head.block, event_name=head.name or "", actions=placed)
+        first = stmts[0]
+        self.blocks.append(
+            {
+                "file": first.path or "",
+                "line": first.line,
+                "kind": first.kind,
+                "name": first.name or "",
+                "actions": len(actions),
+                "sugar": sum(sugar.values()),
+                "sugar_by_kind": sugar,
+                "temp_vars": len(temps),
+                "command_length": len(cmd),
+                "over_limit": len(cmd) > mc.MAX_CMD_LEN,
+            }
+        )
+
+    def report(self) -> dict:
+        blocks = self.blocks
+        sugar = {k: sum(b["sugar_by_kind"][k] for b in blocks) for k in SUGAR_KEYS}
+        return {
+            "max_command_length": mc.MAX_CMD_LEN,
+            "total": {
+                "blocks": len(blocks),
+                "actions": sum(b["actions"] for b in blocks),
+                "sugar": sum(sugar.values()),
+                "sugar_by_kind": sugar,
+                "temp_vars": sum(b["temp_vars"] for b in blocks),
+                "over_limit": sum(1 for b in blocks if b["over_limit"]),
+            },
+            "blocks": blocks,
+        }
+
+    def table(self, top: int = 15) -> str:
+        """Human-readable summary: totals and the `top` blocks with the most actions (0 = every block)."""
+        rep = self.report()
+        total = rep["total"]
+        share = total["sugar"] / total["actions"] if total["actions"] else 0.0
+        lines = [
+            f"blocks: {total['blocks']}, actions: {total['actions']} (sugar {total['sugar']}, {share:.0%}), "
+            f"temp vars: {total['temp_vars']}, over {mc.MAX_CMD_LEN} chars: {total['over_limit']}"
+        ]
+        by_kind = total["sugar_by_kind"]
+        if total["sugar"]:
+            lines.append("sugar: " + ", ".join(f"{k} {v}" for k, v in by_kind.items() if v))
+        rows = sorted(rep["blocks"], key=lambda b: -b["actions"])
+        if top > 0:
+            rows = rows[:top]
+        if rows:
+            lines.append("")
+            lines.append(
+                f"{'block':<40} {'actions':>7} {'sugar':>6} {'stack':>6} {'temps':>6} "
+                f"{'select':>6} {'skip':>5} {'vars':>5} {'cmd len':>8}"
+            )
+            for b in rows:
+                s = b["sugar_by_kind"]
+                stack = sum(v for k, v in s.items() if k.startswith(("args_", "ret_")))
+                where = f"{Path(b['file']).name}:{b['line']} {b['kind']} {b['name']}"
+                mark = " !" if b["over_limit"] else ""
+                lines.append(
+                    f"{where[:40]:<40} {b['actions']:>7} {b['sugar']:>6} {stack:>6} {s['temp_writes']:>6} "
+                    f"{s['select_restores']:>6} {s['skips']:>5} {b['temp_vars']:>5} {b['command_length']:>8}{mark}"
+                )
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def collecting(inputs: mc.CompilerInputs | None = None) -> Iterator[CompileStats]:
+    """Installs a CompileStats into mldsl_compile for the duration of the block."""
+    prev = mc.STATS
+    stats = mc.STATS = CompileStats(inputs or mc.load_inputs())
+    try:
+        yield stats
+    finally:
+        mc.STATS = prev
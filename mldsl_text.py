@@ -0,0 +1,149 @@
+"""
+Text normalization shared by the compiler (mldsl_compile.py) and the catalog tools (tools/*.py).
+
+Server strings carry `§x` color codes, control characters and sometimes cp1251 text decoded as latin-1
+("Ñîîáùåíèå" instead of "Сообщение"). Everything here is called for every catalog record and for most
+compiled actions, so patterns and translate tables are built once, ASCII/clean strings take a fast path
+and norm_key() is memoized.
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+# `§` + one char (not a newline, like the old per-call re.sub), or any control char.
+_CODES_RE = re.compile(r"§.|[\x00-\x1f]")
+_WS_RE = re.compile(r"\s+")
+_IDENT_SEP_RE = re.compile(r"[\s_\\-]+")
+_QUOTES_RE = re.compile(r"[\"'`]+")
+
+# common mojibake fix (cp1251 bytes decoded as latin-1)
+_MOJIBAKE = str.maketrans(
+    {
+        "à": "а",
+        "á": "б",
+        "â": "в",
+        "ã": "г",
+        "ä": "д",
+        "å": "е",
+        "¸": "ё",
+        "æ": "ж",
+        "ç": "з",
+        "è": "и",
+        "é": "й",
+        "ê": "к",
+        "ë": "л",
+        "ì": "м",
+        "í": "н",
+        "î": "о",
+        "ï": "п",
+        "ð": "р",
+        "ñ": "с",
+        "ò": "т",
+        "ó": "у",
+        "ô": "ф",
+        "õ": "х",
+        "ö": "ц",
+        "ø": "ш",
+        "ù": "щ",
+        "ú": "ъ",
+        "û": "ы",
+        "ü": "ь",
+        "ý": "э",
+        "þ": "ю",
+        "ÿ": "я",
+        "À": "А",
+        "Á": "Б",
+        "Â": "В",
+        "Ã": "Г",
+        "Ä": "Д",
+        "Å": "Е",
+        "¨": "Ё",
+        "Æ": "Ж",
+        "Ç": "З",
+        "È": "И",
+        "É": "Й",
+        "Ê": "К",
+        "Ë": "Л",
+        "Ì": "М",
+        "Í": "Н",
+        "Î": "О",
+        "Ï": "П",
+        "Ð": "Р",
+        "Ñ": "С",
+        "Ò": "Т",
+        "Ó": "У",
+        "Ô": "Ф",
+        "Õ": "Х",
+        "Ö": "Ц",
+        "×": "Ч",
+        "Ø": "Ш",
+        "Ù": "Щ",
+        "Ú": "Ъ",
+        "Û": "Ы",
+        "Ü": "Ь",
+        "Ý": "Э",
+        "Þ": "Ю",
+        "ß": "Я",
+    }
+)
+
+NORM_KEY_CACHE_SIZE = 16384
+
+
+def strip_color_codes(text: str) -> str:
+    """Remove `§x` color codes and control characters."""
+    if not text:
+        return ""
+    if text.isascii() and text.isprintable():
+        return text
+    return _CODES_RE.sub("", text)
+
+
+def strip_colors(text: str) -> str:
+    """strip_color_codes() + mojibake fix."""
+    if not text:
+        return ""
+    if text.isascii():
+        return text if text.isprintable() else _CODES_RE.sub("", text)
+    if "§" in text or not text.isprintable():
+        text = _CODES_RE.sub("", text)
+    return text.translate(_MOJIBAKE)
+
+
+def norm_space(text: str) -> str:
+    """NBSP -> space, collapse whitespace, strip, lowercase."""
+    return _WS_RE.sub(" ", text.replace("\u00a0", " ")).strip().lower()
+
+
+@lru_cache(maxsize=NORM_KEY_CACHE_SIZE)
+def norm_key(text: str) -> str:
+    return norm_space(strip_colors(text))
+
+
+def norm_ident(text: str) -> str:
+    """Identifier-ish key: lowercase, no spaces/underscores/backslashes/dashes."""
+    return _IDENT_SEP_RE.sub("", strip_colors(text or "").lower())
+
+
+def norm_enum_value(text: str) -> str:
+    # ignore spaces/punctuation/case for matching; keep RU letters
+    return _QUOTES_RE.sub("", norm_ident(text))
+
+
+def parse_item_display_name(raw: str) -> str:
+    """
+    catalog 'subitem' looks like:
+      [minecraft:quartz_stairs meta=0] §cСравнить числа | §7...
+    We need the clickable menu name: "Сравнить числа".
+    """
+    if not raw:
+        return ""
+    s = strip_colors(raw)
+    if "]" in s:
+        s = s.split("]", 1)[1]
+    s = s.strip()
+    if "|" in s:
+        s = s.split("|", 1)[0].strip()
+    return s
@@ -0,0 +1,130 @@
+"""
+Watch mode: `mldsl_compile.py --watch <file|dir> --plan out.json`.
+
+- file: the entry script and every file it imports are watched; the plan goes to --plan.
+- dir: every *.mldsl under the folder that no other one imports is an entry script; --plan is a folder
+  and gets <plan>/<name>.json per entry (like a project build).
+
+The process stays up between builds, so the catalog, the api index, parsed modules and compiled blocks stay in
+memory: a save recompiles only the blocks that changed. Files are polled (stdlib only, works the same on every
+OS); a burst of saves (editor "save all", git checkout) is debounced into one build. Plans are replaced
+atomically (write_plan), the mod never reads a half-written file.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+import mldsl_compile as mc
+from mldsl_cache import file_stat
+
+POLL_INTERVAL = 0.2  # seconds between polls
+DEBOUNCE = 0.3  # build once no watched file changed for this long
+
+
+def find_entries(folder: Path, *, cache: bool = True) -> list[Path]:
+    """*.mldsl files under `folder` not imported by another one (files that fail to load count as entries)."""
+    sources = sorted(p.resolve() for p in folder.rglob("*.mldsl"))
+    imported: set[str] = set()
+    for src in sources:
+        try:
+            program = mc.load_program(src, cache=cache)
+        except (ValueError, OSError):
+            continue
+        imported.update(name for name in program.files if name != str(src))
+    return [src for src in sources if str(src) not in imported]
+
+
+class Watcher:
+    def __init__(self, target: Path, plan: Path, *, cache: bool = True, jobs: int = 1, out=sys.stderr):
+        self.target = target.resolve()
+        self.plan = plan
+        self.cache = cache
+        self.jobs = jobs
+        self.out = out
+        self.is_dir = self.target.is_dir()
+        # entry script -> files its last build read (only the entry itself if it failed to load)
+        self.entries: dict[Path, set[str]] = {}
+
+    def plan_path(self, src: Path) -> Path:
+        return self.plan / f"{src.stem}.json" if self.is_dir else self.plan
+
+    def watched(self) -> dict[str, tuple[int, int] | None]:
+        """Stats of every file a rebuild depends on (sources and compiler inputs)."""
+        names = {str(p) for p in mc.input_paths().values()}
+        for files in self.entries.values():
+            names.update(files)
+        if self.is_dir:
+            names.update(str(p.resolve()) for p in self.target.rglob("*.mldsl"))
+        return {name: file_stat(Path(name)) for name in sorted(names)}
+
+    def refresh_entries(self) -> None:
+        sources = find_entries(self.target, cache=self.cache) if self.is_dir else [self.target]
+        self.entries = {src: self.entries.get(src) or {str(src)} for src in sources}
+
+    def build(self, changed: set[str] | None = None) -> None:
+        """Rebuilds the entries that read a changed file (all of them if `changed` is None)."""
+        inputs = {str(p) for p in mc.input_paths().values()}
+        if changed is None or changed & inputs or (self.is_dir and any(n.endswith(".mldsl") for n in changed)):
+            old = set(self.entries)
+            self.refresh_entries()
+            if self.is_dir and changed is not None:
+                for src in sorted(old - set(self.entries)):
+                    print(f"[watch] {src}: no longer an entry script", file=self.out)
+            if changed is not None and not changed & inputs:
+                todo = [src for src, files in self.entries.items() if src not in old or files & changed]
+            else:
+                todo = list(self.entries)
+        else:
+            todo = [src for src, files in self.entries.items() if files & changed]
+        for src in todo:
+            self.build_entry(src)
+
+    def build_entry(self, src: Path) -> None:
+        t0 = time.perf_counter()
+        plan = self.plan_path(src)
+        try:
+            program = mc.load_program(src, cache=self.cache)
+            self.entries[src] = set(program.files)
+            entries = mc.compile_entries(src, cache=self.cache, jobs=self.jobs)
+            mc.write_plan(plan, entries)
+        except (ValueError, OSError) as e:
+            # the previous plan stays in place; fixing the file triggers the next build
+            print(f"[error] {src}: {e}", file=self.out, flush=True)
+            return
+        actions = sum(1 for e in entries if e.get("block") not in ("newline", "skip"))
+        seconds = time.perf_counter() - t0
+        print(f"[watch] {src} -> {plan} ({actions} actions, {seconds:.2f}s)", file=self.out, flush=True)
+
+    def run(self, interval: float = POLL_INTERVAL, debounce: float = DEBOUNCE) -> None:
+        stats = self.watched()
+        self.build()
+        stats = {name: stats.get(name, st) for name, st in self.watched().items()}
+        print(f"[watch] watching {len(stats)} files, Ctrl+C to stop", file=self.out, flush=True)
+        changed: set[str] = set()
+        last_change = 0.0
+        try:
+            while True:
+                time.sleep(interval)
+                now_stats = self.watched()
+                if now_stats != stats:
+                    changed.update(n for n in now_stats.keys() | stats.keys() if now_stats.get(n) != stats.get(n))
+                    stats = now_stats
+                    last_change = time.monotonic()
+                    continue
+                if changed and time.monotonic() - last_change >= debounce:
+                    self.build(changed)
+                    changed = set()
+                    # pick up files the build started to depend on (new imports); files edited during the
+                    # build keep their old stat, so they trigger the next build
+                    stats = {name: stats.get(name, st) for name, st in self.watched().items()}
+        except KeyboardInterrupt:
+            pass
+
+
+def watch(target: Path, plan: Path, *, cache: bool = True, jobs: int = 1) -> None:
+    if not target.exists():
+        raise ValueError(f"--watch: не найден файл или папка: {target}")
+    Watcher(target, plan, cache=cache, jobs=jobs).run()
@@ -0,0 +1,128 @@
+"""
+The compile caches (inputs snapshot, compiled blocks, whole builds, .mldslc module artifacts) against edits:
+after every change a cached build must equal a --no-cache build.
+"""
+
+import json
+import os
+
+import pytest
+
+import mldsl_compile as mc
+from bench import fixtures
+from mldsl_cache import CACHE_DIR_ENV, load_snapshot
+
+LIB = """\
+func greet(a) {
+    player.message("hi", a)
+}
+"""
+MAIN = """\
+import lib
+event(join) {
+    player.message("start")
+    greet("x")
+}
+event("Правый клик") {
+    misc.wait(num=3)
+}
+"""
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    paths = fixtures.write_inputs(tmp_path / "out")
+    monkeypatch.setattr(mc, "API_PATH", paths["api"])
+    monkeypatch.setattr(mc, "ALIASES_PATH", paths["aliases"])
+    monkeypatch.setattr(mc, "ALLACTIONS_PATH", paths["allactions"])
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    src = tmp_path / "src"
+    src.mkdir()
+    edit(src / "lib.mldsl", LIB)
+    edit(src / "main.mldsl", MAIN)
+    return src / "main.mldsl", paths
+
+
+def edit(path, text):
+    """Writes `text` and moves mtime forward, so the edit is seen even with a coarse filesystem clock."""
+    path.write_text(text, encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+
+
+def build(main):
+    """(cached build, --no-cache build); the cached one is built twice so the second hits the build record."""
+    mc.compile_entries(main)
+    return mc.compile_entries(main), mc.compile_entries(main, cache=False)
+
+
+def test_cached_build_matches_uncached(project):
+    main, _paths = project
+    cached, fresh = build(main)
+    assert cached == fresh
+    assert any(e.get("name") for e in fresh)
+
+
+def test_edit_imported_module(project):
+    main, _paths = project
+    before, _ = build(main)
+    edit(main.with_name("lib.mldsl"), LIB.replace('"hi"', '"hello"'))
+    cached, fresh = build(main)
+    assert cached == fresh
+    assert cached != before
+
+
+def test_change_func_signature(project):
+    main, _paths = project
+    before, _ = build(main)
+    edit(main.with_name("lib.mldsl"), LIB.replace("greet(a)", "greet(a, b)").replace(", a)", ", a, b)"))
+    edit(main, MAIN.replace('greet("x")', 'greet("x", "y")'))
+    cached, fresh = build(main)
+    assert cached == fresh
+    assert cached != before
+    # only the callee's signature changes; the caller's text stays the same
+    edit(main.with_name("lib.mldsl"), LIB.replace("greet(a)", "greet(b)").replace(", a)", ", b)"))
+    edit(main, MAIN)
+    cached, fresh = build(main)
+    assert cached == fresh
+    # a cached caller block must not survive an arity change of the callee
+    edit(main.with_name("lib.mldsl"), LIB.replace("greet(a)", "greet(a, b)"))
+    with pytest.raises(ValueError, match="ожидалось аргументов 2"):
+        mc.compile_entries(main)
+
+
+def test_change_api_aliases(project):
+    main, paths = project
+    before, _ = build(main)
+    api = json.loads(paths["api"].read_text(encoding="utf-8"))
+    message = api["player"]["soobschenie"]
+    message["sign2"] = message["gui"] = "Написать сообщение"
+    for param in message["params"]:
+        param["slot"] += 1
+    edit(paths["api"], json.dumps(api, ensure_ascii=False, indent=2))
+    cached, fresh = build(main)
+    assert cached == fresh
+    assert cached != before
+
+
+def test_build_cache_is_per_text(project):
+    main, _paths = project
+    mc.compile_entries(main)
+    text = MAIN.replace('"start"', '"unsaved"')
+    assert mc.compile_entries(main, text) == mc.compile_entries(main, text, cache=False)
+    assert mc.compile_entries(main) == mc.compile_entries(main, cache=False)
+
+
+def test_snapshot_of_input_edited_during_build(tmp_path):
+    src = tmp_path / "input.txt"
+    edit(src, "v1")
+    snap = tmp_path / "snap.marshal"
+
+    def build_and_edit():
+        data = {"v": src.read_text(encoding="utf-8")}
+        edit(src, "v2-edited")  # saved by the user while the snapshot was being built
+        return data
+
+    assert load_snapshot(snap, {"src": src}, 1, build_and_edit)[0] == {"v": "v1"}
+    data, _fingerprint = load_snapshot(snap, {"src": src}, 1, lambda: {"v": src.read_text(encoding="utf-8")})
+    assert data == {"v": "v2-edited"}
@@ -0,0 +1,111 @@
+import io
+import json
+
+import pytest
+
+from mldsl_plan import decode, decode_args, dump_plan, dump_plan_v2, encode_args, encode_v2, structured_entries
+
+ENTRIES = [
+    {"block": "diamond_block", "name": "Вход игрока||Вход", "args": "no"},
+    {"block": "iron_block", "name": "Установить значение||=", "args": "slot(13)=var(x),slot(27)=num(5)"},
+    {"block": "cobblestone", "name": "Отправить сообщение||Сообщение", "args": "slot(27)=text(a, b),clicks(22,2)=0"},
+    {"block": "iron_block", "name": "Установить значение||=", "args": "slot(13)=var(x),slot(27)=num(5)"},
+    {"block": "skip", "name": "", "args": "no"},
+    {"block": "newline"},
+    {"block": "emerald_block", "name": "tick", "args": "20"},
+    {"block": "cobblestone", "name": "Отправить сообщение||Сообщение", "args": "slot(27)=text(\"q\")"},
+]
+
+
+def test_v2_roundtrip():
+    assert decode(encode_v2(ENTRIES)) == ENTRIES
+
+
+@pytest.mark.parametrize("intern_args", [False, True])
+def test_dump_v2_roundtrip(intern_args):
+    out = io.StringIO()
+    assert dump_plan_v2(ENTRIES, out, intern_args=intern_args) == len(ENTRIES)
+    plan = json.loads(out.getvalue())
+    assert plan["format"] == 2
+    assert ("args" in plan) == intern_args
+    assert decode(plan) == ENTRIES
+
+
+def test_v2_interns_repeated_actions_and_args():
+    plan = encode_v2(ENTRIES, intern_args=True)
+    assert len(plan["actions"]) == len({(e["block"], e.get("name")) for e in ENTRIES})
+    # used twice -> interned, used once -> inline
+    assert "slot(13)=var(x),slot(27)=num(5)" in plan["args"]
+    assert "slot(27)=text(\"q\")" not in plan["args"]
+
+
+def test_v2_structured_roundtrip():
+    entries = list(structured_entries(ENTRIES))
+    out = io.StringIO()
+    dump_plan_v2(entries, out, intern_args=True)
+    assert decode(json.loads(out.getvalue())) == entries
+
+
+def test_dump_plan_matches_json_dumps():
+    out = io.StringIO()
+    assert dump_plan(ENTRIES, out) == len(ENTRIES)
+    assert out.getvalue() == json.dumps({"entries": ENTRIES}, ensure_ascii=False, indent=2) + "\n"
+
+
+def test_dump_plan_structured_matches_json_dumps():
+    entries = list(structured_entries(ENTRIES))
+    out = io.StringIO()
+    dump_plan(entries, out)
+    assert out.getvalue() == json.dumps({"entries": entries}, ensure_ascii=False, indent=2) + "\n"
+
+
+@pytest.mark.parametrize("entries", [ENTRIES, []])
+def test_dump_plan_compact_loads_back(entries):
+    out = io.StringIO()
+    dump_plan(entries, out, compact=True)
+    assert json.loads(out.getvalue()) == {"entries": entries}
+    assert decode(json.loads(out.getvalue())) == entries
+
+
+def test_decode_rejects_broken_v2():
+    with pytest.raises(ValueError):
+        decode({"format": 2, "actions": [["iron_block", "x"]], "entries": [[3]]})
+    with pytest.raises(ValueError):
+        decode({"format": 7, "entries": []})
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        "no",
+        "slot(13)=var(x)",
+        "slot(13)=var(x),slot(27)=num(5)",
+        "slot(27)=text(a, b),clicks(22,2)=0",
+        "slot(0)=stone,slot(27)=text()",
+        "slot(27)=text(x,y=1)",
+    ],
+)
+def test_args_roundtrip(args):
+    assert encode_args(decode_args(args)) == args
+
+
+def test_decode_args_pieces():
+    assert decode_args("no") == []
+    assert decode_args("slot(27)=text(a,b),clicks(22,2)=0,slot(0)=stone") == [
+        {"slot": 27, "kind": "text", "value": "a,b"},
+        {"slot": 22, "clicks": 2},
+        {"slot": 0, "kind": "", "value": "stone"},
+    ]
+
+
+def test_text_with_piece_separator():
+    # a text containing `,slot(N)=` cannot be told apart from the next piece in the legacy string...
+    args = [{"slot": 27, "kind": "text", "value": "a,slot(5)=b"}]
+    legacy = encode_args(args)
+    assert legacy == "slot(27)=text(a,slot(5)=b)"
+    assert decode_args(legacy) != args
+    # ...while a structured plan keeps it as written
+    entries = [{"block": "diamond_block", "name": "e", "args": "no"}, {"block": "cobblestone", "name": "m", "args": args}]
+    out = io.StringIO()
+    dump_plan_v2(entries, out)
+    assert decode(json.loads(out.getvalue())) == entries
@@ -0,0 +1,11 @@
+"""
+Imported first by the tools that use the shared modules of the repo root (mldsl_text, ...): a tool is run as a
+script from tools/, so only tools/ is on sys.path.
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -2,6 +2,9 @@ import json
 import re
 from pathlib import Path
 
+import _repo_root  # noqa: F401
+from mldsl_text import strip_color_codes as strip_colors
+
 EXPORT = Path(r"C:\Users\trysmile\AppData\Roaming\.minecraft\regallactions_export.txt")
 OUT_JSON = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\out\export_audit.json")
 
@@ -9,14 +12,6 @@ GLASS = "minecraft:stained_glass_pane"
 ITEM_RE = re.compile(r"^item=slot\s+(\d+):\s+\[([^\s]+)\s+meta=(\d+)\]\s+(.*)$")
 
 
-def strip_colors(text: str) -> str:
-    if not text:
-        return ""
-    text = re.sub(r"\u00a7.", "", text)
-    text = re.sub(r"[\x00-\x1f]", "", text)
-    return text
-
-
 def read_text_utf8(path: Path) -> str:
     return path.read_bytes().replace(b"\x00", b"").decode("utf-8", errors="replace")
 
@@ -2,92 +2,19 @@ import json
 import re
 from pathlib import Path
 
+import _repo_root  # noqa: F401
+from mldsl_text import parse_item_display_name, strip_colors
+
 CATALOG_PATH = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\out\actions_catalog.json")
 OUT_API = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\out\api_aliases.json")
+# Per-module shards for the compiler (mldsl_compile.load_api), next to api_aliases.json.
+OUT_API_SHARDS = OUT_API.parent / "api"
+# Only docs/extension read these; they are left out of the shards.
+DOC_FIELDS = ("description", "descriptionRaw")
 TRANSLATIONS_PATH = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\tools\action_translations.json")
 TRANSLATIONS_BY_ID_PATH = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\tools\action_translations_by_id.json")
 
 
-def strip_colors(text: str) -> str:
-    if not text:
-        return ""
-    text = re.sub(r"\u00a7.", "", text)
-    text = re.sub(r"[\x00-\x1f]", "", text)
-    # Fix common mojibake where cp1251 bytes were decoded as latin-1 (àáâ...)
-    text = text.translate(
-        str.maketrans(
-            {
-                "à": "а",
-                "á": "б",
-                "â": "в",
-                "ã": "г",
-                "ä": "д",
-                "å": "е",
-                "¸": "ё",
-                "æ": "ж",
-                "ç": "з",
-                "è": "и",
-                "é": "й",
-                "ê": "к",
-                "ë": "л",
-                "ì": "м",
-                "í": "н",
-                "î": "о",
-                "ï": "п",
-                "ð": "р",
-                "ñ": "с",
-                "ò": "т",
-                "ó": "у",
-                "ô": "ф",
-                "õ": "х",
-                "ö": "ц",
-                "ø": "ш",
-                "ù": "щ",
-                "ú": "ъ",
-                "û": "ы",
-                "ü": "ь",
-                "ý": "э",
-                "þ": "ю",
-                "ÿ": "я",
-                "À": "А",
-                "Á": "Б",
-                "Â": "В",
-                "Ã": "Г",
-                "Ä": "Д",
-                "Å": "Е",
-                "¨": "Ё",
-                "Æ": "Ж",
-                "Ç": "З",
-                "È": "И",
-                "É": "Й",
-                "Ê": "К",
-                "Ë": "Л",
-                "Ì": "М",
-                "Í": "Н",
-                "Î": "О",
-                "Ï": "П",
-                "Ð": "Р",
-                "Ñ": "С",
-                "Ò": "Т",
-                "Ó": "У",
-                "Ô": "Ф",
-                "Õ": "Х",
-                "Ö": "Ц",
-                "×": "Ч",
-                "Ø": "Ш",
-                "Ù": "Щ",
-                "Ú": "Ъ",
-                "Û": "Ы",
-                "Ü": "Ь",
-                "Ý": "Э",
-                "Þ": "Ю",
-                "ß": "Я",
-            }
-        )
-    )
-    return text
-
-
 _TRANSLIT = {
     "а": "a",
     "б": "b",
@@ -323,21 +250,21 @@ def englishish_alias(text: str) -> str:
     return snake(s)
 
 
-def parse_item_display_name(raw: str) -> str:
+def write_api_shards(api: dict, api_path: Path, shard_dir: Path) -> None:
     """
-    catalog 'subitem' looks like:
-      [minecraft:quartz_stairs meta=0] §cСравнить числа | §7...
-    We need the clickable menu name: "Сравнить числа".
+    One compact JSON per module (without DOC_FIELDS) + manifest.json.
+    The manifest records size/mtime of api_aliases.json, so the compiler ignores shards that are older.
     """
-    if not raw:
-        return ""
-    s = strip_colors(raw)
-    if "]" in s:
-        s = s.split("]", 1)[1]
-    s = s.strip()
-    if "|" in s:
-        s = s.split("|", 1)[0].strip()
-    return s
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    modules = {}
+    for module, actions in api.items():
+        hot = {name: {k: v for k, v in spec.items() if k not in DOC_FIELDS} for name, spec in actions.items()}
+        file = f"{module}.json"
+        (shard_dir / file).write_text(json.dumps(hot, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        modules[module] = {"file": file, "actions": len(hot)}
+    st = api_path.stat()
+    manifest = {"version": 1, "source": {"size": st.st_size, "mtime_ns": st.st_mtime_ns}, "modules": modules}
+    (shard_dir / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
 
 
 def load_translations():
@@ -451,6 +378,8 @@ def main():
 
     OUT_API.write_text(json.dumps(api, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
     print(f"wrote {OUT_API} modules={len(api)}")
+    write_api_shards(api, OUT_API, OUT_API_SHARDS)
+    print(f"wrote {OUT_API_SHARDS} shards={len(api)}")
 
 
 if __name__ == "__main__":
@@ -2,6 +2,9 @@ import json
 import re
 from pathlib import Path
 
+import _repo_root  # noqa: F401
+from mldsl_text import norm_space, strip_color_codes as strip_colors
+
 EXPORT_PATH = Path(r"C:\Users\trysmile\AppData\Roaming\.minecraft\regallactions_export.txt")
 ALIASES_PATH = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\src\assets\Aliases.json")
 OUT_PATH = Path(r"C:\Users\trysmile\Documents\regallactions_args.json")
@@ -14,19 +17,8 @@ def read_text_utf8(path: Path) -> str:
     return data.decode("utf-8", errors="replace")
 
 
-def strip_colors(text: str) -> str:
-    if not text:
-        return ""
-    text = re.sub(r"\u00a7.", "", text)
-    text = re.sub(r"[\x00-\x1f]", "", text)
-    return text
-
-
 def normalize(text: str) -> str:
-    text = strip_colors(text)
-    text = text.replace("\u00a0", " ")
-    text = re.sub(r"\s+", " ", text).strip().lower()
-    return text
+    return norm_space(strip_colors(text))
 
 
 def load_aliases(path: Path) -> dict:
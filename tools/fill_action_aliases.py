@@ -2,18 +2,13 @@ import json
 import re
 from pathlib import Path
 
+import _repo_root  # noqa: F401
+from mldsl_text import strip_color_codes as strip_colors
+
 CATALOG_PATH = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\out\actions_catalog.json")
 ALIASES_OUT = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\out\action_aliases.json")
 
 
-def strip_colors(text: str) -> str:
-    if not text:
-        return ""
-    text = re.sub(r"\u00a7.", "", text)
-    text = re.sub(r"[\x00-\x1f]", "", text)
-    return text
-
-
 _TRANSLIT = {
     "а": "a",
     "б": "b",
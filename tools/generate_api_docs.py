@@ -2,6 +2,9 @@ import json
 import os
 from pathlib import Path
 
+import _repo_root  # noqa: F401
+from mldsl_text import strip_color_codes
+
 API_PATH = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\out\api_aliases.json")
 OUT_DIR = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\out\docs")
 CATALOG_PATH = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\out\actions_catalog.json")
@@ -169,17 +172,9 @@ def write_events_ru(out_dir: Path):
     except Exception:
         return
 
-    def strip_colors_local(text: str) -> str:
-        import re
-        if not text:
-            return ""
-        text = re.sub(r"\u00a7.", "", text)
-        text = re.sub(r"[\x00-\x1f]", "", text)
-        return text
-
     def extract_desc(action: dict) -> str:
         s = action.get("subitem") or ""
-        s = strip_colors_local(s)
+        s = strip_color_codes(s)
         if "|" in s:
             parts = s.split("|", 1)
             if len(parts) == 2:
@@ -189,8 +184,8 @@ def write_events_ru(out_dir: Path):
     items = []
     for a in catalog:
         signs = a.get("signs") or ["", "", "", ""]
-        sign1 = strip_colors_local(signs[0]).strip()
-        sign2 = strip_colors_local(signs[1]).strip()
+        sign1 = strip_color_codes(signs[0]).strip()
+        sign2 = strip_color_codes(signs[1]).strip()
         if sign1 != "Событие игрока" or not sign2:
             continue
         items.append((sign2, (a.get("gui") or "").strip(), extract_desc(a)))
@@ -16,6 +16,78 @@ function readJsonSafe(p) {
   }
 }
 
+// Persistent `mldsl_compile.py --serve` process (line-delimited JSON-RPC over stdio).
+// Keeps the catalog warm between compiles; callers fall back to a one-shot execFile when it is unavailable.
+let compileServer = null;
+
+function startCompileServer(pythonPath, compiler) {
+  const env = Object.assign({}, process.env, { PYTHONIOENCODING: "utf-8" });
+  const proc = cp.spawn(pythonPath || "python", [compiler, "--serve"], { env, stdio: ["pipe", "pipe", "pipe"] });
+  const server = { key: `${pythonPath}\n${compiler}`, proc, dead: false, nextId: 1, pending: new Map(), buf: "" };
+  const fail = (why) => {
+    if (server.dead) return;
+    server.dead = true;
+    output.appendLine(`[serve] stopped: ${why}`);
+    for (const p of server.pending.values()) p.reject(new Error(why));
+    server.pending.clear();
+  };
+  proc.stdout.setEncoding("utf8");
+  proc.stdout.on("data", (chunk) => {
+    server.buf += chunk;
+    let nl;
+    while ((nl = server.buf.indexOf("\n")) >= 0) {
+      const line = server.buf.slice(0, nl);
+      server.buf = server.buf.slice(nl + 1);
+      if (!line.trim()) continue;
+      let msg;
+      try {
+        msg = JSON.parse(line);
+      } catch {
+        output.appendLine(`[serve] bad line: ${line}`);
+        continue;
+      }
+      const p = server.pending.get(msg.id);
+      if (!p) continue;
+      server.pending.delete(msg.id);
+      p.resolve(msg);
+    }
+  });
+  proc.stderr.setEncoding("utf8");
+  proc.stderr.on("data", (chunk) => output.appendLine(`[serve] stderr: ${String(chunk).trim()}`));
+  proc.on("error", (err) => fail(err.message || String(err)));
+  proc.on("exit", (code) => fail(`exit code ${code}`));
+  output.appendLine(`[serve] started pid=${proc.pid}`);
+  return server;
+}
+
+function stopCompileServer() {
+  if (!compileServer) return;
+  if (!compileServer.dead) compileServer.proc.kill();
+  compileServer = null;
+}
+
+// Resolves with the raw JSON-RPC response ({result} or {error}); rejects if the server process is unusable.
+function serverRequest(pythonPath, compiler, method, params) {
+  const key = `${pythonPath}\n${compiler}`;
+  if (!compileServer || compileServer.dead || compileServer.key !== key) {
+    stopCompileServer();
+    compileServer = startCompileServer(pythonPath, compiler);
+  }
+  const server = compileServer;
+  return new Promise((resolve, reject) => {
+    const id = server.nextId++;
+    server.pending.set(id, { resolve, reject });
+    server.proc.stdin.write(JSON.stringify({ jsonrpc: "2.0", id, method, params }) + "\n", (err) => {
+      if (err && server.pending.delete(id)) reject(err);
+    });
+  });
+}
+
+function logServerWarnings(tag, data) {
+  const warnings = (data && data.warnings) || [];
+  if (warnings.length) output.appendLine(`[${tag}] stderr: ${warnings.join("\n")}`);
+}
+
 function getConfig() {
   const cfg = vscode.workspace.getConfiguration("mldsl");
   return {
@@ -474,6 +546,34 @@ function activate(context) {
     }
 
     const filePath = ed.document.uri.fsPath;
+
+    const copyCommands = async (text) => {
+      if (!text) {
+        vscode.window.showWarningMessage("MLDSL: Compiler produced empty output");
+        return;
+      }
+      await vscode.env.clipboard.writeText(text);
+      const lines = text.split(/\r?\n/).filter((x) => x.trim()).length;
+      vscode.window.showInformationMessage(`MLDSL: Copied ${lines} command(s) to clipboard`);
+      output.appendLine(`[compile#${id}] ok lines=${lines}`);
+    };
+
+    try {
+      output.appendLine(`[compile#${id}] serve: compile ${filePath}`);
+      const resp = await serverRequest(pythonPath, compiler, "compile", { path: filePath });
+      if (resp.error) {
+        logServerWarnings(`compile#${id}`, resp.error.data);
+        output.appendLine(`[compile#${id}] ERROR: ${resp.error.message}`);
+        vscode.window.showErrorMessage("MLDSL: Compile failed (see Output → MLDSL Helper)");
+        return;
+      }
+      logServerWarnings(`compile#${id}`, resp.result);
+      await copyCommands((resp.result.commands || []).join("\n").trim());
+      return;
+    } catch (e) {
+      output.appendLine(`[compile#${id}] serve unavailable (${e.message || String(e)}), running once`);
+    }
+
     output.appendLine(`[compile#${id}] ${pythonPath} ${compiler} ${filePath}`);
 
     const env = Object.assign({}, process.env, { PYTHONIOENCODING: "utf-8" });
@@ -487,15 +587,7 @@ function activate(context) {
         vscode.window.showErrorMessage("MLDSL: Compile failed (see Output → MLDSL Helper)");
         return;
       }
-      const text = String(stdout || "").trim();
-      if (!text) {
-        vscode.window.showWarningMessage("MLDSL: Compiler produced empty output");
-        return;
-      }
-      await vscode.env.clipboard.writeText(text);
-      const lines = text.split(/\r?\n/).filter((x) => x.trim()).length;
-      vscode.window.showInformationMessage(`MLDSL: Copied ${lines} command(s) to clipboard`);
-      output.appendLine(`[compile#${id}] ok lines=${lines}`);
+      await copyCommands(String(stdout || "").trim());
     });
   }
 
@@ -525,6 +617,29 @@ function activate(context) {
 
     const filePath = ed.document.uri.fsPath;
     const outPlan = resolvePlanPath();
+
+    const planWritten = async () => {
+      await vscode.env.clipboard.writeText(`/mldsl run \"${outPlan}\"`);
+      vscode.window.showInformationMessage(`MLDSL: Wrote plan.json and copied /mldsl run to clipboard`);
+      output.appendLine(`[plan#${id}] ok wrote=${outPlan}`);
+    };
+
+    try {
+      output.appendLine(`[plan#${id}] serve: plan ${filePath} -> ${outPlan}`);
+      const resp = await serverRequest(pythonPath, compiler, "plan", { path: filePath, out: outPlan });
+      if (resp.error) {
+        logServerWarnings(`plan#${id}`, resp.error.data);
+        output.appendLine(`[plan#${id}] ERROR: ${resp.error.message}`);
+        vscode.window.showErrorMessage("MLDSL: Compile plan failed (see Output → MLDSL Helper)");
+        return;
+      }
+      logServerWarnings(`plan#${id}`, resp.result);
+      await planWritten();
+      return;
+    } catch (e) {
+      output.appendLine(`[plan#${id}] serve unavailable (${e.message || String(e)}), running once`);
+    }
+
     output.appendLine(`[plan#${id}] ${pythonPath} ${compiler} --plan ${outPlan} ${filePath}`);
 
     const env = Object.assign({}, process.env, { PYTHONIOENCODING: "utf-8" });
@@ -538,9 +653,7 @@ function activate(context) {
         vscode.window.showErrorMessage("MLDSL: Compile plan failed (see Output → MLDSL Helper)");
         return;
       }
-      await vscode.env.clipboard.writeText(`/mldsl run \"${outPlan}\"`);
-      vscode.window.showInformationMessage(`MLDSL: Wrote plan.json and copied /mldsl run to clipboard`);
-      output.appendLine(`[plan#${id}] ok wrote=${outPlan}`);
+      await planWritten();
     });
   }
 
@@ -1037,6 +1150,8 @@ function activate(context) {
   context.subscriptions.push(completionProvider, hoverProvider, defProvider);
 }
 
-function deactivate() {}
+function deactivate() {
+  stopCompileServer();
+}
 
 module.exports = { activate, deactivate };
@@ -9,10 +9,13 @@ from __future__ import annotations
 
 from pathlib import Path
 import runpy
+import sys
 
 
 def main() -> None:
     root = Path(__file__).resolve().parents[1] / "mldsl_compile.py"
+    # the compiler imports its sibling modules (mldsl_parser, ...) from the repo root
+    sys.path.insert(0, str(root.parent))
     runpy.run_path(str(root), run_name="__main__")
 
 
@@ -4,14 +4,6 @@
 import json
 from pathlib import Path
 
-def strip_colors(text: str) -> str:
-    import re
-    if not text:
-        return ""
-    text = re.sub(r"\u00a7.", "", text)
-    text = re.sub(r"[\x00-\x1f]", "", text)
-    return text
-
 def update_if_aliases():
     # Загружаем LangTokens.json
     lang_tokens_path = Path(r"C:\Users\trysmile\Documents\GitHub\mldsl\src\assets\LangTokens.json")